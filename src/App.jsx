@@ -68,13 +68,46 @@ export default function App() {
     console.log("Mock Publications:", mockPubs)
   }, [filteredPublications, allFilteredPublications])
 
+  // Organism counts come from the API's precomputed facet index, which matches `q`
+  // exactly like useSearch; until it answers for the current query (and whenever
+  // the API is unreachable) the chart counts the listed publications in the browser
+  const [serverOrganismStats, setServerOrganismStats] = useState(null)
+
+  useEffect(() => {
+    setServerOrganismStats(null)  // never show the previous query's counts
+    const controller = new AbortController()
+    const isProd = typeof window !== 'undefined' && window.location.hostname !== 'localhost'
+    const apiBase = import.meta.env.VITE_API_BASE_URL || (isProd ? '' : 'http://localhost:8000')
+    const params = new URLSearchParams({ q: query, source: 'pmc' })
+    // Debounced while typing; a superseded request is aborted so it cannot land late
+    const timer = setTimeout(() => {
+      fetch(`${apiBase}/api/aggregate?${params}`, { signal: controller.signal })
+        .then((res) => {
+          if (!res.ok) throw new Error(`API error: ${res.status}`)
+          return res.json()
+        })
+        .then((data) => {
+          if (controller.signal.aborted) return
+          setServerOrganismStats(Object.entries(data.facets.organism).map(([name, value]) => ({ name, value })))
+        })
+        .catch((e) => {
+          if (e.name !== 'AbortError') setServerOrganismStats(null)
+        })
+    }, 200)
+    return () => {
+      clearTimeout(timer)
+      controller.abort()
+    }
+  }, [query])
+
   const dynamicOrganismStats = useMemo(() => {
+    if (serverOrganismStats) return serverOrganismStats
     const stats = {}
     allFilteredPublications.forEach((pub) => {
       stats[pub.organism] = (stats[pub.organism] || 0) + 1
     })
     return Object.entries(stats).map(([name, value]) => ({ name, value }))
-  }, [allFilteredPublications])
+  }, [allFilteredPublications, serverOrganismStats])
 
 
   // AI Lab Page
@@ -162,7 +195,7 @@ export default function App() {
             
             <div className="space-y-6">
               <OrganismChart data={dynamicOrganismStats} />
-              <ResearchGaps publications={allFilteredPublications} />
+              <ResearchGaps publications={allFilteredPublications} query={query} />
             </div>
           </div>
         </main>
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import time
+import uuid
+
+from gemini import call_limiter
+from ratelimit import SharedTokenBucket, TokenBucket
+
+# Background batch jobs: items are queued to a fixed worker pool whose Gemini
+# calls are rate limited to the quota (each upstream call takes a token, so a
+# long document's map-reduce calls count and cache hits do not). Failed items are retried on their own,
+# so a flaky item never forces the whole batch to rerun.
+# With a shared store (multi-worker deployments) the rate limit is host-wide
+# and every item update is mirrored there, so a job's status can be read
+# from whichever worker the request lands on; only the owner runs it. Store
+# reads and writes run in a thread: the SQLite file is shared with the other
+# workers, and waiting on its lock must not stall this worker's event loop.
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+BATCH_RPM = float(os.getenv("BATCH_RPM", "60"))
+BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "3"))
+BATCH_JOB_TTL = float(os.getenv("BATCH_JOB_TTL", "3600"))
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "1"))
+
+
+class Job:
+    def __init__(self, items, options):
+        self.id = uuid.uuid4().hex
+        self.items = items  # list of {"id", "text", "status", "attempts", "result", "error"}
+        self.options = options
+        self.created_at = time.time()
+        self.finished_at = None
+        self.changed = asyncio.Condition()
+        self.remote = False  # read back from the shared store; owned by another worker
+
+    def counts(self):
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for item in self.items:
+            counts[item["status"]] += 1
+        return counts
+
+    @property
+    def finished(self):
+        return all(item["status"] in ("done", "failed") for item in self.items)
+
+    def snapshot(self, include_results=True):
+        counts = self.counts()
+        total = len(self.items)
+        out = {
+            "job_id": self.id,
+            "status": "finished" if self.finished else "running",
+            "total": total,
+            "progress": round((counts["done"] + counts["failed"]) / total, 4) if total else 1.0,
+            **counts,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if include_results:
+            out["items"] = [item_view(item) for item in self.items]
+        return out
+
+
+def item_view(item):
+    return {k: item[k] for k in ("id", "status", "attempts", "result", "error")}
+
+
+class JobManager:
+    def __init__(self, process, workers=BATCH_WORKERS, rpm=BATCH_RPM,
+                 max_attempts=BATCH_MAX_ATTEMPTS, job_ttl=BATCH_JOB_TTL, store=None):
+        self.process = process  # async (text, options) -> JSON-serializable result
+        self.workers = workers
+        self.store = store
+        if store is not None:
+            self.limiter = SharedTokenBucket(store, "batch", rpm / 60.0, capacity=max(1, workers))
+        else:
+            self.limiter = TokenBucket(rpm / 60.0, capacity=max(1, workers))
+        self.max_attempts = max_attempts
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    def start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def submit(self, documents, options):
+        self.start()
+        await self._expire()
+        items = [{"id": doc.get("id") or str(i), "text": doc["text"], "status": "queued",
+                  "attempts": 0, "result": None, "error": None, "index": i}
+                 for i, doc in enumerate(documents)]
+        job = Job(items, options)
+        self.jobs[job.id] = job
+        if self.store is not None:
+            # Written before any item is queued, so no item update can be overwritten by it
+            await asyncio.to_thread(self.store.save_job, job.id, options,
+                                    [item_view(item) for item in items], job.created_at)
+        for item in items:
+            self._queue.put_nowait((job, item))
+        return job
+
+    async def find(self, job_id):
+        """The job if this worker runs it, else its last state in the shared store, else None."""
+        job = self.jobs.get(job_id)
+        if job is not None or self.store is None:
+            return job
+        loaded = await asyncio.to_thread(self.store.load_job, job_id)
+        if loaded is None:
+            return None
+        options, items, created_at, finished_at = loaded
+        job = Job(items, options)
+        job.id, job.created_at, job.finished_at, job.remote = job_id, created_at, finished_at, True
+        return job
+
+    async def retry_failed(self, job):
+        self.start()
+        failed = [item for item in job.items if item["status"] == "failed"]
+        for item in failed:
+            item.update(status="queued", attempts=0, error=None)
+            await self._save(job, item)
+            self._queue.put_nowait((job, item))
+        if failed:
+            job.finished_at = None
+        return len(failed)
+
+    async def _save(self, job, item):
+        if self.store is not None:
+            await asyncio.to_thread(self.store.save_item, job.id, item["index"], item_view(item), job.finished_at)
+
+    async def _worker(self):
+        while True:
+            job, item = await self._queue.get()
+            try:
+                await self._run(job, item)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job, item):
+        token = call_limiter.set(self.limiter)
+        try:
+            await self._attempt(job, item)
+        finally:
+            call_limiter.reset(token)
+
+    async def _attempt(self, job, item):
+        item["status"] = "running"
+        item["attempts"] += 1
+        await self._save(job, item)
+        try:
+            item["result"] = await self.process(item["text"], job.options)
+            item["status"] = "done"
+            item["error"] = None
+        except Exception as e:
+            item["error"] = str(e)
+            # ValueError means the input itself is bad; retrying will not help
+            if item["attempts"] < self.max_attempts and not isinstance(e, ValueError):
+                # Requeue only this item after a backoff, without holding the worker
+                item["status"] = "queued"
+                asyncio.get_running_loop().call_later(
+                    min(30, 2 ** item["attempts"]), self._queue.put_nowait, (job, item))
+            else:
+                item["status"] = "failed"
+        if job.finished and job.finished_at is None:
+            job.finished_at = time.time()
+        await self._save(job, item)
+        async with job.changed:
+            job.changed.notify_all()
+
+    async def _expire(self):
+        now = time.time()
+        for job_id in [j.id for j in self.jobs.values()
+                       if j.finished_at and now - j.finished_at > self.job_ttl]:
+            del self.jobs[job_id]
+        if self.store is not None:
+            await asyncio.to_thread(self.store.expire_jobs, self.job_ttl)
+
+    async def updates(self, job):
+        """Yield each item once it completes or fails, then stop when the job is finished."""
+        sent = set()
+        while job.remote:
+            # Owned by another worker: follow its progress through the shared store
+            for idx, item in enumerate(job.items):
+                if idx not in sent and item["status"] in ("done", "failed"):
+                    sent.add(idx)
+                    yield item_view(item)
+            if job.finished:
+                return
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+            job = await self.find(job.id)
+            if job is None:  # expired meanwhile
+                return
+        while True:
+            async with job.changed:
+                ready = [(idx, item_view(item)) for idx, item in enumerate(job.items)
+                         if idx not in sent and item["status"] in ("done", "failed")]
+                finished = job.finished
+                if not ready and not finished:
+                    await job.changed.wait()
+                    continue
+            for idx, view in ready:
+                sent.add(idx)
+                yield view
+            if finished:
+                return
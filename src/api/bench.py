@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from corpus import load_corpus
+
+# Load test for the API. By default it starts mock_gemini.py and the API as
+# two local uvicorn processes (the API pointed at the mock via
+# GEMINI_BASE_URL), drives each scenario at a fixed concurrency, and writes
+# p50/p95/p99 latency and RPS to a JSON results file. --baseline compares
+# against an earlier results file and exits non-zero on a regression.
+#
+#   python bench.py --concurrency 32 --requests 500 --mock-latency 0.2 --out bench-results.json
+#   python bench.py --workers 4   # the API under serve.py instead of a single uvicorn process
+#   python bench.py --target http://localhost:8000 --scenarios health
+API_DIR = Path(__file__).resolve().parent
+SCENARIOS = ("summarize", "analyze-gaps", "health")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(module, port, env, workers=1):
+    if workers > 1:
+        cmd = [sys.executable, "serve.py", "--workers", str(workers)]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", f"{module}:app"]
+    return subprocess.Popen(cmd + ["--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+                            cwd=API_DIR, env={**os.environ, **env})
+
+
+async def wait_ready(url, timeout=120):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=2)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+class Payloads:
+    """Request bodies built from the corpus; unique=True defeats the response cache."""
+
+    def __init__(self, records, unique):
+        self.unique = unique
+        self.texts = [r["abstract"] for r in records if len(r.get("abstract") or "") >= 200] or ["x" * 500]
+        organisms = sorted({r["organism"] for r in records if r.get("organism")})
+        words = sorted({w for r in records for w in (r.get("title") or "").lower().split() if len(w) > 6})
+        self.queries = organisms + words[:200] or ["bone"]
+
+    def request(self, scenario, i):
+        if scenario == "summarize":
+            text = self.texts[i % len(self.texts)]
+            return "POST", "/api/summarize", {"text": f"{text} [{i}]" if self.unique else text, "max_bullets": 3}
+        if scenario == "analyze-gaps":
+            if not self.unique:
+                return "POST", "/api/analyze-gaps", {"filters": {"source": "pmc"}}
+            q = self.queries[i % len(self.queries)]
+            return "POST", "/api/analyze-gaps", {"filters": {"q": q, "year_to": 2025 - (i // len(self.queries)) % 20}}
+        if scenario == "health":
+            return "GET", "/health", None
+        raise ValueError(f"Unknown scenario {scenario}")
+
+
+def latency_summary(latencies, wall, statuses, sources):
+    ms = np.array(latencies) * 1000
+    ok = sum(c for s, c in statuses.items() if s.isdigit() and int(s) < 400)
+    out = {
+        "requests": len(latencies),
+        "ok": ok,
+        "errors": len(latencies) - ok,
+        "status": dict(statuses),
+        "wall_seconds": round(wall, 3),
+        "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+    }
+    if len(ms):
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        out.update(p50_ms=round(p50, 2), p95_ms=round(p95, 2), p99_ms=round(p99, 2),
+                   mean_ms=round(float(ms.mean()), 2), max_ms=round(float(ms.max()), 2))
+    if sources:
+        out["summary_source"] = dict(sources)
+    return out
+
+
+async def run_scenario(client, scenario, payloads, concurrency, requests, offset=0):
+    latencies = []
+    statuses = Counter()
+    sources = Counter()
+    counter = itertools.count()
+
+    async def worker():
+        while (i := next(counter)) < requests:
+            method, path, body = payloads.request(scenario, offset + i)
+            start = time.perf_counter()
+            try:
+                r = await client.request(method, path, json=body)
+                status = str(r.status_code)
+                if "x-summary-source" in r.headers:
+                    sources[r.headers["x-summary-source"]] += 1
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latency_summary(latencies, time.perf_counter() - start, statuses, sources)
+
+
+def compare(results, baseline, tolerance):
+    """Regressions against a baseline results file: p95 up or RPS down by more than tolerance."""
+    problems = []
+    for name, cur in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base or "p95_ms" not in cur or "p95_ms" not in base:
+            continue
+        if cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p95 {base['p95_ms']}ms -> {cur['p95_ms']}ms")
+        if cur["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"{name}: rps {base['rps']} -> {cur['rps']}")
+        if cur["errors"] > base["errors"] and cur["errors"] > tolerance * cur["requests"]:
+            problems.append(f"{name}: errors {base['errors']} -> {cur['errors']}")
+    return problems
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def main(args):
+    procs = []
+    target = args.target
+    # A fresh shared cache per run, so earlier runs cannot turn misses into hits
+    state_dir = tempfile.mkdtemp(prefix="bench-state-")
+    try:
+        if target is None:
+            mock_port, api_port = free_port(), free_port()
+            procs.append(start_server("mock_gemini", mock_port, {
+                "MOCK_LATENCY": str(args.mock_latency), "MOCK_JITTER": str(args.mock_jitter),
+                "MOCK_ERROR_RATE": str(args.mock_error_rate), "MOCK_FENCED_RATE": str(args.mock_fenced_rate),
+                "MOCK_INVALID_RATE": str(args.mock_invalid_rate)}))
+            procs.append(start_server("summarize", api_port, {
+                "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "bench"),
+                "GEMINI_BASE_URL": f"http://127.0.0.1:{mock_port}/v1beta",
+                "LOG_LEVEL": os.getenv("LOG_LEVEL", "ERROR"), "SERVE_STATE_DIR": state_dir}, workers=args.workers))
+            target = f"http://127.0.0.1:{api_port}"
+            await wait_ready(f"http://127.0.0.1:{mock_port}/stats")
+        await wait_ready(f"{target}/health")
+
+        payloads = Payloads(load_corpus(), unique=not args.repeat)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        results = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+            "scenarios": {},
+        }
+        async with httpx.AsyncClient(base_url=target, limits=limits, timeout=args.timeout) as client:
+            for scenario in args.scenarios.split(","):
+                if args.warmup:
+                    await run_scenario(client, scenario, payloads, args.concurrency, args.warmup, offset=10 ** 6)
+                summary = await run_scenario(client, scenario, payloads, args.concurrency, args.requests)
+                results["scenarios"][scenario] = summary
+                print(f"[{scenario}] {summary['requests']} req  {summary['rps']} rps  "
+                      f"p50={summary.get('p50_ms')}ms p95={summary.get('p95_ms')}ms p99={summary.get('p99_ms')}ms  "
+                      f"errors={summary['errors']}")
+
+        Path(args.out).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"[DONE] results={args.out}")
+        if args.baseline:
+            problems = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+            for p in problems:
+                print(f"[REGRESSION] {p}")
+            return 1 if problems else 0
+        return 0
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait(timeout=10)
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark the API against a local Gemini mock")
+    ap.add_argument("--target", help="Benchmark a running API at this URL instead of starting one with the mock")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of {','.join(SCENARIOS)}")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    ap.add_argument("--warmup", type=int, default=0, help="Unmeasured requests per scenario first")
+    ap.add_argument("--repeat", action="store_true", help="Reuse identical payloads (measures the cache path)")
+    ap.add_argument("--timeout", type=float, default=60)
+    ap.add_argument("--workers", type=int, default=1, help="API worker processes (> 1 runs serve.py)")
+    ap.add_argument("--mock-latency", type=float, default=0.2)
+    ap.add_argument("--mock-jitter", type=float, default=0.05)
+    ap.add_argument("--mock-error-rate", type=float, default=0.0)
+    ap.add_argument("--mock-fenced-rate", type=float, default=0.5)
+    ap.add_argument("--mock-invalid-rate", type=float, default=0.0)
+    ap.add_argument("--out", default="bench-results.json")
+    ap.add_argument("--baseline", help="Earlier results file to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression vs --baseline")
+    sys.exit(asyncio.run(main(ap.parse_args())))
@@ -0,0 +1,82 @@
+import os
+import time
+from collections import deque
+
+# Circuit breaker for the Gemini upstream. It looks at the last BREAKER_WINDOW
+# calls and opens when too many of them failed or were slower than
+# BREAKER_SLOW_SECONDS. While open, calls fail fast (callers serve the local
+# extractive summary instead); after BREAKER_COOLDOWN seconds one probe call
+# is let through and its outcome closes or re-opens the breaker.
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_SECONDS = float(os.getenv("BREAKER_SLOW_SECONDS", "20"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS, error_rate=BREAKER_ERROR_RATE,
+                 slow_seconds=BREAKER_SLOW_SECONDS, slow_rate=BREAKER_SLOW_RATE, cooldown=BREAKER_COOLDOWN):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+        self.calls = deque(maxlen=window)  # (failed, slow)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow(self):
+        """Whether a call may go upstream now; reserves the probe slot when half-open."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def record(self, failed, latency):
+        slow = latency > self.slow_seconds
+        if self.state == HALF_OPEN:
+            self.probing = False
+            if failed or slow:
+                self._open()
+            else:
+                self.state = CLOSED
+                self.calls.clear()
+            return
+        self.calls.append((failed, slow))
+        n = len(self.calls)
+        if self.state == CLOSED and n >= self.min_calls:
+            failures = sum(f for f, _ in self.calls)
+            slows = sum(s for _, s in self.calls)
+            if failures >= self.error_rate * n or slows >= self.slow_rate * n:
+                self._open()
+
+    def release(self):
+        """Give back a probe slot whose call ended without telling us anything."""
+        if self.state == HALF_OPEN:
+            self.probing = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.calls.clear()
+        self.stats["opened"] += 1
+
+    def snapshot(self):
+        return {"state": self.state, "window": len(self.calls), **self.stats}
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Two-tier response cache: an in-process LRU with TTL in front of an
+# optional SQLite file that survives restarts.
+CACHE_TTL = float(os.getenv("CACHE_TTL", "86400"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_DB = os.getenv("CACHE_DB", "")
+
+
+def make_key(namespace, *parts):
+    """Content-addressed key: sha256 over the canonical JSON of the inputs."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return f"{namespace}:{hashlib.sha256(blob.encode('utf-8')).hexdigest()}"
+
+
+class LRUCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                self._drop(key)
+                return None
+            self._data.move_to_end(key)
+            return item[2]
+
+    def set(self, key, value, size, ttl=None):
+        if size > self.max_bytes:
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (expires_at, size, value)
+            self.bytes += size
+            while self._data and (len(self._data) > self.max_entries or self.bytes > self.max_bytes):
+                self._drop(next(iter(self._data)))
+
+    def _drop(self, key):
+        _, size, _ = self._data.pop(key)
+        self.bytes -= size
+
+
+class DiskCache:
+    def __init__(self, path, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES * 8):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connect()
+
+    def _connect(self):
+        if self._pid == os.getpid():
+            return
+        # Forked workers (serve.py) share the file but each needs its own connection
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed_at)")
+        self._pid = os.getpid()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            self._connect()
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._connect()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)", (key, value, len(value), expires_at, now))
+            self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used rows until back under budget
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", stale)
+
+    def close(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._conn.close()
+            self._pid = None
+
+
+class ResponseCache:
+    """JSON-serializable response cache with hit/miss counters per tier."""
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory or LRUCache()
+        self.disk = disk
+        self.stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0}
+
+    async def get(self, key, count=True):
+        """Cached value or None; count=False keeps polling lookups out of the hit/miss stats."""
+        value = self.memory.get(key)
+        if value is not None:
+            if count:
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+            return value
+        if self.disk is not None:
+            raw = await asyncio.to_thread(self.disk.get, key)
+            if raw is not None:
+                value = json.loads(raw)
+                self.memory.set(key, value, len(raw))
+                if count:
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                return value
+        if count:
+            self.stats["misses"] += 1
+        return None
+
+    async def set(self, key, value):
+        raw = json.dumps(value, ensure_ascii=False)
+        self.memory.set(key, value, len(raw))
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, raw)
+        self.stats["sets"] += 1
+
+    def snapshot(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.bytes,
+            "disk_enabled": self.disk is not None,
+        }
+
+
+def build_cache():
+    disk = DiskCache(CACHE_DB) if CACHE_DB else None
+    return ResponseCache(LRUCache(), disk)
@@ -0,0 +1,85 @@
+import math
+import re
+
+# Split long documents into overlapping chunks on paragraph/sentence
+# boundaries, and fit them to a per-document token budget.
+
+_PARA_SPLIT = re.compile(r"\n\s*\n")
+_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English prose
+    return (len(text) + 3) // 4
+
+
+def _pieces(text, limit):
+    """Yield paragraphs, falling back to sentences and then hard cuts above limit."""
+    for para in _PARA_SPLIT.split(text):
+        para = para.strip()
+        if not para:
+            continue
+        if len(para) <= limit:
+            yield para
+            continue
+        for sent in _SENT_SPLIT.split(para):
+            for k in range(0, len(sent), limit):
+                yield sent[k:k + limit]
+
+
+def _tail(text, n):
+    """Last ~n chars of text, starting at a word boundary."""
+    if n <= 0 or len(text) <= n:
+        return text if n > 0 else ""
+    tail = text[-n:]
+    cut = tail.find(" ")
+    return tail[cut + 1:] if cut != -1 else tail
+
+
+def _pack(texts, chunk_chars, overlap):
+    chunks = []
+    current = []
+    size = 0
+    for piece in (p for text in texts for p in _pieces(text, chunk_chars)):
+        if current and size + len(piece) + 2 > chunk_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    if overlap > 0:
+        chunks = [chunks[0]] + [_tail(prev, overlap) + "\n\n" + cur
+                                for prev, cur in zip(chunks, chunks[1:])]
+    return chunks
+
+
+def split_document(text, chunk_chars=8000, overlap=400, max_chunks=24, token_budget=100000):
+    """Split text into at most max_chunks chunks whose combined size fits token_budget.
+
+    Documents that need more than max_chunks chunks are repacked with larger
+    chunks; if the total still exceeds the budget, every chunk is trimmed to an
+    equal share so the whole document stays represented.
+    """
+    return split_pages([text], chunk_chars, overlap, max_chunks, token_budget)
+
+
+def split_pages(pages, chunk_chars=8000, overlap=400, max_chunks=24, token_budget=100000):
+    """split_document for text that arrives in pieces (e.g. PDF pages); pieces are never joined whole."""
+    pages = [p.strip() for p in pages if p and p.strip()]
+    length = sum(len(p) for p in pages) + 2 * max(len(pages) - 1, 0)
+    if length <= chunk_chars:
+        return ["\n\n".join(pages)]
+    chunks = _pack(pages, chunk_chars, overlap)
+    if len(chunks) > max_chunks:
+        chunk_chars = math.ceil(length / max_chunks)
+        overlap = min(overlap, chunk_chars // 10)
+        chunks = _pack(pages, chunk_chars, overlap)
+        while len(chunks) > max_chunks:
+            chunk_chars = int(chunk_chars * 1.1) + 1
+            chunks = _pack(pages, chunk_chars, overlap)
+    total = sum(estimate_tokens(c) for c in chunks)
+    if total > token_budget:
+        share = (token_budget // len(chunks)) * 4
+        chunks = [c[:share] for c in chunks]
+    return chunks
@@ -0,0 +1,160 @@
+import csv
+import json
+import os
+import re
+from pathlib import Path
+
+# Read-only publication corpus shared by the search, recommendation and
+# aggregation endpoints: PMC publications from the enriched CSV plus OSDR
+# studies, normalized to one record shape.
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+CORPUS_CSV = os.getenv("CORPUS_CSV", str(DATA_DIR / "SB_publication_PMC_enriched.csv"))
+OSDR_JSON = os.getenv("OSDR_JSON", str(DATA_DIR / "OSDR_category.json"))
+
+_ABSTRACT_CUT_MARKERS = (
+    "conflict of interest",
+    "competing interests",
+    "funding:",
+    "grant support:",
+    "correspondence to:",
+    "data availability:",
+    "acknowledgments:",
+    "ethics statement:",
+)
+
+# Same keyword rules as inferOutcome() in src/utils/csvParser.js
+_OUTCOME_RULES = (
+    (("bone", "skeletal", "osteoporosis"), "Bone loss/remodeling"),
+    (("immune", "immunity", "lymphocyte"), "Immune system changes"),
+    (("muscle", "atrophy", "sarcopenia"), "Muscle atrophy"),
+    (("cardiovascular", "heart", "cardiac"), "Cardiovascular changes"),
+    (("radiation", "dna", "genomic"), "Radiation effects"),
+    (("microgravity", "gravity"), "Microgravity effects"),
+    (("growth", "development", "morphology"), "Growth/development changes"),
+    (("metabolism", "metabolic"), "Metabolic changes"),
+    (("stress", "oxidative"), "Stress response"),
+)
+
+
+def clean_abstract(raw):
+    """Drop the citation/author header and trailing boilerplate from an EFetch abstract."""
+    if not raw:
+        return ""
+    lines = [l.strip() for l in raw.splitlines()]
+    start = 0
+    for i, line in enumerate(lines):
+        low = line.lower()
+        if low.startswith("author information:") or low.startswith("author:"):
+            j = i + 1
+            while j < len(lines) and lines[j] != "":
+                j += 1
+            start = j + 1
+            break
+    end = len(lines)
+    for i in range(start, len(lines)):
+        if lines[i].lower().startswith(_ABSTRACT_CUT_MARKERS):
+            end = i
+            break
+    return " ".join(lines[start:end]).strip()
+
+
+def infer_outcome(title):
+    low = (title or "").lower()
+    for keys, outcome in _OUTCOME_RULES:
+        if any(k in low for k in keys):
+            return outcome
+    return "General spaceflight effects"
+
+
+def parse_year(value):
+    m = re.search(r"\b(19|20)\d{2}\b", str(value or ""))
+    return int(m.group(0)) if m else None
+
+
+def record_year(rec):
+    """Year as the dashboard treats it: positive numbers only, 0 otherwise."""
+    year = rec.get("year")
+    return int(year) if isinstance(year, (int, float)) and not isinstance(year, bool) and year > 0 else 0
+
+
+_MONTHS = {m: i + 1 for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"))}
+
+
+def normalize_date(value):
+    """'2014 Aug 18' / '2018 Dec' / '2017' -> ISO date string (missing parts -> 01), or None."""
+    parts = str(value or "").replace(",", " ").split()
+    year = parse_year(parts[0]) if parts else None
+    if not year:
+        return None
+    month = _MONTHS.get(parts[1][:3].lower(), 1) if len(parts) > 1 else 1
+    day = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() and 1 <= int(parts[2]) <= 31 else 1
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def load_publications(path=CORPUS_CSV):
+    records = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            title = (row.get("Title") or "").strip()
+            pmcid = (row.get("PMCID") or "").strip()
+            records.append({
+                "id": pmcid or f"pub-{len(records)}",
+                "source": "pmc",
+                "title": title,
+                "abstract": clean_abstract(row.get("abstract")),
+                "organism": (row.get("Inferred Organism") or "").strip() or "Unknown",
+                "mission": "",
+                "year": parse_year(row.get("pub_date")) or parse_year(title),
+                "date": normalize_date(row.get("pub_date")),
+                "outcome": infer_outcome(title),
+                "link": (row.get("Link") or "").strip(),
+                "pmcid": pmcid,
+                "pmid": (row.get("PMID") or "").strip(),
+                "doi": (row.get("DOI") or "").strip(),
+                "author": (row.get("first_author") or "").strip(),
+            })
+    return records
+
+
+def load_osdr(path=OSDR_JSON):
+    with open(path, encoding="utf-8") as f:
+        studies = json.load(f)
+    records = []
+    for s in studies:
+        title = (s.get("title") or "").strip()
+        organisms = s.get("organisms") or []
+        pubs = s.get("publications") or []
+        records.append({
+            "id": s.get("dataset_id") or f"osd-{len(records)}",
+            "source": "osdr",
+            "title": title,
+            "abstract": (s.get("description") or "").strip(),
+            "organism": organisms[0] if organisms else "Unknown",
+            "mission": (s.get("mission") or "").strip(),
+            "year": s.get("start_year"),
+            "date": f"{s['start_year']:04d}-01-01" if s.get("start_year") else None,
+            "outcome": infer_outcome(title),
+            "link": s.get("access_url") or "",
+            "pmcid": "",
+            "pmid": next((str(p["pubmed"]) for p in pubs if p.get("pubmed")), ""),
+            "doi": next((p["doi"] for p in pubs if p.get("doi")), ""),
+            "author": "",
+        })
+    return records
+
+
+def record_view(rec, snippet_chars=240):
+    """Record as returned by the API: everything but the abstract, plus a short snippet."""
+    view = {k: v for k, v in rec.items() if k != "abstract"}
+    view["snippet"] = (rec.get("abstract") or "")[:snippet_chars]
+    return view
+
+
+def load_corpus(csv_path=CORPUS_CSV, osdr_path=OSDR_JSON):
+    records = []
+    if csv_path and os.path.exists(csv_path):
+        records.extend(load_publications(csv_path))
+    if osdr_path and os.path.exists(osdr_path):
+        records.extend(load_osdr(osdr_path))
+    return records
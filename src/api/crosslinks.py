@@ -0,0 +1,269 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+
+from corpus import CORPUS_CSV, DATA_DIR, OSDR_JSON, load_publications
+
+# Links between PMC publications (enriched CSV) and the OSDR studies whose
+# `publications[]` cite them. Every OSDR publication is looked up in hash
+# indexes over the PMC side by PMID, DOI and normalized title; one with no
+# exact hit falls back to character-trigram Jaccard over titles, keeping the
+# best PMC title at or above CROSSLINKS_TITLE_THRESHOLD. Fuzzy candidates come
+# from trigram postings with prefix filtering (only the rarest n - ceil(t*n) + 1
+# trigrams of a title are probed), which cannot miss a pair above the
+# threshold, so no title is compared against the whole corpus.
+#
+# The links are saved with a per-record fingerprint of the fields they were
+# matched on. When either source file changes, only OSDR studies that changed,
+# or that a changed PMC record links to or could now match, are matched again.
+#   python crosslinks.py            # update (incremental)
+#   python crosslinks.py --full     # rebuild from scratch
+CROSSLINKS_PATH = os.getenv("CROSSLINKS_PATH", str(DATA_DIR / "index" / "crosslinks.json"))
+CROSSLINKS_TITLE_THRESHOLD = float(os.getenv("CROSSLINKS_TITLE_THRESHOLD", "0.8"))
+CROSSLINKS_VERSION = 1
+
+_non_alnum = re.compile(r"[^a-z0-9]+")
+_doi_prefix = re.compile(r"^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)", re.I)
+
+
+def normalize_title(title):
+    text = unicodedata.normalize("NFKD", title or "").encode("ascii", "ignore").decode("ascii")
+    return " ".join(_non_alnum.sub(" ", text.lower()).split())
+
+
+def normalize_doi(doi):
+    return _doi_prefix.sub("", (doi or "").strip()).lower()
+
+
+def normalize_pmid(pmid):
+    digits = "".join(c for c in str(pmid or "") if c.isdigit()).lstrip("0")
+    return digits
+
+
+def trigrams(norm_title):
+    if len(norm_title) < 3:
+        return {norm_title} if norm_title else set()
+    return {norm_title[i:i + 3] for i in range(len(norm_title) - 2)}
+
+
+def entry(key, pmid, doi, title):
+    """One matchable citation: (key, pmid, doi, normalized title), all normalized."""
+    return key, normalize_pmid(pmid), normalize_doi(doi), normalize_title(title)
+
+
+def pmc_entries(path=CORPUS_CSV):
+    if not path or not os.path.exists(path):
+        return []
+    return [entry(r["id"], r["pmid"], r["doi"], r["title"]) for r in load_publications(path)]
+
+
+def osdr_entries(path=OSDR_JSON):
+    """One entry per cited publication, keyed by the citing study's dataset_id."""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        studies = json.load(f)
+    entries = []
+    for i, s in enumerate(studies):
+        key = s.get("dataset_id") or f"osd-{i}"
+        pubs = s.get("publications") or []
+        entries.extend(entry(key, p.get("pubmed"), p.get("doi"), p.get("title")) for p in pubs)
+        if not pubs:
+            entries.append(entry(key, "", "", ""))  # keeps the study in the fingerprints
+    return entries
+
+
+def fingerprints(entries):
+    """key -> hash of everything its entries are matched on."""
+    grouped = defaultdict(list)
+    for e in entries:
+        grouped[e[0]].append(e[1:])
+    return {k: hashlib.sha1(json.dumps(sorted(v)).encode("utf-8")).hexdigest() for k, v in grouped.items()}
+
+
+class JoinIndex:
+    """Hash indexes by PMID, DOI and title, plus trigram postings for fuzzy title lookups."""
+
+    def __init__(self, entries, threshold=CROSSLINKS_TITLE_THRESHOLD):
+        self.threshold = threshold
+        self.by_pmid = defaultdict(set)
+        self.by_doi = defaultdict(set)
+        self.by_title = defaultdict(set)
+        self.keys = []
+        self.grams = []
+        self.postings = defaultdict(list)
+        for key, pmid, doi, title in entries:
+            if pmid:
+                self.by_pmid[pmid].add(key)
+            if doi:
+                self.by_doi[doi].add(key)
+            if title:
+                self.by_title[title].add(key)
+                grams = trigrams(title)
+                for g in grams:
+                    self.postings[g].append(len(self.keys))
+                self.keys.append(key)
+                self.grams.append(grams)
+
+    def exact(self, e):
+        """key -> strongest exact method (pmid, then doi, then title)."""
+        _, pmid, doi, title = e
+        hits = {}
+        for method, index, value in (("title", self.by_title, title), ("doi", self.by_doi, doi),
+                                     ("pmid", self.by_pmid, pmid)):
+            if value:
+                hits.update(dict.fromkeys(index.get(value, ()), method))
+        return hits
+
+    def fuzzy(self, e):
+        """(key, jaccard) for every indexed title with trigram Jaccard >= threshold."""
+        grams = trigrams(e[3])
+        n = len(grams)
+        if not n:
+            return []
+        need = max(1, math.ceil(self.threshold * n - 1e-9))  # overlap any qualifying title must have
+        prefix = sorted(grams, key=lambda g: (len(self.postings.get(g, ())), g))[:n - need + 1]
+        candidates = {i for g in prefix for i in self.postings.get(g, ())}
+        hits = []
+        for i in candidates:
+            other = self.grams[i]
+            if not need <= len(other) <= n / self.threshold:
+                continue
+            shared = len(grams & other)
+            score = shared / (n + len(other) - shared)
+            if score >= self.threshold:
+                hits.append((self.keys[i], score))
+        return hits
+
+
+def match_study(pubs, pmc_index):
+    """[pmc_id, osdr_id, method, score] links for one study's publication entries."""
+    links = {}
+    for e in pubs:
+        exact = pmc_index.exact(e)
+        if exact:
+            for pmc_id, method in exact.items():
+                links.setdefault(pmc_id, (method, 1.0))
+            continue
+        fuzzy = pmc_index.fuzzy(e)
+        if fuzzy:
+            best = max(score for _, score in fuzzy)
+            for pmc_id, score in fuzzy:
+                if score == best and (pmc_id not in links or links[pmc_id][1] < score):
+                    links[pmc_id] = ("fuzzy_title", round(score, 4))
+    key = pubs[0][0]
+    return [[pmc_id, key, method, score] for pmc_id, (method, score) in sorted(links.items())]
+
+
+class CrossLinks:
+    def __init__(self, links):
+        self.links = links
+        self.by_pmc = defaultdict(list)
+        self.by_osdr = defaultdict(list)
+        for pmc_id, osdr_id, method, score in links:
+            self.by_pmc[pmc_id].append({"id": osdr_id, "method": method, "score": score})
+            self.by_osdr[osdr_id].append({"id": pmc_id, "method": method, "score": score})
+
+    def get(self, record_id):
+        """Linked records (id, method, score) on the other side of the join."""
+        return self.by_pmc.get(record_id) or self.by_osdr.get(record_id) or []
+
+    def stats(self):
+        return {"links": len(self.links), "publications": len(self.by_pmc), "studies": len(self.by_osdr),
+                "by_method": dict(Counter(link[2] for link in self.links))}
+
+
+def source_fingerprint(paths=(CORPUS_CSV, OSDR_JSON)):
+    h = hashlib.sha256(f"{CROSSLINKS_VERSION}:{CROSSLINKS_TITLE_THRESHOLD}".encode())
+    for p in paths:
+        if p and os.path.exists(p):
+            st = os.stat(p)
+            h.update(f"{os.path.abspath(p)}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("version") != CROSSLINKS_VERSION or state.get("threshold") != CROSSLINKS_TITLE_THRESHOLD:
+        return None  # matched under other rules: rebuild everything
+    return state
+
+
+def update(state=None, pmc=None, osdr=None):
+    """New state with only the affected studies re-matched; (state, number of studies matched)."""
+    pmc = pmc_entries() if pmc is None else pmc
+    osdr = osdr_entries() if osdr is None else osdr
+    pmc_fp, osdr_fp = fingerprints(pmc), fingerprints(osdr)
+    old_pmc = state["pmc"] if state else {}
+    old_osdr = state["osdr"] if state else {}
+    old_links = state["links"] if state else []
+
+    changed_pmc = {k for k, fp in pmc_fp.items() if old_pmc.get(k) != fp}
+    gone_pmc = set(old_pmc) - set(pmc_fp)
+    dirty = {k for k, fp in osdr_fp.items() if old_osdr.get(k) != fp}
+    dirty |= {osdr_id for pmc_id, osdr_id, _, _ in old_links if pmc_id in changed_pmc or pmc_id in gone_pmc}
+    if changed_pmc and state:
+        # Studies a new or edited publication could match now
+        osdr_index = JoinIndex(osdr)
+        for e in pmc:
+            if e[0] in changed_pmc:
+                dirty.update(osdr_index.exact(e))
+                dirty.update(k for k, _ in osdr_index.fuzzy(e))
+
+    links = [link for link in old_links if link[1] in osdr_fp and link[1] not in dirty]
+    pmc_index = JoinIndex(pmc)
+    by_study = defaultdict(list)
+    for e in osdr:
+        if e[0] in dirty:
+            by_study[e[0]].append(e)
+    for pubs in by_study.values():
+        links.extend(match_study(pubs, pmc_index))
+    links.sort()
+    return {"version": CROSSLINKS_VERSION, "threshold": CROSSLINKS_TITLE_THRESHOLD,
+            "pmc": pmc_fp, "osdr": osdr_fp, "links": links}, len(by_study)
+
+
+def save_state(state, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def load_or_update(path=CROSSLINKS_PATH):
+    fingerprint = source_fingerprint()
+    state = load_state(path)
+    if state is None or state.get("sources") != fingerprint:
+        state, _ = update(state)
+        state["sources"] = fingerprint
+        try:
+            save_state(state, path)
+        except OSError:
+            pass  # read-only deploy: keep the in-memory links
+    return CrossLinks(state["links"])
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Link PMC publications to OSDR studies (incremental)")
+    ap.add_argument("--out", default=CROSSLINKS_PATH)
+    ap.add_argument("--full", action="store_true", help="Ignore the saved links and match everything")
+    args = ap.parse_args()
+    t0 = time.time()
+    previous = None if args.full else load_state(args.out)
+    state, matched = update(previous)
+    state["sources"] = source_fingerprint()
+    save_state(state, args.out)
+    stats = CrossLinks(state["links"]).stats()
+    print(f"[DONE] out={args.out} studies_matched={matched}/{len(state['osdr'])} {json.dumps(stats)} "
+          f"elapsed={time.time() - t0:.2f}s")
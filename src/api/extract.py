@@ -0,0 +1,212 @@
+import asyncio
+import codecs
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+from pypdf import PdfReader
+from pypdf.errors import PyPdfError
+from python_multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+
+# Server-side text extraction for uploaded PDF/TXT files. The multipart body
+# is parsed as it streams in and the file part goes straight to one temp file,
+# size-checked and hashed on the way (so a repeat upload is a cache hit before
+# any parsing); nothing else buffers or copies it. Then PDFs are parsed page range by page
+# range in a process pool so neither the event loop nor the GIL is held by
+# pypdf. The result is a list of page texts, never one concatenated string.
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_MAX_PAGES = int(os.getenv("UPLOAD_MAX_PAGES", "300"))
+UPLOAD_DIR = os.getenv("UPLOAD_DIR") or None
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))
+EXTRACT_PAGES_PER_TASK = int(os.getenv("EXTRACT_PAGES_PER_TASK", "8"))
+SPOOL_CHUNK = 1024 * 1024
+UPLOAD_TYPES = (".pdf", ".txt", ".md")
+FORM_MAX_FIELDS = 4
+FORM_FIELD_MAX_BYTES = 1024
+
+
+class UploadError(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class SpooledUpload:
+    def __init__(self, path, filename, size, sha256):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+
+    @property
+    def is_pdf(self):
+        return self.filename.lower().endswith(".pdf")
+
+
+class _FormSpool:
+    """MultipartParser callbacks: the "file" part is queued for the temp file, other fields kept in memory."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.fields = {}
+        self.filename = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.pending = []  # file bytes parsed from the current body chunk
+        self._headers = {}
+        self._header = b""
+        self._value = b""
+        self._name = None
+        self._is_file = False
+
+    def callbacks(self):
+        return {"on_part_begin": self.part_begin, "on_header_field": self.header_field,
+                "on_header_value": self.header_value, "on_header_end": self.header_end,
+                "on_headers_finished": self.headers_finished, "on_part_data": self.part_data}
+
+    def part_begin(self):
+        self._headers, self._header, self._value = {}, b"", b""
+
+    def header_field(self, data, start, end):
+        self._header += data[start:end]
+
+    def header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def header_end(self):
+        self._headers[self._header.lower()] = self._value
+        self._header, self._value = b"", b""
+
+    def headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        self._is_file = self._name == "file"
+        if self._is_file:
+            if self.filename is not None:
+                raise UploadError(400, 'Expected a single multipart "file" field')
+            self.filename = options.get(b"filename", b"").decode("utf-8", "replace")
+            if not self.filename.lower().endswith(UPLOAD_TYPES):
+                raise UploadError(415, f"Supported file types: {', '.join(UPLOAD_TYPES)}")
+        else:
+            if len(self.fields) >= FORM_MAX_FIELDS:
+                raise UploadError(400, "Too many form fields")
+            self.fields[self._name] = b""
+
+    def part_data(self, data, start, end):
+        chunk = data[start:end]
+        if not self._is_file:
+            value = self.fields[self._name] + chunk
+            if len(value) > FORM_FIELD_MAX_BYTES:
+                raise UploadError(400, f"Form field {self._name!r} is too large")
+            self.fields[self._name] = value
+            return
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadError(413, f"File exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit")
+        self.digest.update(chunk)
+        self.pending.append(chunk)
+
+
+@asynccontextmanager
+async def spool(request, max_bytes=UPLOAD_MAX_BYTES):
+    """Stream a multipart request's "file" part to a temp file under max_bytes.
+
+    Yields (SpooledUpload, other form fields as str); the file is removed on exit.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise UploadError(400, 'Expected a multipart/form-data body with a "file" field')
+    form = _FormSpool(max_bytes)
+    parser = MultipartParser(options[b"boundary"], form.callbacks())
+    fd, path = tempfile.mkstemp(prefix="upload-", dir=UPLOAD_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            try:
+                async for chunk in request.stream():
+                    parser.write(chunk)
+                    if form.pending:
+                        data = b"".join(form.pending)
+                        form.pending.clear()
+                        await asyncio.to_thread(out.write, data)
+                parser.finalize()
+            except MultipartParseError as e:
+                raise UploadError(400, f"Malformed multipart body: {e}")
+        if form.filename is None:
+            raise UploadError(400, 'Expected a multipart "file" field')
+        fields = {k: v.decode("utf-8", "replace") for k, v in form.fields.items()}
+        yield SpooledUpload(path, form.filename, form.size, form.digest.hexdigest()), fields
+    finally:
+        os.unlink(path)
+
+
+def pdf_page_count(path):
+    return len(PdfReader(path).pages)
+
+
+def pdf_page_texts(path, start, stop):
+    """Text of pages [start, stop); a page that fails to parse contributes ""."""
+    reader = PdfReader(path)
+    texts = []
+    for i in range(start, stop):
+        try:
+            texts.append(reader.pages[i].extract_text() or "")
+        except Exception:
+            texts.append("")
+    return texts
+
+
+def text_file_pieces(path):
+    """UTF-8 text file as line-aligned pieces of about SPOOL_CHUNK characters."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pieces = []
+    carry = ""
+    with open(path, "rb") as f:
+        while chunk := f.read(SPOOL_CHUNK):
+            text = carry + decoder.decode(chunk)
+            cut = text.rfind("\n") + 1
+            if cut:
+                pieces.append(text[:cut])
+                text = text[cut:]
+            carry = text
+    pieces.append(carry + decoder.decode(b"", final=True))
+    return pieces
+
+
+class Extractor:
+    def __init__(self, workers=EXTRACT_WORKERS, pages_per_task=EXTRACT_PAGES_PER_TASK, max_pages=UPLOAD_MAX_PAGES):
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.max_pages = max_pages
+        self._pool = None
+
+    def _executor(self):
+        # Started on first use; spawn so workers do not inherit the server's threads and sockets
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def pages(self, doc):
+        """Page texts of a spooled upload, enforcing the page limit before extracting."""
+        loop = asyncio.get_running_loop()
+        if not doc.is_pdf:
+            return await asyncio.to_thread(text_file_pieces, doc.path)
+        pool = self._executor()
+        try:
+            n_pages = await loop.run_in_executor(pool, pdf_page_count, doc.path)
+        except (PyPdfError, ValueError) as e:
+            raise UploadError(400, f"Could not read PDF: {e}")
+        if n_pages > self.max_pages:
+            raise UploadError(413, f"PDF has {n_pages} pages; the limit is {self.max_pages}")
+        ranges = [(i, min(i + self.pages_per_task, n_pages)) for i in range(0, n_pages, self.pages_per_task)]
+        parts = await asyncio.gather(*(loop.run_in_executor(pool, pdf_page_texts, doc.path, start, stop)
+                                       for start, stop in ranges))
+        return [text for part in parts for text in part]
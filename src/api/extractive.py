@@ -0,0 +1,102 @@
+import re
+
+import numpy as np
+
+from search import tokenize
+
+# Local extractive summarizer used when Gemini is unavailable or too slow.
+# Sentences become TF-IDF vectors, TextRank runs as a power iteration on
+# their cosine-similarity matrix, and the top-ranked sentences fill the same
+# fields as the LLM summary. Long documents are thinned to MAX_SENTENCES
+# evenly spaced sentences, which keeps a summary in the low milliseconds.
+MAX_SENTENCES = 200
+DAMPING = 0.85
+ITERATIONS = 30
+
+_SENT_SPLIT = re.compile(r"(?<=[.!?。！？])\s+")
+_YEAR = re.compile(r"\b(19[5-9]\d|20\d{2})\b")
+KEYWORD_STOPWORDS = frozenset("""
+    we our their its have has had over under between during using use used can may also these those such
+    results methods conclusion introduction study studies however which were been than both each other more
+    most not only all there they them then thus here while after before figure table shown data et al
+    but would could should one two into out about much very what when where who how why
+""".split())
+
+
+def _truncate(s, n):
+    return s if len(s) <= n else s[:n - 1] + "…"
+
+
+def _sentences(text):
+    sents = [s for s in _SENT_SPLIT.split(text) if len(s) >= 20]
+    if len(sents) > MAX_SENTENCES:
+        # Keep an even spread so long documents are represented end to end
+        keep = np.linspace(0, len(sents) - 1, MAX_SENTENCES).astype(int)
+        sents = [sents[i] for i in keep]
+    return [" ".join(s.split()) for s in sents]
+
+
+def _tfidf(token_lists):
+    vocab = {}
+    rows, cols = [], []
+    for i, tokens in enumerate(token_lists):
+        rows.extend([i] * len(tokens))
+        cols.extend(vocab.setdefault(t, len(vocab)) for t in tokens)
+    shape = (len(token_lists), max(len(vocab), 1))
+    flat = np.array(rows, dtype=np.int64) * shape[1] + np.array(cols, dtype=np.int64)
+    counts = np.bincount(flat, minlength=shape[0] * shape[1]).reshape(shape).astype(np.float32)
+    df = (counts > 0).sum(axis=0)
+    idf = np.log((1 + len(token_lists)) / (1 + df)).astype(np.float32) + 1
+    tfidf = np.log1p(counts) * idf
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    return tfidf / np.maximum(norms, 1e-9)
+
+
+def textrank(vectors):
+    sim = vectors @ vectors.T
+    np.fill_diagonal(sim, 0)
+    sim = np.clip(sim, 0, None)
+    out = sim.sum(axis=1, keepdims=True)
+    n = len(sim)
+    # Row-stochastic transitions; sentences with no neighbours jump uniformly
+    trans = np.where(out > 0, sim / np.maximum(out, 1e-9), 1.0 / n)
+    rank = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(ITERATIONS):
+        rank = (1 - DAMPING) / n + DAMPING * (trans.T @ rank)
+    return rank
+
+
+def keywords(token_lists, k=6):
+    counts = {}
+    for tokens in token_lists:
+        for t in tokens:
+            if len(t) >= 3 and not t.isdigit() and t not in KEYWORD_STOPWORDS:
+                counts[t] = counts.get(t, 0) + 1
+    return [t for t, _ in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:k]]
+
+
+def summarize(text, max_bullets=3):
+    """Extractive summary with the same keys as the LLM summary (tldr/objectives/science/timeline/keywords)."""
+    sents = _sentences(text)
+    if not sents:
+        sents = [" ".join(text.split())]
+    token_lists = [tokenize(s) for s in sents]
+    rank = textrank(_tfidf(token_lists)) if len(sents) > 1 else np.ones(1)
+    order = [int(i) for i in np.argsort(-rank, kind="stable")]
+
+    top = order[:max_bullets]
+    science = [i for i in order[max_bullets:] if i not in top][:3]
+    dated = sorted((int(m.group(0)), i) for i in order[:40] for m in [_YEAR.search(sents[i])] if m)
+    timeline, seen = [], set()
+    for year, i in dated:
+        if year not in seen and len(timeline) < 4:
+            seen.add(year)
+            timeline.append(_truncate(f"{year}: {sents[i]}", 140))
+
+    return {
+        "tldr": _truncate(sents[order[0]], 180),
+        "objectives": [_truncate(sents[i], 140) for i in sorted(top)],
+        "science": [_truncate(sents[i], 140) for i in sorted(science)],
+        "timeline": timeline,
+        "keywords": keywords(token_lists),
+    }
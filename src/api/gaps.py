@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+
+from snapshot import relabel
+
+# Research-gap engine. Every record is binned once into a
+# source x organism x topic x year count tensor, and the gap rules that
+# ResearchGaps.jsx used to run over the publication array are evaluated on
+# sums of that tensor, so a query is a slice instead of a pass over the
+# corpus. Filters the tensor has no axis for (text query, mission) arrive as
+# a row mask and are re-binned with a single bincount. The axes come from the
+# corpus columns' code arrays (see snapshot.py).
+LOW_COUNT_THRESHOLD = int(os.getenv("GAPS_LOW_COUNT", "10"))
+RECENT_YEARS = int(os.getenv("GAPS_RECENT_YEARS", "10"))
+DECLINE_MIN_OLD = 5
+DECLINE_RATIO = 0.4
+UNKNOWN_ORGANISM = "Unknown"
+DEFAULT_TOPIC = "General spaceflight effects"
+
+
+def stratified_order(strata, seed=0):
+    """All row indices ordered so that every prefix is a stratified sample.
+
+    The first row of every stratum comes first (largest strata first); after
+    that rows are taken by how much of their stratum is already used, so a
+    prefix of any length splits across strata in proportion to their size.
+    Within a stratum the order is random (fixed seed).
+    """
+    strata = np.asarray(strata)
+    n = len(strata)
+    if n == 0:
+        return np.arange(0)
+    rng = np.random.default_rng(seed)
+    _, inverse, sizes = np.unique(strata, return_inverse=True, return_counts=True)
+    shuffled = rng.permutation(n)
+    grouped = shuffled[np.argsort(inverse[shuffled], kind="stable")]
+    rank = np.empty(n, dtype=np.int64)
+    rank[grouped] = np.arange(n) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    size = sizes[inverse]
+    used = np.where(rank == 0, -size, rank / size)
+    return np.lexsort((rng.random(n), used, rank > 0))
+
+
+class GapEngine:
+    def __init__(self, columns):
+        """columns: a Snapshot or RecordColumns."""
+        self.n_rows = len(columns)
+        self.sources, self.source_codes = relabel(*columns.dictionary("source"), str)
+        self.organisms, self.organism_codes = relabel(
+            *columns.dictionary("organism"), lambda l: (l or UNKNOWN_ORGANISM).strip())
+        self.topics, self.topic_codes = relabel(*columns.dictionary("outcome"), lambda l: (l or DEFAULT_TOPIC).strip())
+        years = np.asarray(columns.year, dtype=np.int64)
+        known = years > 0
+        self.first_year = int(years[known].min()) if known.any() else 0
+        last_year = int(years[known].max()) if known.any() else 0
+        # Year axis: slot 0 holds undated records, slot i is first_year + i - 1
+        self.year_codes = np.where(known, years - self.first_year + 1, 0)
+        self.years = np.arange(self.first_year, last_year + 1) if known.any() else np.zeros(0, dtype=np.int64)
+
+        self.shape = (len(self.sources), len(self.organisms), len(self.topics), len(self.years) + 1)
+        self.cells = np.ravel_multi_index(
+            (self.source_codes, self.organism_codes, self.topic_codes, self.year_codes), self.shape)
+        self.tensor = np.bincount(self.cells, minlength=int(np.prod(self.shape))).reshape(self.shape)
+
+    def _codes(self, labels, values):
+        values = {v.lower() for v in ([values] if isinstance(values, str) else values)}
+        return [i for i, l in enumerate(labels) if l.lower() in values]
+
+    def _year_slots(self, year_from=None, year_to=None):
+        keep = np.ones(self.shape[3], dtype=bool)
+        if year_from is not None or year_to is not None:
+            keep[0] = False
+            if year_from is not None:
+                keep[1:] &= self.years >= year_from
+            if year_to is not None:
+                keep[1:] &= self.years <= year_to
+        return keep
+
+    def counts(self, mask=None, source=None, organism=None, year_from=None, year_to=None):
+        """organism x topic x year counts for a filter; mask restricts rows beyond the tensor axes."""
+        tensor = self.tensor if mask is None else np.bincount(
+            self.cells[mask], minlength=self.tensor.size).reshape(self.shape)
+        if source:
+            tensor = tensor[self._codes(self.sources, source)]
+        if organism:
+            tensor = tensor[:, self._codes(self.organisms, organism)]
+            labels = [self.organisms[i] for i in self._codes(self.organisms, organism)]
+        else:
+            labels = self.organisms
+        counts = tensor.sum(axis=0) * self._year_slots(year_from, year_to)
+        return counts, labels
+
+    def rows(self, mask=None, source=None, organism=None, year_from=None, year_to=None):
+        """Row mask for the same filter, used to pick representative records."""
+        rows = np.ones(self.n_rows, dtype=bool) if mask is None else mask.copy()
+        if source:
+            rows &= np.isin(self.source_codes, self._codes(self.sources, source))
+        if organism:
+            rows &= np.isin(self.organism_codes, self._codes(self.organisms, organism))
+        rows &= self._year_slots(year_from, year_to)[self.year_codes]
+        return rows
+
+    def detect(self, counts, organisms):
+        """The three rule-based gap checks, worded as the dashboard shows them."""
+        gaps = []
+
+        # 1) low count per organism
+        totals = counts.sum(axis=(1, 2))
+        for i in np.flatnonzero((totals > 0) & (totals < LOW_COUNT_THRESHOLD)):
+            gaps.append(f"📉 Few studies on {organisms[i]} → potential gap")
+
+        # 2) topic decline in the most recent RECENT_YEARS years (outcome as topic)
+        dated = counts[:, :, 1:]
+        topic_years = dated.sum(axis=0)
+        present = np.flatnonzero(topic_years.sum(axis=0))
+        if len(present):
+            split = present[-1] - (RECENT_YEARS - 1)
+            old = topic_years[:, :max(split, 0)].sum(axis=1)
+            new = topic_years[:, max(split, 0):].sum(axis=1)
+            for t in np.flatnonzero((old >= DECLINE_MIN_OLD) & (new < old * DECLINE_RATIO)):
+                gaps.append(f"⏳ Decline in {self.topics[t]} research in recent decade → possible knowledge gap")
+
+        # 3) research hiatus: runs of empty years between two active ones
+        active = dated.sum(axis=1) > 0
+        for i in range(len(organisms)):
+            years = self.years[np.flatnonzero(active[i])]
+            for prev, curr in zip(years[:-1], years[1:]):
+                if curr - prev > 1:
+                    gaps.append(f"⚠️ No {organisms[i]} studies between {prev + 1} and {curr - 1}")
+        return gaps
+
+    def topic_decades(self, counts):
+        decades = self.years // 10 * 10
+        out = {}
+        topic_years = counts[:, :, 1:].sum(axis=0)
+        for t in np.flatnonzero(topic_years.sum(axis=1)):
+            by_decade = np.bincount((decades - decades[0]) // 10, weights=topic_years[t]) if len(decades) else []
+            out[self.topics[t]] = {f"{decades[0] + 10 * d}s": int(c) for d, c in enumerate(by_decade) if c}
+        return out
+
+    def report(self, counts, organisms):
+        totals = counts.sum(axis=(1, 2))
+        org_years = counts[:, :, 1:].sum(axis=1)
+        return {
+            "total": int(totals.sum()),
+            "rule_based_gaps": self.detect(counts, organisms),
+            "organisms": {organisms[i]: int(totals[i]) for i in np.argsort(-totals, kind="stable") if totals[i]},
+            "organism_years": {organisms[i]: {int(y): int(c) for y, c in zip(self.years, org_years[i]) if c}
+                               for i in np.flatnonzero(totals)},
+            "topic_decades": self.topic_decades(counts),
+        }
+
+    def representatives(self, rows, k=None):
+        """Rows of a mask in stratified priority order over organism x decade; the first k if given."""
+        candidates = np.flatnonzero(rows)
+        decade = np.where(self.year_codes[candidates] > 0,
+                          (self.year_codes[candidates] - 1 + self.first_year) // 10, -1)
+        strata = self.organism_codes[candidates] * 1000 + decade + 1
+        return candidates[stratified_order(strata)[:k]]
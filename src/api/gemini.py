@@ -0,0 +1,219 @@
+import asyncio
+import contextvars
+import json
+import os
+import time
+
+import httpx
+
+from breaker import CircuitOpenError
+from metrics import GEMINI_ERRORS, GEMINI_LATENCY, GEMINI_QUEUE_WAIT, JSON_PARSE_FAILURES, PROMPT_CHARS, RESPONSE_CHARS
+
+# Async Gemini REST client shared by every request on the worker.
+# One pooled httpx client keeps connections alive between calls and a
+# semaphore caps how many upstream calls run at once. Latency (metrics and the
+# circuit breaker) is timed from when a call gets its slot, so a local queue
+# behind the semaphore is not mistaken for a slow Gemini; the wait for the slot
+# is measured on its own.
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "32"))
+GEMINI_KEEPALIVE = int(os.getenv("GEMINI_KEEPALIVE", "16"))
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5"))
+
+# Rate limiter for the calls made in the current context. Batch jobs set it
+# around each item, so every upstream call an item makes (map-reduce fan-out
+# included) takes a token and cache hits take none; interactive requests
+# leave it unset.
+call_limiter = contextvars.ContextVar("gemini_call_limiter", default=None)
+
+
+class GeminiError(Exception):
+    def __init__(self, message, kind="http"):
+        super().__init__(message)
+        self.kind = kind  # timeout, http, status or bad_response (metrics label)
+
+
+class GeminiClient:
+    def __init__(self, api_key, model=GEMINI_MODEL, base_url=GEMINI_BASE_URL,
+                 max_concurrency=GEMINI_MAX_CONCURRENCY,
+                 max_connections=GEMINI_MAX_CONNECTIONS,
+                 max_keepalive=GEMINI_KEEPALIVE, breaker=None):
+        self.api_key = api_key
+        self.breaker = breaker
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive)
+        self._client = None
+        self._sem = None
+
+    def url(self, method="generateContent"):
+        return f"{self.base_url}/models/{self.model}:{method}"
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self.limits,
+                                             headers={"x-goog-api-key": self.api_key})
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _pace(self):
+        limiter = call_limiter.get()
+        if limiter is not None:
+            await limiter.acquire()
+
+    def _admit(self, call, prompt):
+        if self.breaker is not None and not self.breaker.allow():
+            GEMINI_ERRORS.inc(call=call, kind="circuit_open")
+            raise CircuitOpenError("Gemini circuit breaker is open")
+        PROMPT_CHARS.observe(len(prompt))
+
+    async def _acquire(self, call):
+        """Wait for a concurrency slot; returns the time the upstream call starts."""
+        await self.start()
+        queued = time.monotonic()
+        try:
+            await self._sem.acquire()
+        except BaseException:
+            self._abandon()
+            raise
+        start = time.monotonic()
+        GEMINI_QUEUE_WAIT.observe(start - queued, call=call)
+        return start
+
+    def _finish(self, call, start, error=None):
+        """Record one finished call in the metrics and the circuit breaker."""
+        elapsed = time.monotonic() - start
+        GEMINI_LATENCY.observe(elapsed, call=call, outcome="ok" if error is None else "error")
+        if error is not None:
+            GEMINI_ERRORS.inc(call=call, kind=error.kind)
+        if self.breaker is not None:
+            self.breaker.record(error is not None, elapsed)
+
+    def _abandon(self):
+        # Cancelled or our own bug: not evidence about the upstream
+        if self.breaker is not None:
+            self.breaker.release()
+
+    async def generate(self, prompt, timeout=30):
+        """Run one generateContent call and return the candidate text."""
+        await self._pace()
+        self._admit("generate", prompt)
+        start = await self._acquire("generate")
+        try:
+            text = await self._generate(prompt, timeout)
+        except GeminiError as e:
+            self._finish("generate", start, e)
+            raise
+        except BaseException:
+            self._abandon()
+            raise
+        finally:
+            self._sem.release()
+        self._finish("generate", start)
+        RESPONSE_CHARS.observe(len(text))
+        return text
+
+    async def _generate(self, prompt, timeout):
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        t = httpx.Timeout(timeout, connect=min(GEMINI_CONNECT_TIMEOUT, timeout))
+        try:
+            response = await self._client.post(self.url(), json=payload, timeout=t)
+            response.raise_for_status()
+        except httpx.TimeoutException as e:
+            raise GeminiError(f"Gemini timed out after {timeout}s", "timeout") from e
+        except httpx.HTTPStatusError as e:
+            raise GeminiError(str(e), "status") from e
+        except httpx.HTTPError as e:
+            raise GeminiError(str(e)) from e
+        try:
+            result = response.json()
+        except ValueError as e:
+            raise GeminiError(f"Gemini returned invalid JSON: {response.text[:200]}", "bad_response") from e
+        return candidate_text(result)
+
+    async def stream_generate(self, prompt, timeout=30):
+        """Yield text deltas from streamGenerateContent (server-sent events)."""
+        await self._pace()
+        self._admit("stream", prompt)
+        start = await self._acquire("stream")
+        size = 0
+        try:
+            async for delta in self._stream_generate(prompt, timeout):
+                size += len(delta)
+                yield delta
+        except GeminiError as e:
+            self._finish("stream", start, e)
+            raise
+        except BaseException:
+            self._abandon()
+            raise
+        finally:
+            self._sem.release()
+        self._finish("stream", start)
+        RESPONSE_CHARS.observe(size)
+
+    async def _stream_generate(self, prompt, timeout):
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        t = httpx.Timeout(timeout, connect=min(GEMINI_CONNECT_TIMEOUT, timeout))
+        try:
+            async with self._client.stream("POST", self.url("streamGenerateContent"),
+                                           params={"alt": "sse"}, json=payload,
+                                           timeout=t) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    parts = stream_parts(line[5:])
+                    for part in parts:
+                        if part.get("text"):
+                            yield part["text"]
+        except httpx.TimeoutException as e:
+            raise GeminiError(f"Gemini timed out after {timeout}s", "timeout") from e
+        except httpx.HTTPStatusError as e:
+            raise GeminiError(str(e), "status") from e
+        except httpx.HTTPError as e:
+            raise GeminiError(str(e)) from e
+
+
+def stream_parts(data):
+    """Content parts of one SSE data payload; a malformed event is a bad_response, not a crash."""
+    try:
+        chunk = json.loads(data)
+        return ((chunk.get("candidates") or [{}])[0].get("content") or {}).get("parts") or []
+    except (ValueError, AttributeError, IndexError) as e:
+        raise GeminiError(f"Unexpected Gemini stream event: {data[:200]}", "bad_response") from e
+
+
+def candidate_text(result):
+    try:
+        return result["candidates"][0]["content"]["parts"][0]["text"].strip()
+    except (KeyError, IndexError, TypeError) as e:
+        raise GeminiError(f"Unexpected Gemini response: {str(result)[:200]}", "bad_response") from e
+
+
+def parse_json_text(result_text):
+    """Parse a JSON object from raw model output, stripping a ``` fence if present."""
+    if result_text.startswith("```"):
+        lines = result_text.split('\n')
+        json_lines = []
+        in_block = False
+        for line in lines:
+            if line.strip().startswith("```"):
+                in_block = not in_block
+                continue
+            if in_block:
+                json_lines.append(line)
+        result_text = '\n'.join(json_lines)
+    try:
+        return json.loads(result_text)
+    except json.JSONDecodeError:
+        JSON_PARSE_FAILURES.inc()
+        raise
@@ -0,0 +1,59 @@
+import os
+import shutil
+import time
+from pathlib import Path
+
+# Versioned on-disk index directories (corpus snapshot, TF-IDF matrix). Readers
+# memory-map the files, so a file is never rewritten in place: every build goes
+# into a fresh <directory>/v-<ns>-<pid> and the <directory>/current symlink is
+# swapped to it with os.replace, which is atomic. A reader resolves the link
+# once and opens every file from that version, so it sees one whole build. Old
+# versions are then unlinked, which leaves existing mappings valid; a build
+# that crashes before the swap is never pointed at.
+CURRENT = "current"
+STALE_BUILD_SECONDS = 3600
+
+
+def current(directory):
+    """Directory of the published version, or None if nothing is published."""
+    root = Path(directory)
+    try:
+        return root / os.readlink(root / CURRENT)
+    except OSError:
+        return None
+
+
+def publish(directory, write):
+    """Run write(path) on a new version directory, then make it current; returns its path."""
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    version = root / f"v-{time.time_ns()}-{os.getpid()}"
+    version.mkdir()
+    link = root / f"{CURRENT}.{os.getpid()}.tmp"
+    try:
+        write(version)
+        if link.is_symlink():
+            link.unlink()
+        os.symlink(version.name, link)
+        os.replace(link, root / CURRENT)
+    except BaseException:
+        shutil.rmtree(version, ignore_errors=True)
+        raise
+    _prune(root, version)
+    return version
+
+
+def _prune(root, keep):
+    for old in root.glob("v-*"):
+        if old == keep:
+            continue
+        # Another process may still be writing a version that has no meta.json yet
+        finished = (old / "meta.json").exists()
+        if finished or time.time() - old.stat().st_mtime > STALE_BUILD_SECONDS:
+            shutil.rmtree(old, ignore_errors=True)
+    # Files of the unversioned layout; unlinking them leaves open mappings intact
+    for old in [*root.glob("*.npy"), root / "meta.json"]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,34 @@
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+# Request body caps per route. A declared Content-Length over the limit is
+# answered 413 before anything is read; a chunked body is counted as it
+# arrives and cut off once it passes the limit, so an oversized JSON payload
+# is never buffered or parsed.
+
+
+class BodySizeLimit:
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits  # path -> max body bytes
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+        detail = f"Request body exceeds {limit} bytes"
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            return await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
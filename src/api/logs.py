@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Structured, sampled, non-blocking logging. Records are JSON lines with an
+# event name plus fields; the request path only enqueues them and a listener
+# thread formats and writes. Routine INFO records are sampled at
+# LOG_SAMPLE_RATE, while warnings, errors and anything marked keep=True
+# (e.g. slow requests) are always written.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+LOG_SLOW_SECONDS = float(os.getenv("LOG_SLOW_SECONDS", "2"))
+LOG_QUEUE_SIZE = 10000
+
+log = logging.getLogger("api")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"ts": round(record.created, 3), "level": record.levelname.lower(), "event": record.getMessage()}
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SampleFilter(logging.Filter):
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or getattr(record, "keep", False):
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Formatting happens on the listener thread, not here
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass  # Drop rather than block the event loop
+
+
+def event(level, name, keep=False, **fields):
+    if log.isEnabledFor(level):
+        log.log(level, name, extra={"fields": fields, "keep": keep})
+
+
+def setup_logging(stream=None):
+    """Attach the queue handler to the "api" logger and start the writer thread."""
+    q = queue.Queue(LOG_QUEUE_SIZE)
+    handler = _QueueHandler(q)
+    handler.addFilter(SampleFilter(LOG_SAMPLE_RATE))
+    log.handlers[:] = [handler]
+    log.setLevel(LOG_LEVEL)
+    log.propagate = False
+    out = logging.StreamHandler(stream or sys.stderr)
+    out.setFormatter(JsonFormatter())
+    listener = QueueListener(q, out)
+    listener.start()
+    return listener
+
+
+def log_request(method, route, status, elapsed):
+    slow = elapsed >= LOG_SLOW_SECONDS
+    event(logging.WARNING if status >= 500 else logging.INFO, "request", keep=slow,
+          method=method, route=route, status=status, ms=round(elapsed * 1000, 1), slow=slow)
@@ -0,0 +1,251 @@
+import asyncio
+import bisect
+import json
+import math
+import os
+import threading
+import time
+
+# Minimal Prometheus instrumentation: counters, gauges and cumulative
+# histograms with labels, rendered in the text exposition format by
+# GET /metrics. Updates are a dict lookup and a few integer adds under a lock,
+# cheap enough for every request and every upstream call.
+#
+# serve.py's forked workers each keep their own registry. With METRICS_DIR set
+# every worker writes its samples there (every METRICS_FLUSH_SECONDS and on
+# each scrape) and /metrics renders all workers' files, each series labelled
+# worker="<pid>", so whichever worker answers a scrape Prometheus sees the same
+# per-worker counters and can sum() them.
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "1"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(v):
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help, labels=(), fn=None):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.fn = fn  # unlabelled value read at scrape time instead of updated in place
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def _refresh(self):
+        if self.fn is not None:
+            with self._lock:
+                self._values[()] = self.fn()
+
+    def export(self):
+        """[[label values], value] pairs, JSON-ready."""
+        self._refresh()
+        with self._lock:
+            return [[list(key), self._copy(value)] for key, value in self._values.items()]
+
+    def _copy(self, value):
+        return value
+
+    def render(self, workers=None):
+        """Exposition lines for this process, or for [(worker, exported pairs)] from every worker."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if workers is None:
+            self._refresh()
+            with self._lock:
+                items = sorted(self._values.items())
+            for key, value in items:
+                lines.extend(self._samples(self.label_names, key, value))
+            return lines
+        names = self.label_names + ("worker",)
+        for worker, pairs in workers:
+            for key, value in sorted(pairs):
+                lines.extend(self._samples(names, tuple(key) + (worker,), value))
+        return lines
+
+    def _samples(self, names, key, value):
+        return [f"{self.name}{_labels(names, key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _copy(self, state):
+        return [list(state[0]), state[1], state[2]]
+
+    def _samples(self, names, key, state):
+        counts, total, n = state
+        lines = []
+        cumulative = 0
+        for bound, c in zip(self.buckets + (math.inf,), counts):
+            cumulative += c
+            labels = _labels(names + ("le",), key + (_number(bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        base = _labels(names, key)
+        lines.append(f"{self.name}_sum{base} {_number(total)}")
+        lines.append(f"{self.name}_count{base} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=(), fn=None):
+        return self.register(Counter(name, help, labels, fn))
+
+    def gauge(self, name, help, labels=(), fn=None):
+        return self.register(Gauge(name, help, labels, fn))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory):
+        """Write this worker's samples to <directory>/<pid>.json (atomically)."""
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        data = json.dumps({m.name: m.export() for m in self.metrics})
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def render_workers(self, directory):
+        """Every worker's last dump (this worker's fresh), each series labelled with its pid."""
+        self.dump(directory)
+        dumps = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    dumps.append((name[:-len(".json")], json.load(f)))
+            except (OSError, ValueError):
+                continue  # removed with its worker meanwhile
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render([(worker, data.get(metric.name, [])) for worker, data in dumps]))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_LATENCY = REGISTRY.histogram("http_request_duration_seconds", "Request latency by route",
+                                  ("method", "route", "status"))
+GEMINI_LATENCY = REGISTRY.histogram("gemini_request_duration_seconds", "Upstream Gemini call latency",
+                                    ("call", "outcome"))
+GEMINI_QUEUE_WAIT = REGISTRY.histogram("gemini_queue_wait_seconds",
+                                       "Wait for a local Gemini concurrency slot", ("call",))
+GEMINI_ERRORS = REGISTRY.counter("gemini_errors_total", "Failed Gemini calls by kind", ("call", "kind"))
+PROMPT_CHARS = REGISTRY.histogram("gemini_prompt_chars", "Prompt size in characters", (), SIZE_BUCKETS)
+RESPONSE_CHARS = REGISTRY.histogram("gemini_response_chars", "Response size in characters", (), SIZE_BUCKETS)
+JSON_PARSE_FAILURES = REGISTRY.counter("llm_json_parse_failures_total", "Model outputs that were not valid JSON")
+LOOP_LAG = REGISTRY.histogram("event_loop_lag_seconds", "Delay of a periodic event-loop tick", (), LAG_BUCKETS)
+
+
+async def flush_metrics(directory=METRICS_DIR, interval=METRICS_FLUSH_SECONDS):
+    """Keep this worker's file in METRICS_DIR current for scrapes answered by other workers."""
+    while True:
+        try:
+            REGISTRY.dump(directory)
+        except OSError:
+            pass
+        await asyncio.sleep(interval)
+
+
+async def monitor_loop_lag(interval=0.5):
+    """Sample how late the event loop runs a timer; a busy loop shows up as lag."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(time.perf_counter() - start - interval, 0.0))
+
+
+class RequestMetrics:
+    """ASGI middleware: per-route latency, measured until the last body chunk is sent."""
+
+    def __init__(self, app, on_request=None):
+        self.app = app
+        self.on_request = on_request
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            # Label by route template (/api/jobs/{job_id}) so cardinality stays bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            elapsed = time.perf_counter() - start
+            HTTP_LATENCY.observe(elapsed, method=scope["method"], route=route, status=status)
+            if self.on_request is not None:
+                self.on_request(scope["method"], route, status, elapsed)
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Local stand-in for generativelanguage.googleapis.com used by bench.py.
+# Serves generateContent and streamGenerateContent (SSE) under
+# /v1beta/models/{model}:{method}, answering summary or gap-analysis JSON
+# depending on the prompt. Point the API at it with
+#   GEMINI_BASE_URL=http://127.0.0.1:8090/v1beta
+# and run it with `uvicorn mock_gemini:app --port 8090`.
+MOCK_LATENCY = float(os.getenv("MOCK_LATENCY", "0.2"))      # mean seconds per call
+MOCK_JITTER = float(os.getenv("MOCK_JITTER", "0.05"))       # +/- uniform jitter
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))  # share of calls that fail
+MOCK_ERROR_STATUS = int(os.getenv("MOCK_ERROR_STATUS", "503"))
+MOCK_FENCED_RATE = float(os.getenv("MOCK_FENCED_RATE", "0.5"))  # share wrapped in ```json fences
+MOCK_INVALID_RATE = float(os.getenv("MOCK_INVALID_RATE", "0"))  # share that is not JSON at all
+MOCK_STREAM_CHUNKS = int(os.getenv("MOCK_STREAM_CHUNKS", "8"))
+
+app = FastAPI()
+stats = {"calls": 0, "errors": 0, "fenced": 0, "invalid": 0}
+
+SUMMARY = {
+    "tldr": "NASA plans a sustained lunar presence as a stepping stone to Mars.",
+    "objectives": ["Return humans to the Moon", "Build surface infrastructure", "Test Mars systems",
+                   "Expand commercial partnerships", "Advance life support"],
+    "science": ["Lunar geology", "Radiation biology", "In-situ resource use"],
+    "timeline": ["2008: Robotic lunar orbiter launch", "2020: Crewed lunar return", "2030s: Mars missions"],
+    "keywords": ["Moon", "Mars", "exploration", "habitat", "radiation", "robotics"],
+}
+GAP_ANALYSIS = {
+    "semantic_analysis": "The corpus concentrates on rodent and cell studies with little long-duration work.",
+    "key_insights": ["Few plant studies after 2015", "Human data is sparse", "Microbial work lacks replication",
+                     "Radiation and microgravity are rarely combined"],
+    "future_directions": ["Multi-generation plant growth", "Combined stressor designs", "Human tissue chips",
+                          "Standardized omics pipelines"],
+    "priority_areas": ["Radiation countermeasures", "Bone and muscle loss", "Closed-loop life support"],
+}
+
+
+def body_text(prompt):
+    if random.random() < MOCK_INVALID_RATE:
+        stats["invalid"] += 1
+        return "Sorry, I cannot produce JSON for this request."
+    payload = GAP_ANALYSIS if "semantic_analysis" in prompt else SUMMARY
+    text = json.dumps(payload, ensure_ascii=False, indent=2)
+    if random.random() < MOCK_FENCED_RATE:
+        stats["fenced"] += 1
+        text = f"```json\n{text}\n```"
+    return text
+
+
+def candidate(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+
+
+async def simulate():
+    """Sleep for the configured latency; returns an error response or None."""
+    stats["calls"] += 1
+    await asyncio.sleep(max(MOCK_LATENCY + random.uniform(-MOCK_JITTER, MOCK_JITTER), 0))
+    if random.random() < MOCK_ERROR_RATE:
+        stats["errors"] += 1
+        return JSONResponse({"error": {"code": MOCK_ERROR_STATUS, "message": "injected error"}},
+                            status_code=MOCK_ERROR_STATUS)
+    return None
+
+
+@app.post("/v1beta/models/{target}")
+async def models(target: str, request: Request):
+    _, _, method = target.partition(":")
+    body = await request.json()
+    prompt = body["contents"][0]["parts"][0]["text"]
+    error = await simulate()
+    if error is not None:
+        return error
+    text = body_text(prompt)
+    if method == "generateContent":
+        return candidate(text)
+    if method == "streamGenerateContent":
+        step = max(len(text) // MOCK_STREAM_CHUNKS, 1)
+
+        async def events():
+            for i in range(0, len(text), step):
+                yield f"data: {json.dumps(candidate(text[i:i + step]))}\n\n"
+                await asyncio.sleep(0)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+    return JSONResponse({"error": {"code": 404, "message": f"Unknown method {method}"}}, status_code=404)
+
+
+@app.get("/stats")
+async def mock_stats():
+    return stats
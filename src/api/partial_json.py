@@ -0,0 +1,83 @@
+import json
+
+# Incremental parser for a streamed top-level JSON object. Text arrives in
+# arbitrary chunks; each top-level field is returned as soon as its value is
+# complete. Anything before the first "{" or after the closing "}" (such as a
+# ``` fence) is ignored.
+
+
+class PartialObjectParser:
+    def __init__(self):
+        self.buf = ""
+        self.fields = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._expect = "key"  # key -> colon -> value -> comma
+        self._key = None
+        self._str_start = None
+        self._value_start = None
+
+    def feed(self, text):
+        """Append text and return a list of (key, value) fields completed by it."""
+        self.buf += text
+        completed = []
+        buf = self.buf
+        i = self._pos
+        n = len(buf)
+        while i < n and not self.done:
+            c = buf[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    if self._depth == 1:
+                        if self._expect == "key":
+                            self._key = json.loads(buf[self._str_start:i + 1])
+                            self._expect = "colon"
+                        elif self._expect == "value" and self._value_start == self._str_start:
+                            self._emit(buf[self._value_start:i + 1], completed)
+                i += 1
+                continue
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                i += 1
+                continue
+            if self._depth == 1 and self._expect == "value" and self._value_start is None and not c.isspace():
+                self._value_start = i
+            if c == '"':
+                self._in_str = True
+                self._str_start = i
+            elif c == ":" and self._depth == 1 and self._expect == "colon":
+                self._expect = "value"
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 1:
+                    # closing brace of the top-level object
+                    if self._expect == "value" and self._value_start is not None:
+                        self._emit(buf[self._value_start:i], completed)
+                    self.done = True
+                self._depth -= 1
+                if self._depth == 1 and self._expect == "value" and self._value_start is not None:
+                    self._emit(buf[self._value_start:i + 1], completed)
+            elif c == "," and self._depth == 1:
+                if self._expect == "value" and self._value_start is not None:
+                    self._emit(buf[self._value_start:i], completed)
+                self._expect = "key"
+            i += 1
+        self._pos = i
+        return completed
+
+    def _emit(self, raw, completed):
+        value = json.loads(raw.strip())
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+        self._expect = "comma"
+        self._value_start = None
@@ -0,0 +1,111 @@
+import os
+import zlib
+
+import numpy as np
+
+from chunking import estimate_tokens
+from corpus import record_year
+from search import tokenize
+
+# Token-aware prompt for /api/analyze-gaps. The template and the rule-based
+# gaps are costed first; publication lines then fill what is left of
+# GAPS_PROMPT_TOKENS, taken in stratified priority order (GapEngine.
+# representatives), so any number of matching publications gives a prompt of
+# bounded size that still spans organisms and decades. A line whose title is
+# a near-duplicate of one already included (MinHash Jaccard estimate at or
+# above GAPS_DEDUP_THRESHOLD) is skipped, so mission series and PMC/OSDR
+# twins do not crowd out the rest.
+GAPS_PROMPT_TOKENS = int(os.getenv("GAPS_PROMPT_TOKENS", "4000"))
+GAPS_DEDUP_THRESHOLD = float(os.getenv("GAPS_DEDUP_THRESHOLD", "0.7"))
+MINHASH_PERMUTATIONS = 64
+_PRIME = 4294967311  # smallest prime above 2**32, so a * h + b fits in uint64
+
+
+class MinHash:
+    def __init__(self, permutations=MINHASH_PERMUTATIONS, seed=0):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, permutations, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, permutations, dtype=np.uint64)
+
+    def signature(self, text):
+        """MinHash of the word unigrams and bigrams of text."""
+        tokens = tokenize(text)
+        shingles = set(tokens) | {f"{x} {y}" for x, y in zip(tokens, tokens[1:])}
+        if not shingles:
+            shingles = {text.strip().lower()}
+        h = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((np.outer(h, self.a) + self.b) % _PRIME).min(axis=0)
+
+
+_minhash = MinHash()
+
+
+def publication_line(pub):
+    title = pub.get('title') or 'Untitled'
+    organism = pub.get('organism') or 'Unknown'
+    year = pub.get('year') or 'N/A'
+    outcome = pub.get('outcome') or 'N/A'
+    return f"- [{year}] {organism}: {title[:80]} → {outcome[:60]}"
+
+
+def fit_publications(pubs, budget, max_lines=None, threshold=GAPS_DEDUP_THRESHOLD):
+    """Publications (in priority order) whose lines fit in `budget` tokens, near-duplicates skipped."""
+    kept = []
+    sigs = np.empty((max_lines or len(pubs), MINHASH_PERMUTATIONS), dtype=np.uint64)
+    used = 0
+    for pub in pubs:
+        if len(kept) == len(sigs):
+            break
+        cost = estimate_tokens(publication_line(pub)) + 1
+        if used + cost > budget:
+            break
+        sig = _minhash.signature(pub.get("title") or "")
+        if kept and (sigs[:len(kept)] == sig).mean(axis=1).max() >= threshold:
+            continue
+        sigs[len(kept)] = sig
+        kept.append(pub)
+        used += cost
+    return kept
+
+
+def gap_analysis_prompt(gaps, lines, total):
+    gaps_text = "\n".join(gaps) if gaps else "No rule-based gaps detected"
+    pub_text = "\n".join(lines)
+    return f"""You are an expert NASA space biology research analyst. Analyze the following research corpus and identified gaps to provide deep insights.
+
+**Rule-Based Gaps Detected:**
+{gaps_text}
+
+**Sample Publications from Corpus (showing {len(lines)} out of {total} total):**
+{pub_text}
+
+Your task: Provide a comprehensive research gap analysis in JSON format with these sections:
+
+1. **semantic_analysis** — A 2-3 sentence high-level interpretation of the research landscape and what the patterns reveal about NASA's space biology research priorities and blind spots.
+
+2. **key_insights** — 4-5 specific, actionable insights about research gaps, underexplored organisms, missing experimental conditions, or temporal patterns. Each insight should be 1-2 sentences.
+
+3. **future_directions** — 4-5 concrete suggestions for future research directions based on the gaps identified. Include specific organisms, experimental approaches, or research questions.
+
+4. **priority_areas** — 3-4 high-priority research areas that would have the most scientific impact if pursued, with brief justification.
+
+Return ONLY valid JSON:
+{{
+  "semantic_analysis": "<string>",
+  "key_insights": [<strings>],
+  "future_directions": [<strings>],
+  "priority_areas": [<strings>]
+}}
+
+IMPORTANT: Do NOT use markdown formatting (**, __, etc.) in your response strings. Use plain text only.
+Be specific, scientific, and actionable. Focus on space biology context."""
+
+
+def build_gap_prompt(gaps, pubs, total, budget=GAPS_PROMPT_TOKENS, max_lines=None):
+    """(prompt, publication lines) with the lines chosen to keep the prompt within budget tokens."""
+    fixed = estimate_tokens(gap_analysis_prompt(gaps, [], total))
+    sample = fit_publications(pubs, budget - fixed, max_lines)
+    sample.sort(key=record_year)  # oldest first reads as a timeline
+    lines = [publication_line(p) for p in sample]
+    return gap_analysis_prompt(gaps, lines, total), lines
+
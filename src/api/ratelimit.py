@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+# Async token bucket: `rate` tokens per second, bursts up to `capacity`.
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens=1):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class SharedTokenBucket:
+    """TokenBucket whose state lives in a shared.SharedStore, so every worker draws from one budget."""
+
+    def __init__(self, store, name, rate, capacity=None):
+        self.store = store
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+
+    async def acquire(self, tokens=1):
+        while True:
+            wait = await asyncio.to_thread(self.store.take_tokens, self.name, self.rate, self.capacity, tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import zlib
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from index_dir import current, publish
+from search import tokenize
+
+# "Similar publications" recommender. Title + abstract of every corpus record
+# is turned into a hashed TF-IDF vector (unigrams + bigrams, L2-normalized) and
+# stored column-major (CSC), so a query only touches the columns of its own
+# features. The arrays are saved as .npy files and opened with mmap_mode="r",
+# so workers start fast and share the pages through the OS page cache; a
+# rebuild is published as a new version (index_dir.py), never written over them.
+# A batch of queries is one sparse product against the matrix and one
+# argpartition over the (texts x docs) scores, SIMILAR_BATCH_BLOCK texts at a time.
+N_FEATURES = 1 << 18
+RECOMMENDER_DIR = os.getenv("RECOMMENDER_DIR", str(Path(__file__).resolve().parents[1] / "data" / "index" / "tfidf"))
+SIMILAR_BATCH_BLOCK = int(os.getenv("SIMILAR_BATCH_BLOCK", "64"))
+
+
+def _features(text):
+    tokens = tokenize(text)
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    # crc32 instead of hash(): feature ids must be stable across processes
+    return Counter(zlib.crc32(g.encode("utf-8")) % N_FEATURES for g in grams)
+
+
+def _doc_texts(columns):
+    return [f"{title}\n{abstract}" for title, abstract in zip(columns.text("title"), columns.text("abstract"))]
+
+
+def corpus_fingerprint(columns):
+    h = hashlib.sha256()
+    for rec_id, text in zip(columns.text("id"), _doc_texts(columns)):
+        h.update(rec_id.encode("utf-8"))
+        h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class Recommender:
+    def __init__(self, ids, idf, indptr, indices, data):
+        self.ids = ids
+        self.n_docs = len(ids)
+        self.idf = idf          # (N_FEATURES,) float32
+        self.indptr = indptr    # (N_FEATURES + 1,) int64, column pointers
+        self.indices = indices  # doc row per nonzero, int32
+        self.data = data        # tf-idf weight per nonzero, float32
+
+    @classmethod
+    def build(cls, columns):
+        rows = [_features(text) for text in _doc_texts(columns)]
+        df = np.zeros(N_FEATURES, dtype=np.int64)
+        cols, docs, tfs = [], [], []
+        for doc, tf in enumerate(rows):
+            cols.extend(tf)
+            docs.extend([doc] * len(tf))
+            tfs.extend(tf.values())
+        cols = np.array(cols, dtype=np.int64)
+        docs = np.array(docs, dtype=np.int32)
+        tfs = np.array(tfs, dtype=np.float32)
+        np.add.at(df, cols, 1)
+        idf = (np.log((1 + len(rows)) / (1 + df)) + 1).astype(np.float32)
+        weights = (1 + np.log(tfs)) * idf[cols]
+        norms = np.sqrt(np.bincount(docs, weights=weights.astype(np.float64) ** 2, minlength=len(rows)))
+        weights = (weights / np.maximum(norms[docs], 1e-12)).astype(np.float32)
+        order = np.argsort(cols, kind="stable")
+        indptr = np.zeros(N_FEATURES + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=N_FEATURES), out=indptr[1:])
+        return cls(columns.text("id"), idf, indptr, docs[order], weights[order])
+
+    def save(self, directory, fingerprint):
+        def write(path):
+            for name in ("idf", "indptr", "indices", "data"):
+                np.save(path / f"{name}.npy", getattr(self, name))
+            (path / "meta.json").write_text(json.dumps({"fingerprint": fingerprint, "ids": self.ids,
+                                                        "n_features": N_FEATURES}))
+
+        return publish(directory, write)
+
+    @classmethod
+    def load(cls, directory, fingerprint=None):
+        path = current(directory)
+        if path is None:
+            return None
+        try:
+            meta = json.loads((path / "meta.json").read_text())
+        except (OSError, ValueError):
+            return None
+        if meta.get("n_features") != N_FEATURES or (fingerprint and meta.get("fingerprint") != fingerprint):
+            return None
+        arrays = [np.load(path / f"{name}.npy", mmap_mode="r") for name in ("idf", "indptr", "indices", "data")]
+        return cls(meta["ids"], *arrays)
+
+    def vectorize(self, text):
+        tf = _features(text)
+        if not tf:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        cols = np.fromiter(tf.keys(), dtype=np.int64, count=len(tf))
+        weights = (1 + np.log(np.fromiter(tf.values(), dtype=np.float32, count=len(tf)))) * self.idf[cols]
+        return cols, weights / max(float(np.linalg.norm(weights)), 1e-12)
+
+    def scores(self, text):
+        """Cosine similarity of text against every document (sparse CSC mat-vec)."""
+        return self.batch_scores([text])[0]
+
+    def batch_scores(self, texts):
+        """(len(texts), n_docs) cosine scores: one gather of the texts' columns and one bincount."""
+        vecs = [self.vectorize(t) for t in texts]
+        cols = np.concatenate([c for c, _ in vecs]) if vecs else np.empty(0, dtype=np.int64)
+        weights = np.concatenate([w for _, w in vecs]) if vecs else np.empty(0, dtype=np.float32)
+        owner = np.repeat(np.arange(len(vecs)), [len(c) for c, _ in vecs])
+        lo, hi = self.indptr[cols], self.indptr[cols + 1]
+        lengths = hi - lo
+        # Flat positions of every nonzero in the selected columns
+        starts = np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+        pos = starts + np.arange(lengths.sum())
+        contrib = self.data[pos] * np.repeat(weights, lengths)
+        bins = np.repeat(owner, lengths) * self.n_docs + self.indices[pos]
+        scores = np.bincount(bins, weights=contrib, minlength=len(vecs) * self.n_docs)
+        return scores.reshape(len(vecs), self.n_docs).astype(np.float32)
+
+    def batch_top_k(self, texts, k, mask=None, block=SIMILAR_BATCH_BLOCK):
+        """(scores, top-k doc indices) per text, scored and ranked a block of texts at a time."""
+        for start in range(0, len(texts), block):
+            scores = self.batch_scores(texts[start:start + block])
+            yield from zip(scores, top_k(scores, k, mask))
+
+
+def top_k(scores, k, mask=None):
+    """Indices of the k best scores (descending) per row, or of one vector; zero and masked-out docs are skipped."""
+    if scores.ndim == 1:
+        return top_k(scores[None], k, mask)[0]
+    if mask is not None:
+        scores = np.where(mask, scores, 0)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return [np.empty(0, dtype=np.int64) for _ in scores]
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable"),
+                             axis=1)
+    return [row[s[row] > 0] for row, s in zip(top, scores)]
+
+
+def load_or_build(columns, directory=RECOMMENDER_DIR):
+    fingerprint = corpus_fingerprint(columns)
+    rec = Recommender.load(directory, fingerprint)
+    if rec is None:
+        rec = Recommender.build(columns)
+        try:
+            rec.save(directory, fingerprint)
+            rec = Recommender.load(directory, fingerprint) or rec
+        except OSError:
+            pass  # read-only deploy: keep the in-memory matrix
+    return rec
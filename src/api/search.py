@@ -0,0 +1,205 @@
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+from corpus import record_view
+from snapshot import dictionary_encode
+
+# BM25 search over the corpus. Each field keeps its own inverted index in
+# CSR form (per-term slices of doc ids and precomputed BM25 impacts), so a
+# query is a handful of vectorized adds instead of a scan over every record.
+FIELDS = ("title", "abstract", "organism", "mission")
+FIELD_WEIGHTS = {"title": 2.0, "abstract": 1.0, "organism": 1.5, "mission": 1.0}
+FACETS = ("organism", "mission", "year", "source")
+K1 = 1.2
+B = 0.75
+
+_TOKEN_SPLIT = re.compile(r"[^a-z0-9一-龥]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or that the this to was were with".split())
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKC", str(text or "")).lower()
+    return [t for t in _TOKEN_SPLIT.split(text) if t and t not in STOPWORDS]
+
+
+# The dashboard's result list (useSearch in src/hooks/useSearch.js) keeps a row
+# when 0.7 * (share of query tokens found in title/outcome/organism/year)
+# + 0.3 * (bigram Dice of the query and the title) > 0.3. match() is the same
+# rule, so the chart and the gaps count exactly the rows the list shows.
+MATCH_THRESHOLD = 0.3
+
+
+def match_norm(text):
+    """useSearch's norm(): lowercased, NFKC, trimmed."""
+    return unicodedata.normalize("NFKC", str(text or "").lower()).strip()
+
+
+def _bigrams(text):
+    return Counter(text[i:i + 2] for i in range(len(text) - 1))
+
+
+def _dice(a, a_grams, b, b_grams):
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    if not a_grams or not b_grams:
+        return 0.0
+    shared = sum(min(c, b_grams[g]) for g, c in a_grams.items() if g in b_grams)
+    return 2 * shared / (len(a) - 1 + len(b) - 1)
+
+
+class _Postings:
+    """CSR postings for one field: term id -> (doc ids, BM25 impacts)."""
+
+    def __init__(self, term_ids, doc_ids, tfs, n_terms, lengths, weight):
+        avg = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, tfs = term_ids[order], doc_ids[order], tfs[order]
+        self.offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=n_terms), out=self.offsets[1:])
+        self.doc_ids = doc_ids
+        norm = K1 * (1 - B + B * lengths[doc_ids] / avg)
+        self.impacts = (weight * tfs * (K1 + 1) / (tfs + norm)).astype(np.float32)
+
+    def get(self, tid):
+        lo, hi = self.offsets[tid], self.offsets[tid + 1]
+        return self.doc_ids[lo:hi], self.impacts[lo:hi]
+
+
+class SearchIndex:
+    def __init__(self, columns):
+        """columns: a Snapshot or RecordColumns; hits are read back as columns[doc]."""
+        self.columns = columns
+        self.n_docs = len(columns)
+        self.vocab = {}
+        triples = {f: ([], [], []) for f in FIELDS}
+        lengths = {f: np.zeros(self.n_docs, dtype=np.float32) for f in FIELDS}
+        for f in FIELDS:
+            tids, docs, counts = triples[f]
+            for doc, text in enumerate(columns.text(f)):
+                tokens = tokenize(text)
+                tf = Counter(tokens)
+                tids.extend(self.vocab.setdefault(t, len(self.vocab)) for t in tf)
+                docs.extend([doc] * len(tf))
+                counts.extend(tf.values())
+                lengths[f][doc] = len(tokens)
+
+        n_terms = len(self.vocab)
+        arrays = {f: (np.array(t, dtype=np.int64), np.array(d, dtype=np.int32), np.array(c, dtype=np.float32))
+                  for f, (t, d, c) in triples.items()}
+        # Document frequency counts a doc once even if the term is in several fields
+        pairs = np.sort(np.concatenate([t * max(self.n_docs, 1) + d for t, d, _ in arrays.values()]))
+        pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+        df = np.bincount(pairs // max(self.n_docs, 1), minlength=n_terms)
+        self.idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self.postings = {f: _Postings(*arrays[f], n_terms, lengths[f], FIELD_WEIGHTS[f]) for f in FIELDS}
+
+        # Facet columns: integer codes into a label table per facet ("" = missing)
+        self.years = np.asarray(columns.year, dtype=np.int32)
+        self.facet_labels = {}
+        self.facet_codes = {}
+        for facet in FACETS:
+            if facet == "year":
+                labels, codes = dictionary_encode([str(y) if y else "" for y in self.years.tolist()])
+            else:
+                labels, codes = columns.dictionary(facet)
+            self.facet_labels[facet] = labels
+            self.facet_codes[facet] = np.asarray(codes, dtype=np.int32)
+
+        # match(): normalized titles (and their bigrams) and the text query tokens are looked for in
+        self.match_titles = [match_norm(t) for t in columns.text("title")]
+        self.match_title_grams = [_bigrams(t) for t in self.match_titles]
+        self.match_texts = [" ".join((title, match_norm(outcome), match_norm(organism), str(year) if year else ""))
+                            for title, outcome, organism, year in zip(
+                                self.match_titles, columns.text("outcome"), columns.text("organism"),
+                                self.years.tolist())]
+
+    def filter_mask(self, organism=None, mission=None, source=None, year_from=None, year_to=None):
+        mask = np.ones(self.n_docs, dtype=bool)
+        for facet, value in (("organism", organism), ("mission", mission), ("source", source)):
+            if value:
+                labels = self.facet_labels[facet]
+                wanted = [i for i, l in enumerate(labels) if l.lower() == value.lower()]
+                mask &= np.isin(self.facet_codes[facet], wanted)
+        if year_from is not None:
+            mask &= self.years >= year_from
+        if year_to is not None:
+            mask &= self.years <= year_to
+        return mask
+
+    def match(self, query):
+        """Row mask of the dashboard's result list for query (see MATCH_THRESHOLD)."""
+        q = match_norm(query)
+        tokens = [t for t in _TOKEN_SPLIT.split(q) if t]
+        if not tokens:
+            return np.zeros(self.n_docs, dtype=bool)
+        hits = np.zeros(self.n_docs)
+        for token, n in Counter(tokens).items():
+            hits += n * np.fromiter((token in text for text in self.match_texts), dtype=bool, count=self.n_docs)
+        hit_score = 0.7 * (hits / len(tokens))
+        keep = hit_score > MATCH_THRESHOLD
+        # Dice (<= 1) only decides rows with some hits that are not already in
+        undecided = np.flatnonzero((hits > 0) & ~keep)
+        q_grams = _bigrams(q)
+        for doc in undecided.tolist():
+            fuzzy = _dice(q, q_grams, self.match_titles[doc], self.match_title_grams[doc])
+            keep[doc] = hit_score[doc] + 0.3 * fuzzy > MATCH_THRESHOLD
+        return keep
+
+    def score(self, query, fields=FIELDS):
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            idf = self.idf[tid]
+            for f in fields:
+                ids, impacts = self.postings[f].get(tid)
+                scores[ids] += idf * impacts
+        return scores
+
+    def facets(self, matched):
+        out = {}
+        for facet in FACETS:
+            counts = np.bincount(self.facet_codes[facet][matched], minlength=len(self.facet_labels[facet]))
+            nz = np.flatnonzero(counts)
+            order = nz[np.argsort(-counts[nz], kind="stable")]
+            out[facet] = {self.facet_labels[facet][i]: int(counts[i]) for i in order}
+        return out
+
+    def search(self, query="", page=1, page_size=10, fields=FIELDS, **filters):
+        mask = self.filter_mask(**filters)
+        if query and query.strip():
+            scores = self.score(query, fields)
+            matched = np.flatnonzero(mask & (scores > 0))
+            ranking = scores[matched]
+        else:
+            # No query: filtered browse, newest first
+            scores = None
+            matched = np.flatnonzero(mask)
+            ranking = self.years[matched].astype(np.float32)
+
+        total = len(matched)
+        start = (page - 1) * page_size
+        end = min(start + page_size, total)
+        hits = []
+        if start < total:
+            if end < total:
+                # Keep every row tied with the end-th best, so the doc-id tie-break below
+                # (not argpartition's arbitrary pick) decides which of them reach this page
+                cutoff = -np.partition(-ranking, end - 1)[end - 1]
+                top = np.flatnonzero(ranking >= cutoff)
+            else:
+                top = np.arange(total)
+            top = top[np.lexsort((matched[top], -ranking[top]))][start:end]
+            for doc in matched[top]:
+                hit = record_view(self.columns[doc])
+                hit["score"] = round(float(scores[doc]), 4) if scores is not None else None
+                hits.append(hit)
+        return {"total": total, "page": page, "page_size": page_size,
+                "results": hits, "facets": self.facets(matched)}
@@ -0,0 +1,117 @@
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+# Production launcher: imports the app once, then forks --workers uvicorn
+# processes that accept on one shared listening socket. The corpus, search
+# index, facet bitmaps, recommender matrix and gap tensor are all built at
+# import, before the fork, so workers share those pages copy-on-write instead
+# of each building a copy; gc.freeze() stops the collector from dirtying them.
+# The response cache (CACHE_DB) and the cross-worker state (SHARED_STATE_DB)
+# default to SQLite files under SERVE_STATE_DIR, so every worker sees the same
+# cached answers, the same batch rate limit and the same in-flight Gemini calls.
+# Each worker also writes its metrics to METRICS_DIR, so /metrics on any worker
+# reports every worker's series, labelled worker="<pid>".
+# A worker that dies is restarted; SIGTERM/SIGINT drain all of them.
+#
+#   python serve.py --host 0.0.0.0 --port 10000 --workers 4
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+SERVE_STATE_DIR = os.getenv("SERVE_STATE_DIR", ".cache")
+
+
+def listen(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main(args):
+    os.environ.setdefault("CACHE_DB", os.path.join(SERVE_STATE_DIR, "response_cache.sqlite"))
+    os.environ.setdefault("SHARED_STATE_DB", os.path.join(SERVE_STATE_DIR, "shared_state.sqlite"))
+    metrics_dir = os.environ.setdefault("METRICS_DIR", os.path.join(SERVE_STATE_DIR, "metrics"))
+    os.makedirs(metrics_dir, exist_ok=True)
+    for name in os.listdir(metrics_dir):  # series of a previous run's workers
+        if name.endswith((".json", ".tmp")):
+            os.remove(os.path.join(metrics_dir, name))
+
+    start = time.perf_counter()
+    import summarize  # preload everything the workers only read
+    gc.collect()
+    gc.freeze()
+    print(f"[serve] preloaded {len(summarize.corpus_records)} records in {time.perf_counter() - start:.1f}s; "
+          f"starting {args.workers} workers on {args.host}:{args.port}", file=sys.stderr)
+
+    sock = listen(args.host, args.port)
+    config = uvicorn.Config(summarize.app, log_level=args.log_level, proxy_headers=True,
+                            forwarded_allow_ips=args.forwarded_allow_ips,
+                            timeout_keep_alive=args.timeout_keep_alive)
+    workers = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                uvicorn.Server(config).run(sockets=[sock])
+                code = 0
+            finally:
+                os._exit(code)
+        workers[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for _ in range(args.workers):
+        spawn()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None:
+            continue
+        try:
+            os.remove(os.path.join(metrics_dir, f"{pid}.json"))  # its series end with it
+        except OSError:
+            pass
+        if stopping:
+            continue
+        print(f"[serve] worker {pid} exited with {os.waitstatus_to_exitcode(status)}; restarting", file=sys.stderr)
+        if time.monotonic() - started < 1:
+            time.sleep(1)  # do not spin if it dies at startup
+        spawn()
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run the API with N preforked workers sharing one preloaded corpus")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    ap.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    ap.add_argument("--log-level", default="info")
+    ap.add_argument("--forwarded-allow-ips", default=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"))
+    ap.add_argument("--timeout-keep-alive", type=int, default=5)
+    sys.exit(main(ap.parse_args()))
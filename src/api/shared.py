@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# State shared by the worker processes that serve.py forks: one local SQLite
+# file (WAL) holding
+#   leases      which worker is calling Gemini for a cache key, so identical
+#               requests landing on different workers make one upstream call
+#   buckets     token-bucket state, so BATCH_RPM is a limit for the whole host
+#   jobs        batch job status, so any worker can answer /api/jobs/{id}
+# Unset SHARED_STATE_DB (the single-process default) and none of this is used.
+SHARED_STATE_DB = os.getenv("SHARED_STATE_DB", "")
+SHARED_LEASE_TTL = float(os.getenv("SHARED_LEASE_TTL", "120"))
+SHARED_POLL_SECONDS = float(os.getenv("SHARED_POLL_SECONDS", "0.1"))
+
+
+class SharedStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._db()
+
+    def _db(self):
+        # A SQLite connection must not cross fork(); each worker opens its own
+        if self._pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL,"
+                               " expires_at REAL NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL,"
+                               " updated_at REAL NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, options TEXT NOT NULL,"
+                               " created_at REAL NOT NULL, finished_at REAL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS job_items (job_id TEXT NOT NULL, idx INTEGER NOT NULL,"
+                               " item TEXT NOT NULL, PRIMARY KEY (job_id, idx))")
+            self._pid = os.getpid()
+        return self._conn
+
+    def acquire_lease(self, key, owner, ttl):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM leases WHERE key = ? AND expires_at < ?", (key, now))
+            cur = db.execute("INSERT OR IGNORE INTO leases VALUES (?, ?, ?)", (key, owner, now + ttl))
+            return cur.rowcount == 1
+
+    def release_lease(self, key, owner):
+        with self._lock:
+            self._db().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def take_tokens(self, name, rate, capacity, tokens=1):
+        """Take tokens from a host-wide bucket; returns 0 on success or the seconds to wait."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            with db:  # commits, or rolls back on error
+                row = db.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+                have = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                wait = 0.0 if have >= tokens else (tokens - have) / rate
+                if not wait:
+                    have -= tokens
+                db.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (name, have, now))
+        return wait
+
+    def save_job(self, job_id, options, items, created_at):
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            with db:
+                db.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, NULL)",
+                           (job_id, json.dumps(options), created_at))
+                db.executemany("INSERT OR REPLACE INTO job_items VALUES (?, ?, ?)",
+                               [(job_id, i, json.dumps(item, ensure_ascii=False)) for i, item in enumerate(items)])
+
+    def save_item(self, job_id, idx, item, finished_at=None):
+        with self._lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO job_items VALUES (?, ?, ?)",
+                       (job_id, idx, json.dumps(item, ensure_ascii=False)))
+            db.execute("UPDATE jobs SET finished_at = ? WHERE id = ?", (finished_at, job_id))
+
+    def load_job(self, job_id):
+        """(options, items, created_at, finished_at) as last written by the owning worker, or None."""
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT options, created_at, finished_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            items = [json.loads(r[0]) for r in db.execute(
+                "SELECT item FROM job_items WHERE job_id = ? ORDER BY idx", (job_id,))]
+        return json.loads(row[0]), items, row[1], row[2]
+
+    def expire_jobs(self, ttl):
+        cutoff = time.time() - ttl
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM job_items WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)", (cutoff,))
+            db.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._pid = None
+
+
+class Leases:
+    """Cross-worker mutex per key with a TTL, so a crashed holder cannot block a key for ever."""
+
+    def __init__(self, store, ttl=SHARED_LEASE_TTL, poll=SHARED_POLL_SECONDS):
+        self.store = store
+        self.ttl = ttl
+        self.poll = poll
+        self._token = uuid.uuid4().hex
+
+    @property
+    def owner(self):
+        # Workers are forked after this object exists, so the pid tells them apart
+        return f"{os.getpid()}-{self._token}"
+
+    async def acquire(self, key):
+        return await asyncio.to_thread(self.store.acquire_lease, key, self.owner, self.ttl)
+
+    async def release(self, key):
+        await asyncio.to_thread(self.store.release_lease, key, self.owner)
+
+
+def build_shared():
+    return SharedStore(SHARED_STATE_DB) if SHARED_STATE_DB else None
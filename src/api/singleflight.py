@@ -0,0 +1,53 @@
+import asyncio
+
+# Coalesce identical in-flight calls: the first caller for a key starts the
+# work, concurrent callers with the same key await the same task. With
+# `leases` (shared.Leases) this also holds across worker processes: only the
+# worker holding the key's lease calls fn(), the others poll `recheck` (the
+# shared cache) until the result lands or the lease frees up.
+
+
+class SingleFlight:
+    def __init__(self, leases=None):
+        self.leases = leases
+        self._inflight = {}
+        self.stats = {"leaders": 0, "shared": 0, "remote": 0}
+
+    def __len__(self):
+        return len(self._inflight)
+
+    async def do(self, key, fn, recheck=None):
+        """Run ``fn()`` once per key among concurrent callers and share its result."""
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["leaders"] += 1
+            task = asyncio.ensure_future(self._lead(key, fn, recheck))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.stats["shared"] += 1
+        # Shield so one disconnecting client does not cancel the shared call
+        return await asyncio.shield(task)
+
+    async def _lead(self, key, fn, recheck):
+        if self.leases is None or recheck is None:
+            return await fn()
+        while True:
+            if await self.leases.acquire(key):
+                try:
+                    # The previous holder may have stored the result just before releasing
+                    value = await recheck()
+                    return value if value is not None else await fn()
+                finally:
+                    await self.leases.release(key)
+            await asyncio.sleep(self.leases.poll)
+            value = await recheck()
+            if value is not None:
+                self.stats["remote"] += 1
+                return value
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every waiter went away
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from corpus import CORPUS_CSV, DATA_DIR, OSDR_JSON, load_corpus, record_year
+from index_dir import current, publish
+
+# Columnar corpus snapshot: one directory of .npy files that are opened with
+# mmap_mode="r", so loading is a few page-table entries rather than a CSV
+# parse.
+#   dictionary columns  organism/mission/source/outcome: int32 codes + labels in meta.json
+#   typed columns       year (int16, 0 = unknown), date (datetime64[D], NaT = unknown)
+#   string columns      Arrow-style layout: int64 offsets + one UTF-8 byte buffer
+#
+# FacetIndex, GapEngine and SearchIndex are built from these columns
+# (dictionary(), text(), year), so the facet bitmaps and the gap tensor come
+# straight from the code arrays; a row becomes a dict only when it is read
+# (snapshot[i]), e.g. for a search hit. RecordColumns gives a list of record
+# dicts the same interface, for posted records or when there is no snapshot.
+#
+# Build explicitly with `python snapshot.py [out_dir]`; the API also rebuilds it
+# at startup whenever the source files change. Each build is a new version
+# published atomically (index_dir.py), so mapped columns are never rewritten.
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", str(DATA_DIR / "index" / "snapshot"))
+SNAPSHOT_VERSION = 1
+
+DICT_COLUMNS = ("source", "organism", "mission", "outcome")
+STRING_COLUMNS = ("id", "title", "abstract", "link", "pmcid", "pmid", "doi", "author")
+
+
+def source_fingerprint(paths=(CORPUS_CSV, OSDR_JSON)):
+    h = hashlib.sha256(str(SNAPSHOT_VERSION).encode())
+    for p in paths:
+        if p and os.path.exists(p):
+            st = os.stat(p)
+            h.update(f"{os.path.abspath(p)}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def dictionary_encode(values):
+    """(sorted labels, int64 code per value)."""
+    labels = sorted(set(values))
+    index = {v: i for i, v in enumerate(labels)}
+    return labels, np.array([index[v] for v in values], dtype=np.int64)
+
+
+def relabel(labels, codes, fn):
+    """A dictionary column with every label mapped through fn; labels that become equal share a code."""
+    new_labels, lookup = dictionary_encode([fn(l) for l in labels])
+    return new_labels, lookup[np.asarray(codes)]
+
+
+def _encode_strings(values):
+    blobs = [(v or "").encode("utf-8") for v in values]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in blobs], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(blobs), dtype=np.uint8)
+
+
+def write_snapshot(records, directory=SNAPSHOT_DIR, fingerprint=None):
+    return publish(directory, lambda path: _write_columns(records, path, fingerprint))
+
+
+def _write_columns(records, path, fingerprint):
+    meta = {"version": SNAPSHOT_VERSION, "rows": len(records), "fingerprint": fingerprint, "labels": {}}
+    for col in DICT_COLUMNS:
+        labels, codes = dictionary_encode([r.get(col) or "" for r in records])
+        np.save(path / f"{col}.codes.npy", codes.astype(np.int32))
+        meta["labels"][col] = labels
+    np.save(path / "year.npy", np.array([r.get("year") or 0 for r in records], dtype=np.int16))
+    np.save(path / "date.npy", np.array([r.get("date") or "NaT" for r in records], dtype="datetime64[D]"))
+    for col in STRING_COLUMNS:
+        offsets, data = _encode_strings([r.get(col) for r in records])
+        np.save(path / f"{col}.offsets.npy", offsets)
+        np.save(path / f"{col}.data.npy", data)
+    (path / "meta.json").write_text(json.dumps(meta))
+
+
+class StringColumn:
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        data = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        return (data[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:]))
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+
+class Snapshot:
+    def __init__(self, directory):
+        path = Path(directory)
+        self.meta = json.loads((path / "meta.json").read_text())
+        self.rows = self.meta["rows"]
+        self.labels = self.meta["labels"]
+        self.codes = {c: np.load(path / f"{c}.codes.npy", mmap_mode="r") for c in DICT_COLUMNS}
+        self.year = np.load(path / "year.npy", mmap_mode="r")
+        self.date = np.load(path / "date.npy", mmap_mode="r")
+        self.strings = {c: StringColumn(np.load(path / f"{c}.offsets.npy", mmap_mode="r"),
+                                        np.load(path / f"{c}.data.npy", mmap_mode="r"))
+                        for c in STRING_COLUMNS}
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, i):
+        return self.row(i)
+
+    def __iter__(self):
+        return (self.row(i) for i in range(self.rows))
+
+    def dictionary(self, column):
+        """(labels, code per row) of a dictionary column; missing values are ""."""
+        return self.labels[column], self.codes[column]
+
+    def text(self, column):
+        """Every row's value of a string or dictionary column as str ("" when missing)."""
+        if column in self.strings:
+            return list(self.strings[column])
+        labels = self.labels[column]
+        return [labels[c] for c in self.codes[column].tolist()]
+
+    def row(self, i):
+        rec = {c: self.strings[c][i] for c in STRING_COLUMNS}
+        rec.update({c: self.labels[c][self.codes[c][i]] for c in DICT_COLUMNS})
+        rec["year"] = int(self.year[i]) or None
+        rec["date"] = None if np.isnat(self.date[i]) else str(self.date[i])
+        return rec
+
+
+class RecordColumns:
+    """The Snapshot column interface over a list of record dicts."""
+
+    def __init__(self, records):
+        self.records = records
+        self.rows = len(records)
+        self.year = np.array([record_year(r) for r in records], dtype=np.int64)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, i):
+        return self.records[i]
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def dictionary(self, column):
+        return dictionary_encode(self.text(column))
+
+    def text(self, column):
+        return [str(r.get(column) or "") for r in self.records]
+
+
+def load_snapshot(directory=SNAPSHOT_DIR, fingerprint=None):
+    path = current(directory)
+    if path is None:
+        return None
+    try:
+        snap = Snapshot(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    if snap.meta.get("version") != SNAPSHOT_VERSION:
+        return None
+    if fingerprint and snap.meta.get("fingerprint") != fingerprint:
+        return None
+    return snap
+
+
+def load_or_build_snapshot(directory=SNAPSHOT_DIR):
+    fingerprint = source_fingerprint()
+    snap = load_snapshot(directory, fingerprint)
+    if snap is None:
+        try:
+            write_snapshot(load_corpus(), directory, fingerprint)
+            snap = load_snapshot(directory, fingerprint)
+        except OSError:
+            snap = None
+    return snap
+
+
+if __name__ == "__main__":
+    out = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_DIR
+    records = load_corpus()
+    write_snapshot(records, out, source_fingerprint())
+    print(f"[DONE] snapshot={out} rows={len(records)}")
@@ -1,17 +1,65 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import os
 import json
-import requests
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from pathlib import Path
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from starlette.staticfiles import StaticFiles
 
 load_dotenv()
 
-app = FastAPI()
+from batch import JobManager
+from breaker import CircuitBreaker
+from cache import build_cache, make_key
+from chunking import split_document, split_pages
+from corpus import load_corpus, record_view
+from crosslinks import load_or_update as load_crosslinks
+from extractive import summarize as extractive_summary
+from extract import UPLOAD_MAX_BYTES, Extractor, UploadError, spool
+from facets import FacetIndex
+from gaps import GapEngine
+from gemini import GeminiClient, parse_json_text
+from limits import BodySizeLimit
+from logs import event, log_request, setup_logging
+from metrics import METRICS_DIR, REGISTRY, RequestMetrics, flush_metrics, monitor_loop_lag
+from partial_json import PartialObjectParser
+from prompts import GAPS_PROMPT_TOKENS, build_gap_prompt
+from recommend import corpus_fingerprint, load_or_build
+from search import FIELDS, SearchIndex, match_norm
+from shared import Leases, build_shared
+from snapshot import RecordColumns, load_or_build_snapshot
+from singleflight import SingleFlight
+from summary_store import SUMMARY_MAX_BULLETS, SUMMARY_MIN_CHARS, SummaryStore, summary_text, text_hash
+
+@asynccontextmanager
+async def lifespan(app):
+    log_listener = setup_logging()
+    lag_monitor = asyncio.create_task(monitor_loop_lag())
+    # Under serve.py, publish this worker's metrics for scrapes other workers answer
+    metrics_flusher = asyncio.create_task(flush_metrics()) if METRICS_DIR else None
+    await gemini.start()
+    yield
+    lag_monitor.cancel()
+    if metrics_flusher is not None:
+        metrics_flusher.cancel()
+    await jobs.close()
+    extractor.close()
+    await gemini.close()
+    if cache.disk is not None:
+        cache.disk.close()
+    if shared is not None:
+        shared.close()
+    summary_store.close()
+    log_listener.stop()
+
+app = FastAPI(lifespan=lifespan)
+# Per-route latency histograms for /metrics, plus sampled structured request logs
+app.add_middleware(RequestMetrics, on_request=log_request)
 
 # CORS setup (reads from env, falls back to permissive in dev)
 raw_origins = os.getenv("ALLOWED_ORIGINS", "*")
@@ -40,12 +88,74 @@ if not GEMINI_API_KEY:
     raise RuntimeError("GEMINI_API_KEY not found in environment variables")
 
 # Use REST API directly to avoid SDK version issues
-# Use gemini-2.5-flash (latest available model for your key)
-GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
+# Shared async client: pooled keep-alive connections, bounded concurrency
+# A circuit breaker fails calls fast while Gemini is erroring or slow
+breaker = CircuitBreaker()
+gemini = GeminiClient(GEMINI_API_KEY, breaker=breaker)
+SUMMARIZE_TIMEOUT = float(os.getenv("SUMMARIZE_TIMEOUT", "30"))
+ANALYZE_GAPS_TIMEOUT = float(os.getenv("ANALYZE_GAPS_TIMEOUT", "40"))
+
+# Degraded mode: serve a local extractive summary when Gemini fails, and
+# (if SUMMARIZE_HEDGE_SLO > 0) when it has not answered within that many seconds
+SUMMARIZE_FALLBACK = os.getenv("SUMMARIZE_FALLBACK", "1") != "0"
+SUMMARIZE_HEDGE_SLO = float(os.getenv("SUMMARIZE_HEDGE_SLO", "0"))
+
+# Long documents are summarized chunk by chunk (map) and then merged (reduce)
+SUMMARIZE_CHUNK_CHARS = int(os.getenv("SUMMARIZE_CHUNK_CHARS", "8000"))
+SUMMARIZE_CHUNK_OVERLAP = int(os.getenv("SUMMARIZE_CHUNK_OVERLAP", "400"))
+SUMMARIZE_MAX_CHUNKS = int(os.getenv("SUMMARIZE_MAX_CHUNKS", "24"))
+SUMMARIZE_TOKEN_BUDGET = int(os.getenv("SUMMARIZE_TOKEN_BUDGET", "100000"))
+SUMMARIZE_MAP_CONCURRENCY = int(os.getenv("SUMMARIZE_MAP_CONCURRENCY", "4"))
+
+# Response cache keyed by a hash of the prompt inputs (set CACHE_DB for a disk tier)
+cache = build_cache()
+# SQLite state shared by the workers serve.py forks (SHARED_STATE_DB); None in one process
+shared = build_shared()
+# Identical concurrent requests share one upstream call, across workers too when shared
+flights = SingleFlight(Leases(shared) if shared is not None else None)
+
+# Read-only corpus (enriched PMC CSV + OSDR studies) and its search index.
+# The columnar snapshot is memory-mapped and rebuilt only when the sources change;
+# the indexes below are built from its columns and corpus_records[i] reads one row.
+corpus_records = load_or_build_snapshot()
+if corpus_records is None:
+    corpus_records = RecordColumns(load_corpus())  # read-only deploy without a snapshot
+search_index = SearchIndex(corpus_records)
+# Per-value row bitmaps for facet counts and year histograms
+facet_index = FacetIndex(corpus_records, cache_entries=int(os.getenv("AGGREGATE_CACHE_ENTRIES", "4096")))
+# Hashed TF-IDF matrix for "similar publications", memory-mapped from disk
+recommender = load_or_build(corpus_records)
+# Organism/topic/year count tensor behind the rule-based research gaps
+gap_engine = GapEngine(corpus_records)
+# Part of every corpus-derived AI cache key, so a changed corpus never serves old answers
+corpus_version = corpus_fingerprint(corpus_records)
+# Precomputed per-record summaries (python summary_store.py) looked up by PMCID / dataset_id
+summary_store = SummaryStore()
+record_ids = {rec_id: i for i, rec_id in enumerate(corpus_records.text("id"))}
+# PMC publication <-> OSDR study links, re-matched incrementally when a source file changes
+crosslinks = load_crosslinks()
+# Gap-analysis prompts list at most this many publications, within GAPS_PROMPT_TOKENS
+GAPS_SAMPLE_SIZE = int(os.getenv("GAPS_SAMPLE_SIZE", "150"))
+GAPS_MAX_BODY_BYTES = int(os.getenv("GAPS_MAX_BODY_BYTES", str(2 * 1024 * 1024)))
+# Legacy clients post the publication list itself; refuse oversized bodies unread.
+# Uploads get the file limit plus room for the multipart framing and form fields,
+# so a chunked upload is cut off before it is spooled to disk.
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+app.add_middleware(BodySizeLimit, limits={"/api/analyze-gaps": GAPS_MAX_BODY_BYTES,
+                                          "/api/summarize/upload": UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD})
+
+# Uploaded PDFs are parsed in a process pool, off the event loop
+extractor = Extractor()
+
+# Background worker pool for /api/summarize/batch, paced by BATCH_RPM
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "2000"))
+jobs = JobManager(lambda text, options: summarize_batch_item(text, options), store=shared)
 
 class SummarizeRequest(BaseModel):
     text: str
     max_bullets: int = 3
+    # Seconds to wait for Gemini before answering locally; overrides SUMMARIZE_HEDGE_SLO
+    hedge_after: float | None = None
 
 class SummarizeResponse(BaseModel):
     tldr: str
@@ -54,29 +164,61 @@ class SummarizeResponse(BaseModel):
     timeline: list[str]
     keywords: list[str]
 
+SUMMARY_SECTIONS = ("tldr", "objectives", "science", "timeline", "keywords")
+SECTION_LIMITS = {"tldr": None, "science": 5, "timeline": 4, "keywords": 6}
+
+class BatchDocument(BaseModel):
+    id: str | None = None
+    text: str
+
+class BatchSummarizeRequest(BaseModel):
+    documents: list[BatchDocument]
+    max_bullets: int = 3
+
+class BatchJobResponse(BaseModel):
+    job_id: str
+    total: int
+
+class SimilarRequest(BaseModel):
+    text: str
+    k: int = 10
+    source: str | None = None
+
+class SimilarBatchRequest(BaseModel):
+    texts: list[str]
+    k: int = 10
+    source: str | None = None
+
+class GapFilter(BaseModel):
+    q: str = ""
+    organism: list[str] = []
+    mission: str | None = None
+    source: str | None = None
+    year_from: int | None = None
+    year_to: int | None = None
+
 class ResearchGapRequest(BaseModel):
-    publications: list[dict]
-    rule_based_gaps: list[str]
+    # Either a filter spec over the server-side corpus or (legacy) the raw publications
+    filters: GapFilter | None = None
+    publications: list[dict] = []
+    rule_based_gaps: list[str] = []
 
 class ResearchGapResponse(BaseModel):
     semantic_analysis: str
     key_insights: list[str]
     future_directions: list[str]
     priority_areas: list[str]
+    rule_based_gaps: list[str] = []
 
-@app.post("/api/summarize", response_model=SummarizeResponse)
-async def summarize_text(req: SummarizeRequest):
-    if not req.text or len(req.text.strip()) < 50:
-        raise HTTPException(status_code=400, detail="Text too short to summarize")
-    
-    prompt = f"""You are a scientific policy and mission document summarizer specializing in NASA and space exploration reports.
+def summarize_prompt(text, max_bullets):
+    return f"""You are a scientific policy and mission document summarizer specializing in NASA and space exploration reports.
 
 Your task: summarize the following NASA policy or vision document text into a **clear, concise, and structured JSON summary**.
 
 Follow this structure:
 
 1. **TL;DR** — One-sentence summary (≤180 characters) capturing the overall vision or main goal.
-2. **Mission Objectives** — {req.max_bullets} concise bullet points (≤140 characters each) describing what NASA plans to do or achieve.
+2. **Mission Objectives** — {max_bullets} concise bullet points (≤140 characters each) describing what NASA plans to do or achieve.
 3. **Scientific Focus** — 3–5 short bullets explaining the main scientific themes (e.g., lunar missions, Mars research, technology development).
 4. **Timeline Highlights** — 3–4 key time milestones with short descriptions (e.g., "2008: Robotic lunar orbiter launch").
 5. **Keywords** — 6 key terms relevant to space science or mission focus.
@@ -92,136 +234,477 @@ Return ONLY a valid JSON object with these keys:
 
 Do NOT include extra explanations or markdown. Focus on clarity and brevity.
 Text to summarize:
-{req.text[:8000]}
+{text}
+"""
+
+def reduce_prompt(partials, max_bullets):
+    sections = "\n\n".join(f"Part {i + 1}:\n{json.dumps(p, ensure_ascii=False)}" for i, p in enumerate(partials))
+    return f"""You are a scientific policy and mission document summarizer specializing in NASA and space exploration reports.
+
+The document below was too long to read at once, so each consecutive part was summarized separately. Merge these {len(partials)} partial JSON summaries into ONE summary of the whole document: deduplicate, keep the most important points, and keep timeline entries in chronological order.
+
+Follow this structure:
+
+1. **TL;DR** — One-sentence summary (≤180 characters) capturing the overall vision or main goal.
+2. **Mission Objectives** — {max_bullets} concise bullet points (≤140 characters each).
+3. **Scientific Focus** — 3–5 short bullets explaining the main scientific themes.
+4. **Timeline Highlights** — 3–4 key time milestones with short descriptions.
+5. **Keywords** — 6 key terms relevant to space science or mission focus.
+
+Return ONLY a valid JSON object with these keys:
+{{
+  "tldr": <string>,
+  "objectives": [<strings>],
+  "science": [<strings>],
+  "timeline": [<strings>],
+  "keywords": [<strings>]
+}}
+
+Do NOT include extra explanations or markdown.
+Partial summaries:
+{sections}
 """
+
+async def document_prompt(text, max_bullets):
+    """Prompt for the final summary call; long texts are first summarized per chunk."""
+    return await chunks_prompt(split_document(text, SUMMARIZE_CHUNK_CHARS, SUMMARIZE_CHUNK_OVERLAP,
+                                              SUMMARIZE_MAX_CHUNKS, SUMMARIZE_TOKEN_BUDGET), max_bullets)
+
+async def chunks_prompt(chunks, max_bullets):
+    if len(chunks) == 1:
+        return summarize_prompt(chunks[0], max_bullets)
     
-    try:
-        # Call Gemini REST API
-        payload = {
-            "contents": [{
-                "parts": [{"text": prompt}]
-            }]
-        }
-        response = requests.post(GEMINI_API_URL, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
-        result_text = result["candidates"][0]["content"]["parts"][0]["text"].strip()
+    sem = asyncio.Semaphore(SUMMARIZE_MAP_CONCURRENCY)
+    
+    async def summarize_chunk(chunk):
+        async with sem:
+            result_text = await gemini.generate(summarize_prompt(chunk, max_bullets), timeout=SUMMARIZE_TIMEOUT)
+        return parse_json_text(result_text)
+    
+    results = await asyncio.gather(*(summarize_chunk(c) for c in chunks), return_exceptions=True)
+    partials = [r for r in results if not isinstance(r, BaseException)]
+    if not partials:
+        raise results[0]
+    return reduce_prompt(partials, max_bullets)
+
+def summary_section(key, value, max_bullets):
+    limit = max_bullets if key == "objectives" else SECTION_LIMITS[key]
+    return value[:limit] if isinstance(value, list) else value
+
+def build_summary(parsed, max_bullets):
+    return SummarizeResponse(
+        tldr=parsed.get("tldr", ""),
+        objectives=parsed.get("objectives", [])[:max_bullets],
+        science=parsed.get("science", [])[:5],
+        timeline=parsed.get("timeline", [])[:4],
+        keywords=parsed.get("keywords", [])[:6]
+    )
+
+async def summarize_chunks(cache_key, load_chunks, max_bullets):
+    """Cached, coalesced summary; load_chunks() is only awaited on a cache miss."""
+    cached = await cache.get(cache_key)
+    if cached is not None:
+        return SummarizeResponse(**cached)
+    
+    async def recheck():
+        cached = await cache.get(cache_key, count=False)
+        return SummarizeResponse(**cached) if cached is not None else None
+    
+    async def call():
+        prompt = await chunks_prompt(await load_chunks(), max_bullets)
+        # Call Gemini REST API without blocking the event loop
+        result_text = await gemini.generate(prompt, timeout=SUMMARIZE_TIMEOUT)
         
-        # Log the raw AI response for debugging
-        print(f"[DEBUG] Raw AI response:\n{result_text}\n")
+        event(logging.DEBUG, "gemini_response", endpoint="summarize", chars=len(result_text),
+              preview=result_text[:200])
         
         # Try to parse JSON from markdown code block or raw
-        if result_text.startswith("```"):
-            # Extract JSON from markdown code block
-            lines = result_text.split('\n')
-            json_lines = []
-            in_block = False
-            for line in lines:
-                if line.strip().startswith("```"):
-                    in_block = not in_block
-                    continue
-                if in_block:
-                    json_lines.append(line)
-            result_text = '\n'.join(json_lines)
-        
-        parsed = json.loads(result_text)
-        return SummarizeResponse(
-            tldr=parsed.get("tldr", ""),
-            objectives=parsed.get("objectives", [])[:req.max_bullets],
-            science=parsed.get("science", [])[:5],
-            timeline=parsed.get("timeline", [])[:4],
-            keywords=parsed.get("keywords", [])[:6]
-        )
+        parsed = parse_json_text(result_text)
+        summary = build_summary(parsed, max_bullets)
+        await cache.set(cache_key, summary.model_dump())
+        return summary
+    
+    return await flights.do(cache_key, call, recheck)
+
+async def summarize_document(text, max_bullets):
+    """Cached, coalesced summary of one document."""
+    async def load_chunks():
+        return split_document(text, SUMMARIZE_CHUNK_CHARS, SUMMARIZE_CHUNK_OVERLAP,
+                              SUMMARIZE_MAX_CHUNKS, SUMMARIZE_TOKEN_BUDGET)
+    
+    return await summarize_chunks(make_key("summarize", text, max_bullets), load_chunks, max_bullets)
+
+async def local_summary(text, max_bullets):
+    summary = await asyncio.to_thread(extractive_summary, text, max_bullets)
+    return build_summary(summary, max_bullets)
+
+@app.post("/api/summarize", response_model=SummarizeResponse)
+async def summarize_text(req: SummarizeRequest, response: Response):
+    if not req.text or len(req.text.strip()) < 50:
+        raise HTTPException(status_code=400, detail="Text too short to summarize")
+    
+    hedge_after = SUMMARIZE_HEDGE_SLO if req.hedge_after is None else req.hedge_after
+    task = asyncio.ensure_future(summarize_document(req.text, req.max_bullets))
+    try:
+        if hedge_after > 0:
+            done, _ = await asyncio.wait({task}, timeout=hedge_after)
+            if not done:
+                # Missed the SLO: answer locally and let the Gemini call finish into the cache
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                event(logging.INFO, "summary_degraded", keep=True, reason="hedged", after=hedge_after)
+                response.headers["X-Summary-Source"] = "local"
+                return await local_summary(req.text, req.max_bullets)
+        summary = await task
+        response.headers["X-Summary-Source"] = "gemini"
+        return summary
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
+        if not SUMMARIZE_FALLBACK:
+            raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
+        event(logging.WARNING, "summary_degraded", reason="fallback", error=str(e)[:200])
+        response.headers["X-Summary-Source"] = "local"
+        return await local_summary(req.text, req.max_bullets)
 
-@app.post("/api/analyze-gaps", response_model=ResearchGapResponse)
-async def analyze_research_gaps(req: ResearchGapRequest):
-    if not req.publications or len(req.publications) == 0:
-        raise HTTPException(status_code=400, detail="No publications provided")
+@app.post("/api/summarize/stream")
+async def summarize_stream(req: SummarizeRequest):
+    """NDJSON stream: one {"section": ...} frame per completed field, then the full summary."""
+    if not req.text or len(req.text.strip()) < 50:
+        raise HTTPException(status_code=400, detail="Text too short to summarize")
     
-    # Prepare summary of publications for AI analysis
-    pub_summary = []
-    for i, pub in enumerate(req.publications[:100]):  # Limit to avoid token overflow
-        title = pub.get('title', 'Untitled')
-        organism = pub.get('organism', 'Unknown')
-        year = pub.get('year', 'N/A')
-        outcome = pub.get('outcome', 'N/A')
-        pub_summary.append(f"- [{year}] {organism}: {title[:80]} → {outcome[:60]}")
+    cache_key = make_key("summarize", req.text, req.max_bullets)
     
-    pub_text = "\n".join(pub_summary[:50])  # Limit to 50 publications
-    gaps_text = "\n".join(req.rule_based_gaps) if req.rule_based_gaps else "No rule-based gaps detected"
+    def frame(obj):
+        return json.dumps(obj, ensure_ascii=False) + "\n"
     
-    prompt = f"""You are an expert NASA space biology research analyst. Analyze the following research corpus and identified gaps to provide deep insights.
+    async def events():
+        cached = await cache.get(cache_key)
+        if cached is not None:
+            for key in SUMMARY_SECTIONS:
+                yield frame({"section": key, "value": cached[key]})
+            yield frame({"done": True, "summary": cached})
+            return
+        
+        parser = PartialObjectParser()
+        chunks = []
+        try:
+            # Long documents run the map phase first, then stream the reduce call
+            prompt = await document_prompt(req.text, req.max_bullets)
+            async for delta in gemini.stream_generate(prompt, timeout=SUMMARIZE_TIMEOUT):
+                chunks.append(delta)
+                for key, value in parser.feed(delta):
+                    if key in SUMMARY_SECTIONS:
+                        yield frame({"section": key, "value": summary_section(key, value, req.max_bullets)})
+            parsed = parser.fields if parser.done else parse_json_text("".join(chunks).strip())
+            summary = build_summary(parsed, req.max_bullets).model_dump()
+        except Exception as e:
+            if not SUMMARIZE_FALLBACK:
+                yield frame({"error": f"Summarization failed: {str(e)}"})
+                return
+            # Degraded mode: replace whatever streamed so far with the local summary
+            summary = (await local_summary(req.text, req.max_bullets)).model_dump()
+            for key in SUMMARY_SECTIONS:
+                yield frame({"section": key, "value": summary[key]})
+            yield frame({"done": True, "summary": summary, "source": "local"})
+            return
+        await cache.set(cache_key, summary)
+        yield frame({"done": True, "summary": summary})
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
-**Rule-Based Gaps Detected:**
-{gaps_text}
+@app.post("/api/summarize/upload", response_model=SummarizeResponse)
+async def summarize_upload(request: Request, max_bullets: int = 3):
+    """Multipart upload (field "file", PDF/TXT/MD) summarized from server-side extracted text."""
+    # Oversized bodies, declared or chunked, are refused by BodySizeLimit; the file
+    # part is streamed once into a temp file, hashed and size-checked as it arrives
+    try:
+        async with spool(request) as (doc, fields):
+            try:
+                max_bullets = int(fields.get("max_bullets") or max_bullets)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="max_bullets must be an integer")
+            
+            async def load_chunks():
+                pages = await extractor.pages(doc)
+                if sum(len(p.strip()) for p in pages) < 50:
+                    raise UploadError(400, "No selectable text found (scanned PDF?)")
+                return split_pages(pages, SUMMARIZE_CHUNK_CHARS, SUMMARIZE_CHUNK_OVERLAP,
+                                   SUMMARIZE_MAX_CHUNKS, SUMMARIZE_TOKEN_BUDGET)
+            
+            # Keyed by the file hash, so a repeated upload skips extraction too
+            return await summarize_chunks(make_key("summarize-upload", doc.sha256, max_bullets),
+                                          load_chunks, max_bullets)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
 
-**Sample Publications from Corpus (showing {len(pub_summary)} out of {len(req.publications)} total):**
-{pub_text}
+async def summarize_batch_item(text, options):
+    if not text or len(text.strip()) < 50:
+        raise ValueError("Text too short to summarize")
+    summary = await summarize_document(text, options["max_bullets"])
+    return summary.model_dump()
 
-Your task: Provide a comprehensive research gap analysis in JSON format with these sections:
+@app.post("/api/summarize/batch", response_model=BatchJobResponse)
+async def submit_batch(req: BatchSummarizeRequest):
+    if not req.documents:
+        raise HTTPException(status_code=400, detail="No documents provided")
+    if len(req.documents) > BATCH_MAX_DOCUMENTS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_DOCUMENTS} documents per batch")
+    
+    job = await jobs.submit([d.model_dump() for d in req.documents], {"max_bullets": req.max_bullets})
+    return BatchJobResponse(job_id=job.id, total=len(job.items))
 
-1. **semantic_analysis** — A 2-3 sentence high-level interpretation of the research landscape and what the patterns reveal about NASA's space biology research priorities and blind spots.
+async def get_job(job_id):
+    job = await jobs.find(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-2. **key_insights** — 4-5 specific, actionable insights about research gaps, underexplored organisms, missing experimental conditions, or temporal patterns. Each insight should be 1-2 sentences.
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str, results: bool = True):
+    return (await get_job(job_id)).snapshot(include_results=results)
 
-3. **future_directions** — 4-5 concrete suggestions for future research directions based on the gaps identified. Include specific organisms, experimental approaches, or research questions.
+@app.get("/api/jobs/{job_id}/stream")
+async def job_stream(job_id: str):
+    """NDJSON stream of item results as they complete, followed by the job status."""
+    job = await get_job(job_id)
+    
+    async def events():
+        async for item in jobs.updates(job):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+        yield json.dumps(job.snapshot(include_results=False)) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
-4. **priority_areas** — 3-4 high-priority research areas that would have the most scientific impact if pursued, with brief justification.
+@app.post("/api/jobs/{job_id}/retry")
+async def job_retry(job_id: str):
+    job = await get_job(job_id)
+    if job.remote and job.counts()["failed"]:
+        # Only the worker process that owns the job can requeue it; routing is random, so try again
+        raise HTTPException(status_code=409, detail="Job is owned by another worker process; try again")
+    return {"job_id": job.id, "requeued": await jobs.retry_failed(job)}
 
-Return ONLY valid JSON:
-{{
-  "semantic_analysis": "<string>",
-  "key_insights": [<strings>],
-  "future_directions": [<strings>],
-  "priority_areas": [<strings>]
-}}
+def gap_selection(f):
+    """Gap counts and row mask for a filter spec; text query and mission become a row mask."""
+    mask = None
+    if match_norm(f.q):
+        mask = search_index.match(f.q)  # the rows the dashboard's result list shows
+    if f.mission:
+        mission = search_index.filter_mask(mission=f.mission)
+        mask = mission if mask is None else mask & mission
+    axes = dict(source=f.source, organism=f.organism, year_from=f.year_from, year_to=f.year_to)
+    counts, organisms = gap_engine.counts(mask, **axes)
+    return counts, organisms, gap_engine.rows(mask, **axes)
 
-IMPORTANT: Do NOT use markdown formatting (**, __, etc.) in your response strings. Use plain text only.
-Be specific, scientific, and actionable. Focus on space biology context."""
-    
-    try:
-        payload = {
-            "contents": [{
-                "parts": [{"text": prompt}]
-            }]
-        }
-        response = requests.post(GEMINI_API_URL, json=payload, timeout=40)
-        response.raise_for_status()
+@app.post("/api/gaps")
+async def research_gaps(f: GapFilter):
+    """Rule-based gaps and the aggregates behind them for a filter spec, without an AI call."""
+    counts, organisms, _ = gap_selection(f)
+    return gap_engine.report(counts, organisms)
+
+def gap_spec(f):
+    """Canonical form of a filter spec, so equivalent filters share a cache entry."""
+    return {"q": match_norm(f.q), "organism": sorted(set(f.organism)), "mission": f.mission,
+            "source": f.source, "year_from": f.year_from, "year_to": f.year_to}
+
+@app.post("/api/analyze-gaps", response_model=ResearchGapResponse)
+async def analyze_research_gaps(req: ResearchGapRequest):
+    prompt = None
+    if req.filters is not None:
+        counts, organisms, rows = gap_selection(req.filters)
+        total = int(rows.sum())
+        if total == 0:
+            raise HTTPException(status_code=400, detail="No publications match the filters")
+        gaps = gap_engine.detect(counts, organisms)
+        # The filter spec fixes the prompt, so a cache hit skips building it
+        cache_key = make_key("analyze-gaps", corpus_version, gap_spec(req.filters), total, gaps,
+                             GAPS_PROMPT_TOKENS, GAPS_SAMPLE_SIZE)
         
-        result = response.json()
-        result_text = result["candidates"][0]["content"]["parts"][0]["text"].strip()
+        def build_prompt():
+            # Representative publications, stratified over organism x decade, as many as fit the token budget
+            candidates = [corpus_records[i] for i in gap_engine.representatives(rows)]
+            return build_gap_prompt(gaps, candidates, total, max_lines=GAPS_SAMPLE_SIZE)[0]
+    else:
+        if not req.publications or len(req.publications) == 0:
+            raise HTTPException(status_code=400, detail="No publications provided")
+        total = len(req.publications)
+        gaps = req.rule_based_gaps
         
-        print(f"[DEBUG] Research Gap Analysis Response:\n{result_text}\n")
+        def legacy_prompt():
+            engine = GapEngine(RecordColumns(req.publications))
+            candidates = [req.publications[i] for i in engine.representatives(engine.rows())]
+            return build_gap_prompt(gaps, candidates, total, max_lines=GAPS_SAMPLE_SIZE)
         
-        # Parse JSON from response
-        if result_text.startswith("```"):
-            lines = result_text.split('\n')
-            json_lines = []
-            in_block = False
-            for line in lines:
-                if line.strip().startswith("```"):
-                    in_block = not in_block
-                    continue
-                if in_block:
-                    json_lines.append(line)
-            result_text = '\n'.join(json_lines)
+        # Posted publications are keyed by the lines sampled from them; build off the event loop
+        prompt, pub_summary = await asyncio.to_thread(legacy_prompt)
+        cache_key = make_key("analyze-gaps", pub_summary, total, gaps)
+    
+    cached = await cache.get(cache_key)
+    if cached is not None:
+        return ResearchGapResponse(**cached)
+    
+    async def call():
+        text = prompt if prompt is not None else await asyncio.to_thread(build_prompt)
+        result_text = await gemini.generate(text, timeout=ANALYZE_GAPS_TIMEOUT)
+        
+        event(logging.DEBUG, "gemini_response", endpoint="analyze-gaps", chars=len(result_text),
+              preview=result_text[:200])
         
-        parsed = json.loads(result_text)
-        return ResearchGapResponse(
+        # Parse JSON from response
+        parsed = parse_json_text(result_text)
+        analysis = ResearchGapResponse(
             semantic_analysis=parsed.get("semantic_analysis", ""),
             key_insights=parsed.get("key_insights", [])[:5],
             future_directions=parsed.get("future_directions", [])[:5],
-            priority_areas=parsed.get("priority_areas", [])[:4]
+            priority_areas=parsed.get("priority_areas", [])[:4],
+            rule_based_gaps=gaps
         )
+        await cache.set(cache_key, analysis.model_dump())
+        return analysis
+    
+    async def recheck():
+        cached = await cache.get(cache_key, count=False)
+        return ResearchGapResponse(**cached) if cached is not None else None
+    
+    try:
+        return await flights.do(cache_key, call, recheck)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gap analysis failed: {str(e)}")
 
+@app.get("/api/search")
+async def search(q: str = "", organism: str | None = None, mission: str | None = None,
+                 source: str | None = None, year_from: int | None = None, year_to: int | None = None,
+                 fields: str | None = None, page: int = 1, page_size: int = 10):
+    """BM25-ranked, paginated search over the corpus with facet counts for the matching set."""
+    selected = tuple(f.strip() for f in fields.split(",") if f.strip()) if fields else FIELDS
+    unknown = [f for f in selected if f not in FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search fields: {', '.join(unknown)}")
+    if page < 1 or not 1 <= page_size <= 100:
+        raise HTTPException(status_code=400, detail="page must be >= 1 and page_size between 1 and 100")
+    
+    result = search_index.search(q, page=page, page_size=page_size, fields=selected,
+                                 organism=organism, mission=mission, source=source,
+                                 year_from=year_from, year_to=year_to)
+    return {"query": q, **result}
+
+@app.get("/api/aggregate")
+async def aggregate(q: str = "", organism: list[str] = Query([]), mission: list[str] = Query([]),
+                    source: list[str] = Query([]), outcome: list[str] = Query([]),
+                    year_from: int | None = None, year_to: int | None = None):
+    """Facet counts and year histogram for a filter intersection; repeat a param to OR values."""
+    query = match_norm(q)
+    mask_fn = (lambda: search_index.match(query)) if query else None
+    return facet_index.aggregate(mask_fn, mask_key=query, year_from=year_from, year_to=year_to,
+                                 organism=organism, mission=mission, source=source, outcome=outcome)
+
+def similar_hits(texts, k, source):
+    """Top-k hit lists for each text; the whole batch is scored and ranked block-wise."""
+    mask = search_index.filter_mask(source=source) if source else None
+    results = []
+    for scores, top in recommender.batch_top_k(texts, k, mask):
+        hits = []
+        for doc in top:
+            hit = record_view(corpus_records[doc])
+            hit["score"] = round(float(scores[doc]), 4)
+            hits.append(hit)
+        results.append(hits)
+    return results
+
+@app.post("/api/similar")
+async def similar(req: SimilarRequest):
+    """Top-k corpus records by TF-IDF cosine similarity to the given text."""
+    if not req.text.strip():
+        raise HTTPException(status_code=400, detail="No text provided")
+    if not 1 <= req.k <= 100:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+    return {"results": similar_hits([req.text], req.k, req.source)[0]}
+
+@app.post("/api/similar/batch")
+async def similar_batch(req: SimilarBatchRequest):
+    if not req.texts or len(req.texts) > 256:
+        raise HTTPException(status_code=400, detail="Provide between 1 and 256 texts")
+    if not 1 <= req.k <= 100:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+    return {"results": similar_hits(req.texts, req.k, req.source)}
+
+@app.get("/api/publications/{pub_id}/summary", response_model=SummarizeResponse)
+async def publication_summary(pub_id: str, response: Response):
+    """Summary of one corpus record from the precomputed store; summarized live and stored on a miss."""
+    i = record_ids.get(pub_id, record_ids.get(pub_id.upper()))
+    if i is None:
+        raise HTTPException(status_code=404, detail="Publication not found")
+    rec = corpus_records[i]
+    text = summary_text(rec)
+    if len(text) < SUMMARY_MIN_CHARS:
+        raise HTTPException(status_code=404, detail="Publication has no abstract to summarize")
+    
+    digest = text_hash(text)
+    stored = summary_store.get(rec["id"], digest)
+    if stored is not None:
+        response.headers["X-Summary-Source"] = "store"
+        return stored
+    
+    try:
+        summary = await summarize_document(text, SUMMARY_MAX_BULLETS)
+    except Exception as e:
+        if not SUMMARIZE_FALLBACK:
+            raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
+        event(logging.WARNING, "summary_degraded", reason="fallback", error=str(e)[:200])
+        response.headers["X-Summary-Source"] = "local"
+        return await local_summary(text, SUMMARY_MAX_BULLETS)
+    # Write through so the next request for this record is a store hit
+    await asyncio.to_thread(summary_store.put, rec["id"], digest, summary.model_dump(), gemini.model)
+    response.headers["X-Summary-Source"] = "gemini"
+    return summary
+
+@app.get("/api/publications/{pub_id}/links")
+async def publication_links(pub_id: str):
+    """OSDR studies citing a PMC publication, or the PMC publications an OSDR study cites."""
+    i = record_ids.get(pub_id, record_ids.get(pub_id.upper()))
+    if i is None:
+        raise HTTPException(status_code=404, detail="Publication not found")
+    rec = corpus_records[i]
+    results = []
+    for link in crosslinks.get(rec["id"]):
+        j = record_ids.get(link["id"])
+        if j is not None:
+            results.append({**record_view(corpus_records[j]), "method": link["method"], "score": link["score"]})
+    return {"id": rec["id"], "source": rec["source"], "results": results}
+
+@app.get("/api/links")
+async def all_links():
+    """The whole join as id lists in both directions, for annotating result lists client-side."""
+    return {
+        "pmc_to_osdr": {k: [l["id"] for l in v] for k, v in crosslinks.by_pmc.items()},
+        "osdr_to_pmc": {k: [l["id"] for l in v] for k, v in crosslinks.by_osdr.items()},
+        **crosslinks.stats(),
+    }
+
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "worker": os.getpid(), "gemini": breaker.snapshot()}
+
+REGISTRY.counter("response_cache_hits_total", "Response cache hits (memory + disk)", fn=lambda: cache.stats["hits"])
+REGISTRY.counter("response_cache_misses_total", "Response cache misses", fn=lambda: cache.stats["misses"])
+REGISTRY.gauge("response_cache_hit_ratio", "Response cache hits / lookups", fn=lambda: cache.snapshot()["hit_ratio"])
+REGISTRY.gauge("singleflight_inflight", "Distinct upstream calls in flight", fn=lambda: len(flights))
+REGISTRY.counter("singleflight_shared_total", "Requests that joined an in-flight call", fn=lambda: flights.stats["shared"])
+REGISTRY.counter("singleflight_remote_total", "Calls answered by another worker's upstream call",
+                 fn=lambda: flights.stats["remote"])
+REGISTRY.gauge("gemini_circuit_open", "1 while the Gemini circuit breaker is open or probing",
+               fn=lambda: int(breaker.state != "closed"))
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of the counters and histograms above (every worker's, under serve.py)."""
+    body = REGISTRY.render_workers(METRICS_DIR) if METRICS_DIR else REGISTRY.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return {**cache.snapshot(), "inflight": len(flights), **flights.stats}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from corpus import DATA_DIR
+from ratelimit import TokenBucket
+
+# Precomputed per-publication summaries keyed by corpus id (PMCID for PMC
+# rows, dataset_id for OSDR studies). A row keeps the sha256 of the text it
+# was made from and the SUMMARY_VERSION it was made with, and only counts as
+# a hit while both still match: an edited abstract invalidates that one row,
+# a prompt or schema change (bump SUMMARY_VERSION) invalidates them all.
+# A lookup is one primary-key read on a local SQLite file.
+#
+# Built and refreshed offline; only new or changed records go to Gemini:
+#   python summary_store.py --concurrency 4 --rpm 60
+SUMMARY_DB = os.getenv("SUMMARY_DB", str(DATA_DIR / "index" / "summaries.sqlite"))
+SUMMARY_VERSION = 1
+SUMMARY_MAX_BULLETS = 3
+SUMMARY_MIN_CHARS = 50  # same floor as /api/summarize
+
+
+def summary_text(rec):
+    """The text a record is summarized from: the PMC abstract or the OSDR description."""
+    return (rec.get("abstract") or "").strip()
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SummaryStore:
+    def __init__(self, path=SUMMARY_DB, version=SUMMARY_VERSION):
+        self.path = path
+        self.version = version
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._db()
+
+    def _db(self):
+        # A SQLite connection must not cross fork(); each serve.py worker opens its own
+        if self._pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS summaries (id TEXT PRIMARY KEY, version INTEGER NOT NULL,"
+                               " text_hash TEXT NOT NULL, summary TEXT NOT NULL, model TEXT,"
+                               " created_at REAL NOT NULL)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def __len__(self):
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM summaries WHERE version = ?",
+                                      (self.version,)).fetchone()[0]
+
+    def get(self, pub_id, digest):
+        """Stored summary dict if it was made from text with this hash at the current version."""
+        with self._lock:
+            row = self._db().execute("SELECT summary FROM summaries WHERE id = ? AND version = ? AND text_hash = ?",
+                                     (pub_id, self.version, digest)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, pub_id, digest, summary, model=None):
+        with self._lock:
+            self._db().execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?)",
+                               (pub_id, self.version, digest, json.dumps(summary, ensure_ascii=False),
+                                model, time.time()))
+
+    def fingerprints(self):
+        """id -> (version, text_hash) for every stored row."""
+        with self._lock:
+            return {r[0]: (r[1], r[2]) for r in self._db().execute("SELECT id, version, text_hash FROM summaries")}
+
+    def delete(self, ids):
+        with self._lock:
+            self._db().executemany("DELETE FROM summaries WHERE id = ?", [(i,) for i in ids])
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._pid = None
+
+
+def stale_records(store, records, force=False):
+    """Records with enough text whose stored summary is missing, outdated or made from other text."""
+    stored = store.fingerprints()
+    todo, seen = [], set()
+    for rec in records:
+        text = summary_text(rec)
+        if len(text) < SUMMARY_MIN_CHARS or rec["id"] in seen:
+            continue  # a few PMCIDs repeat in the CSV, always with the same abstract
+        seen.add(rec["id"])
+        digest = text_hash(text)
+        if force or stored.get(rec["id"]) != (store.version, digest):
+            todo.append((rec["id"], text, digest))
+    return todo
+
+
+async def refresh(args):
+    # The app module gives the job the same prompt, parsing and Gemini client as the live endpoint
+    import summarize
+
+    store = SummaryStore(args.db)
+    records = summarize.corpus_records
+    todo = stale_records(store, records, args.force)[:args.limit]
+    gone = set(store.fingerprints()) - {r["id"] for r in records}
+    if gone and not args.limit:
+        store.delete(gone)
+    print(f"[START] records={len(records)} stored={len(store)} to_summarize={len(todo)} pruned={len(gone)}")
+
+    limiter = TokenBucket(args.rpm / 60.0, capacity=args.concurrency)
+    queue = asyncio.Queue()
+    for item in todo:
+        queue.put_nowait(item)
+    counts = {"done": 0, "failed": 0}
+    t0 = time.time()
+
+    async def worker():
+        while not queue.empty():
+            pub_id, text, digest = queue.get_nowait()
+            await limiter.acquire()
+            try:
+                summary = await summarize.summarize_document(text, SUMMARY_MAX_BULLETS)
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"[FAIL] {pub_id}: {str(e)[:120]}", file=sys.stderr)
+                continue
+            await asyncio.to_thread(store.put, pub_id, digest, summary.model_dump(), summarize.gemini.model)
+            counts["done"] += 1
+            if counts["done"] % args.print_every == 0:
+                rate = counts["done"] / max(time.time() - t0, 1e-6)
+                print(f"[PROGRESS] done={counts['done']}/{len(todo)} failed={counts['failed']} rate={rate:.2f}/s")
+
+    await summarize.gemini.start()
+    try:
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    finally:
+        await summarize.gemini.close()
+        store.close()
+    print(f"[DONE] db={args.db} summarized={counts['done']} failed={counts['failed']} "
+          f"elapsed={time.time() - t0:.1f}s")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Summarize new or changed corpus records into the summary store")
+    ap.add_argument("--db", default=SUMMARY_DB)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--rpm", type=float, default=60, help="Gemini calls per minute")
+    ap.add_argument("--limit", type=int, default=None, help="Summarize at most this many records this run")
+    ap.add_argument("--force", action="store_true", help="Re-summarize every record")
+    ap.add_argument("--print-every", type=int, default=25)
+    sys.exit(asyncio.run(refresh(ap.parse_args())))
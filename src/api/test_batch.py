@@ -0,0 +1,58 @@
+import asyncio
+
+from batch import JobManager
+
+
+def run_job(process, documents, **kw):
+    async def run():
+        jobs = JobManager(process, workers=2, rpm=60_000, **kw)
+        job = await jobs.submit(documents, {"max_bullets": 3})
+        seen = [view async for view in jobs.updates(job)]
+        return jobs, job, seen
+
+    return run
+
+
+def test_every_item_finishes_and_is_streamed_once():
+    async def process(text, options):
+        await asyncio.sleep(0.001 * len(text))
+        return {"tldr": text.upper(), "bullets": options["max_bullets"]}
+
+    async def run():
+        jobs, job, seen = await run_job(process, [{"id": "a", "text": "xyz"}, {"text": "q"}])()
+        await jobs.close()
+        return job, seen
+
+    job, seen = asyncio.run(run())
+    snap = job.snapshot()
+    assert (snap["status"], snap["done"], snap["failed"], snap["progress"]) == ("finished", 2, 0, 1.0)
+    assert sorted(view["id"] for view in seen) == ["1", "a"]
+    assert snap["items"][0]["result"] == {"tldr": "XYZ", "bullets": 3}
+
+
+def test_bad_input_fails_without_retry_and_retry_failed_requeues_only_it():
+    attempts = {}
+    broken = {"b"}
+
+    async def process(text, options):
+        attempts[text] = attempts.get(text, 0) + 1
+        if text in broken:
+            raise ValueError("cannot summarize")
+        return text
+
+    async def run():
+        jobs, job, _ = await run_job(process, [{"text": "a"}, {"text": "b"}], max_attempts=3)()
+        first = job.snapshot()
+        broken.clear()
+        assert await jobs.retry_failed(job) == 1
+        assert job.finished_at is None
+        _ = [view async for view in jobs.updates(job)]
+        await jobs.close()
+        return first, job.snapshot()
+
+    first, second = asyncio.run(run())
+    assert (first["done"], first["failed"]) == (1, 1)
+    assert first["items"][1]["error"] == "cannot summarize"
+    assert first["items"][1]["attempts"] == 1
+    assert (second["done"], second["failed"]) == (2, 0)
+    assert attempts == {"a": 1, "b": 2}
@@ -0,0 +1,87 @@
+import breaker
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make(monkeypatch, **kw):
+    clock = Clock()
+    monkeypatch.setattr(breaker.time, "monotonic", clock)
+    kw = {"window": 10, "min_calls": 4, "error_rate": 0.5, "slow_seconds": 5, "slow_rate": 0.8, "cooldown": 30, **kw}
+    return CircuitBreaker(**kw), clock
+
+
+def test_stays_closed_below_min_calls_and_error_rate(monkeypatch):
+    b, _ = make(monkeypatch)
+    for failed in (True, True, True):
+        b.record(failed, 0.1)
+    assert b.state == CLOSED  # three calls are fewer than min_calls
+    b, _ = make(monkeypatch)
+    for failed in (True, False, False, False, False):
+        b.record(failed, 0.1)
+    assert b.state == CLOSED and b.allow()
+
+
+def test_opens_on_error_rate_and_rejects(monkeypatch):
+    b, _ = make(monkeypatch)
+    for failed in (True, False, True, False):
+        b.record(failed, 0.1)
+    assert b.state == OPEN
+    assert not b.allow()
+    assert b.snapshot() == {"state": OPEN, "window": 0, "opened": 1, "rejected": 1}
+
+
+def test_opens_on_slow_calls(monkeypatch):
+    b, _ = make(monkeypatch)
+    for _ in range(4):
+        b.record(False, 6.0)
+    assert b.state == OPEN
+
+
+def test_half_open_allows_a_single_probe(monkeypatch):
+    b, clock = make(monkeypatch)
+    b._open()
+    clock.now += 29
+    assert not b.allow()
+    clock.now += 1
+    assert b.allow()
+    assert b.state == HALF_OPEN
+    assert not b.allow()  # the probe slot is taken
+
+
+def test_successful_probe_closes(monkeypatch):
+    b, clock = make(monkeypatch)
+    b._open()
+    clock.now += 30
+    assert b.allow()
+    b.record(False, 0.1)
+    assert b.state == CLOSED and b.allow()
+    assert b.snapshot()["window"] == 0
+
+
+def test_failed_or_slow_probe_reopens(monkeypatch):
+    for failed, latency in ((True, 0.1), (False, 6.0)):
+        b, clock = make(monkeypatch)
+        b._open()
+        clock.now += 30
+        assert b.allow()
+        b.record(failed, latency)
+        assert b.state == OPEN
+        assert b.opened_at == clock.now
+        assert not b.allow()
+
+
+def test_released_probe_frees_the_slot(monkeypatch):
+    b, clock = make(monkeypatch)
+    b._open()
+    clock.now += 30
+    assert b.allow()
+    b.release()
+    assert b.state == HALF_OPEN
+    assert b.allow()
@@ -0,0 +1,67 @@
+import asyncio
+
+import cache
+from cache import DiskCache, LRUCache, ResponseCache, make_key
+
+
+def test_make_key_is_canonical():
+    assert make_key("s", {"b": 1, "a": 2}, 3) == make_key("s", {"a": 2, "b": 1}, 3)
+    assert make_key("s", "x") != make_key("t", "x")
+    assert make_key("s", "x").startswith("s:")
+
+
+def test_lru_evicts_least_recently_used_by_count_and_bytes():
+    lru = LRUCache(max_entries=2, max_bytes=100, ttl=60)
+    lru.set("a", 1, 10)
+    lru.set("b", 2, 10)
+    lru.get("a")
+    lru.set("c", 3, 10)
+    assert lru.get("b") is None and lru.get("a") == 1 and lru.get("c") == 3
+    lru.set("big", 4, 95)
+    assert len(lru) == 1 and lru.bytes == 95
+    lru.set("huge", 5, 101)  # larger than the whole cache: not stored
+    assert lru.get("huge") is None and lru.get("big") == 4
+
+
+def test_lru_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    lru = LRUCache(ttl=10)
+    lru.set("a", 1, 1)
+    lru.set("b", 2, 1, ttl=100)
+    now[0] += 11
+    assert lru.get("a") is None and lru.get("b") == 2
+    assert lru.bytes == 1
+
+
+def test_disk_cache_ttl_and_size_bound(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    disk = DiskCache(str(tmp_path / "c.sqlite"), ttl=10, max_bytes=10)
+    disk.set("a", "12345")
+    now[0] += 1
+    disk.set("b", "12345")
+    now[0] += 1
+    disk.get("a")
+    disk.set("c", "12345")  # over 10 bytes: the least recently used row (b) goes
+    assert disk.get("b") is None and disk.get("a") == "12345" and disk.get("c") == "12345"
+    now[0] += 20
+    assert disk.get("a") is None
+    disk.close()
+
+
+def test_response_cache_promotes_disk_hits_to_memory(tmp_path):
+    async def run():
+        disk = DiskCache(str(tmp_path / "c.sqlite"))
+        await ResponseCache(LRUCache(), disk).set("k", {"tldr": "x"})
+        fresh = ResponseCache(LRUCache(), disk)
+        assert await fresh.get("missing") is None
+        assert await fresh.get("k") == {"tldr": "x"}
+        assert await fresh.get("k") == {"tldr": "x"}
+        assert await fresh.get("k", count=False) == {"tldr": "x"}
+        disk.close()
+        return fresh.snapshot()
+
+    stats = asyncio.run(run())
+    assert (stats["hits"], stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (2, 1, 1, 1)
+    assert stats["hit_ratio"] == round(2 / 3, 4)
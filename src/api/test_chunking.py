@@ -0,0 +1,50 @@
+from chunking import estimate_tokens, split_document, split_pages
+
+
+def paragraphs(n, words=60):
+    return "\n\n".join(" ".join(f"p{i}w{j}" for j in range(words)) + "." for i in range(n))
+
+
+def test_short_text_is_one_chunk():
+    assert split_document("  one short paragraph  ") == ["one short paragraph"]
+    assert split_pages(["page one", "", "page two"]) == ["page one\n\npage two"]
+
+
+def test_chunks_respect_size_and_keep_every_paragraph():
+    text = paragraphs(40)
+    chunks = split_document(text, chunk_chars=1000, overlap=0)
+    assert len(chunks) > 1
+    assert all(len(c) <= 1000 for c in chunks)
+    assert "\n\n".join(chunks).split("\n\n") == text.split("\n\n")
+
+
+def test_overlap_repeats_the_tail_of_the_previous_chunk():
+    chunks = split_document(paragraphs(20), chunk_chars=800, overlap=100)
+    for prev, cur in zip(chunks, chunks[1:]):
+        head = cur.split("\n\n", 1)[0]
+        assert 0 < len(head) <= 100
+        assert prev.endswith(head)
+
+
+def test_oversized_paragraph_falls_back_to_sentences_and_hard_cuts():
+    sentence = "word " * 50
+    text = (sentence.strip() + ". ") * 10 + "x" * 700
+    chunks = split_document(text, chunk_chars=300, overlap=0)
+    assert all(len(c) <= 300 for c in chunks)
+    assert "".join(chunks).count("x") == 700
+
+
+def test_max_chunks_repacks_with_larger_chunks():
+    chunks = split_document(paragraphs(100), chunk_chars=500, overlap=50, max_chunks=5)
+    assert len(chunks) <= 5
+
+
+def test_token_budget_trims_every_chunk_equally():
+    chunks = split_document(paragraphs(60), chunk_chars=2000, overlap=0, token_budget=1000)
+    assert sum(estimate_tokens(c) for c in chunks) <= 1000
+    assert len({len(c) for c in chunks}) == 1
+
+
+def test_pages_are_packed_like_the_joined_document():
+    pages = [paragraphs(5), paragraphs(7), paragraphs(3)]
+    assert split_pages(pages, 900, 80) == split_document("\n\n".join(pages), 900, 80)
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from crosslinks import JoinIndex, entry, match_study, normalize_doi, normalize_title, trigrams
+
+WORDS = "bone loss mice rats spaceflight microgravity muscle atrophy gene expression immune response".split()
+
+
+def test_normalizers():
+    assert normalize_title("  Bone-Loss in  Mice: été ") == "bone loss in mice ete"
+    assert normalize_doi("https://doi.org/10.1000/ABC") == normalize_doi("doi: 10.1000/abc") == "10.1000/abc"
+    assert entry("k", "PMID 00123", "", "")[1] == "123"
+
+
+def brute_force(index, title, threshold):
+    grams = trigrams(normalize_title(title))
+    hits = []
+    for key, other in zip(index.keys, index.grams):
+        score = len(grams & other) / len(grams | other)
+        if score >= threshold:
+            hits.append((key, score))
+    return sorted(hits)
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.8, 0.95])
+def test_prefix_filter_finds_every_title_above_the_threshold(threshold):
+    rng = random.Random(threshold)
+    titles = [" ".join(rng.choices(WORDS, k=rng.randint(3, 8))) for _ in range(300)]
+    index = JoinIndex([entry(f"pmc{i}", "", "", t) for i, t in enumerate(titles)], threshold=threshold)
+    for probe in titles[:60] + [t[:-3] for t in titles[60:120]] + [t + " in space" for t in titles[120:180]]:
+        got = sorted(index.fuzzy(entry("osd", "", "", probe)))
+        expected = brute_force(index, probe, threshold)
+        assert [k for k, _ in got] == [k for k, _ in expected]
+        assert [s for _, s in got] == pytest.approx([s for _, s in expected])
+
+
+def test_match_prefers_exact_ids_then_the_best_fuzzy_title():
+    pmc = JoinIndex([entry("PMC1", "111", "10.1/a", "Bone loss in mice"),
+                     entry("PMC2", "", "", "Muscle atrophy in rats during spaceflight"),
+                     entry("PMC3", "", "", "Muscle atrophy in rats during spaceflights")], threshold=0.8)
+    links = match_study([entry("OSD-1", "111", "", "A different title"),
+                         entry("OSD-1", "", "", "Muscle atrophy in rats during a spaceflight")], pmc)
+    assert [link[:3] for link in links] == [["PMC1", "OSD-1", "pmid"], ["PMC2", "OSD-1", "fuzzy_title"]]
+    assert 0.8 <= links[1][3] < 1.0
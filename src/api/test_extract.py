@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+import extract
+from extract import FORM_FIELD_MAX_BYTES, UploadError, spool, text_file_pieces
+
+BOUNDARY = "testboundary42"
+
+
+class FakeRequest:
+    """The two things spool() reads from a Starlette request, with the body in small pieces."""
+
+    def __init__(self, body, content_type=f"multipart/form-data; boundary={BOUNDARY}", piece=7):
+        self.headers = {"content-type": content_type}
+        self.body = body
+        self.piece = piece
+
+    async def stream(self):
+        for i in range(0, len(self.body), self.piece):
+            yield self.body[i:i + self.piece]
+
+
+def multipart(fields=(), files=()):
+    out = b""
+    for name, value in fields:
+        out += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n').encode() + value + b"\r\n"
+    for name, filename, data in files:
+        out += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                "Content-Type: application/octet-stream\r\n\r\n").encode() + data + b"\r\n"
+    return out + f"--{BOUNDARY}--\r\n".encode()
+
+
+def spooled(request, max_bytes=1000):
+    async def run():
+        async with spool(request, max_bytes) as (doc, fields):
+            with open(doc.path, "rb") as f:
+                return doc, fields, f.read()
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract, "UPLOAD_DIR", str(tmp_path))
+    yield tmp_path
+    assert os.listdir(tmp_path) == []  # the temp file never outlives the request
+
+
+@pytest.mark.parametrize("piece", [1, 7, 4096])
+def test_file_is_written_once_with_hash_and_fields(piece):
+    data = b"line one\r\n--not a boundary\r\n" + bytes(range(256)) * 3
+    body = multipart([("max_bullets", b"4")], [("file", "Paper.PDF", data)])
+    doc, fields, written = spooled(FakeRequest(body, piece=piece))
+    assert written == data
+    assert (doc.filename, doc.size, doc.is_pdf) == ("Paper.PDF", len(data), True)
+    assert doc.sha256 == hashlib.sha256(data).hexdigest()
+    assert fields == {"max_bullets": "4"}
+
+
+@pytest.mark.parametrize("request_, status", [
+    (FakeRequest(multipart(files=[("file", "notes.exe", b"x")])), 415),
+    (FakeRequest(multipart(files=[("file", "big.txt", b"x" * 1001)])), 413),
+    (FakeRequest(multipart([("max_bullets", b"3")])), 400),
+    (FakeRequest(multipart(files=[("file", "a.txt", b"x"), ("file", "b.txt", b"y")])), 400),
+    (FakeRequest(multipart([(f"f{i}", b"1") for i in range(5)], [("file", "a.txt", b"x")])), 400),
+    (FakeRequest(multipart([("note", b"x" * (FORM_FIELD_MAX_BYTES + 1))], [("file", "a.txt", b"x")])), 400),
+    (FakeRequest(b"{}", content_type="application/json"), 400),
+    (FakeRequest(f"--{BOUNDARY}\r\ngarbage".encode()), 400),
+])
+def test_bad_uploads_are_refused(request_, status):
+    with pytest.raises(UploadError) as e:
+        spooled(request_)
+    assert e.value.status_code == status
+
+
+def test_text_pieces_split_on_lines_and_keep_multibyte_characters(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract, "SPOOL_CHUNK", 5)
+    path = tmp_path / "doc.txt"
+    text = "été\nmicrogravité\n\nok"
+    path.write_bytes(text.encode("utf-8"))
+    pieces = text_file_pieces(str(path))
+    assert "".join(pieces) == text
+    assert all(p.endswith("\n") for p in pieces[:-1])
+    path.unlink()
@@ -0,0 +1,78 @@
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from facets import FACETS, UNKNOWN, FacetIndex
+from snapshot import RecordColumns
+
+
+def corpus(n=300, seed=5):
+    rng = random.Random(seed)
+    return [{"organism": rng.choice(["Mus musculus", "Homo sapiens", "Rattus", ""]),
+             "mission": rng.choice(["ISS", "Shuttle", ""]),
+             "source": rng.choice(["pmc", "osdr"]),
+             "outcome": rng.choice(["Bone loss", "Immune", ""]),
+             "year": rng.choice([0, 1999, 2005, 2005, 2011, 2020])}
+            for _ in range(n)]
+
+
+def brute(records, rows=None, year_from=None, year_to=None, **filters):
+    kept = []
+    for i, r in enumerate(records):
+        if rows is not None and not rows[i]:
+            continue
+        if any(f in filters and (r[f] or UNKNOWN).lower() not in {v.lower() for v in filters[f]} for f in FACETS):
+            continue
+        if (year_from is not None or year_to is not None) and not (
+                r["year"] > 0 and (year_from is None or r["year"] >= year_from)
+                and (year_to is None or r["year"] <= year_to)):
+            continue
+        kept.append(r)
+    return {"total": len(kept),
+            "facets": {f: dict(Counter(r[f] or UNKNOWN for r in kept)) for f in FACETS},
+            "years": dict(Counter(r["year"] for r in kept if r["year"] > 0))}
+
+
+@pytest.fixture(scope="module")
+def records():
+    return corpus()
+
+
+@pytest.fixture(scope="module")
+def index(records):
+    return FacetIndex(RecordColumns(records))
+
+
+@pytest.mark.parametrize("query", [
+    {},
+    {"organism": ["mus musculus"]},
+    {"organism": ["Mus musculus", "rattus"], "source": ["osdr"]},
+    {"mission": ["Unknown"], "year_from": 2005},
+    {"year_from": 2000, "year_to": 2011, "outcome": ["immune"]},
+    {"year_from": 2021},
+    {"organism": ["nobody"]},
+])
+def test_aggregate_matches_a_row_scan(records, index, query):
+    assert index.aggregate(**query) == brute(records, **query)
+
+
+def test_facet_counts_are_sorted_descending(index):
+    for counts in index.aggregate()["facets"].values():
+        values = list(counts.values())
+        assert values == sorted(values, reverse=True)
+
+
+def test_mask_is_applied_and_cached_per_key(records, index):
+    rows = np.arange(len(records)) % 3 == 0
+    calls = []
+
+    def mask():
+        calls.append(1)
+        return rows
+
+    first = index.aggregate(mask_fn=mask, mask_key="every-third", source="pmc")
+    again = index.aggregate(mask_fn=mask, mask_key="every-third", source="pmc")
+    assert first == again == brute(records, rows=rows, source=["pmc"])
+    assert len(calls) == 1
@@ -0,0 +1,58 @@
+import numpy as np
+
+from gaps import DEFAULT_TOPIC, GapEngine, stratified_order
+from snapshot import RecordColumns
+
+
+def rec(organism, year, outcome="Bone loss", source="pmc"):
+    return {"organism": organism, "year": year, "outcome": outcome, "source": source}
+
+
+def corpus():
+    records = [rec("Mus musculus", y) for y in range(2000, 2024) for _ in range(2)]
+    records += [rec("Rattus", 2001), rec("Rattus", 2002), rec("Rattus", 2007)]  # few, with a hiatus
+    # Immune research: plenty before, almost nothing in the last decade
+    records += [rec("Homo sapiens", 2001, "Immune") for _ in range(10)] + [rec("Homo sapiens", 2021, "Immune")]
+    records += [rec("", 0, "", "osdr")]
+    return records
+
+
+def test_counts_match_the_records():
+    records = corpus()
+    engine = GapEngine(RecordColumns(records))
+    counts, organisms = engine.counts()
+    assert counts.sum() == len(records)
+    report = engine.report(counts, organisms)
+    assert report["organisms"] == {"Mus musculus": 48, "Homo sapiens": 11, "Rattus": 3, "Unknown": 1}
+    assert report["organism_years"]["Rattus"] == {2001: 1, 2002: 1, 2007: 1}
+    assert report["topic_decades"]["Immune"] == {"2000s": 10, "2020s": 1}
+    assert DEFAULT_TOPIC in engine.topics
+
+
+def test_rule_based_gaps():
+    engine = GapEngine(RecordColumns(corpus()))
+    gaps = engine.detect(*engine.counts())
+    assert "📉 Few studies on Rattus → potential gap" in gaps
+    assert "⚠️ No Rattus studies between 2003 and 2006" in gaps
+    assert "⏳ Decline in Immune research in recent decade → possible knowledge gap" in gaps
+    assert not any("Mus musculus" in g for g in gaps)
+
+
+def test_filters_agree_with_the_row_mask():
+    records = corpus()
+    engine = GapEngine(RecordColumns(records))
+    mask = np.array([r["year"] % 2 == 0 for r in records])
+    for kw in ({}, {"organism": "rattus"}, {"source": "osdr"}, {"year_from": 2002, "year_to": 2010}):
+        counts, _ = engine.counts(mask=mask, **kw)
+        assert counts.sum() == engine.rows(mask=mask, **kw).sum()
+
+
+def test_every_prefix_of_the_stratified_order_spans_the_strata():
+    strata = np.array([0] * 60 + [1] * 30 + [2] * 10)
+    order = stratified_order(strata)
+    assert sorted(order.tolist()) == list(range(100))
+    assert set(strata[order[:3]]) == {0, 1, 2}
+    for k in (10, 50):
+        counts = np.bincount(strata[order[:k]], minlength=3)
+        assert np.all(np.abs(counts - k * np.array([0.6, 0.3, 0.1])) <= 1.5)
+    assert np.array_equal(order, stratified_order(strata))
@@ -0,0 +1,41 @@
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from limits import BodySizeLimit
+
+
+async def echo(request):
+    return PlainTextResponse(str(len(await request.body())))
+
+
+app = Starlette(routes=[Route("/limited", echo, methods=["POST"]), Route("/open", echo, methods=["POST"])],
+                middleware=[Middleware(BodySizeLimit, limits={"/limited": 100})])
+client = TestClient(app)
+
+
+def chunks(n, size=10):
+    for _ in range(n):
+        yield b"x" * size
+
+
+def test_body_under_the_limit_passes():
+    assert client.post("/limited", content=b"x" * 100).text == "100"
+    assert client.post("/limited", content=chunks(10)).text == "100"
+
+
+def test_declared_length_over_the_limit_is_refused_unread():
+    r = client.post("/limited", content=b"x" * 101)
+    assert r.status_code == 413
+    assert r.json() == {"detail": "Request body exceeds 100 bytes"}
+
+
+def test_chunked_body_is_cut_off_at_the_limit():
+    r = client.post("/limited", content=chunks(11))
+    assert r.status_code == 413
+
+
+def test_other_routes_are_not_limited():
+    assert client.post("/open", content=b"x" * 1000).text == "1000"
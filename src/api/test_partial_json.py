@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from partial_json import PartialObjectParser
+
+DOC = {
+    "tldr": "Mice lose bone in orbit, {quoted} \"and\" braces.",
+    "key_points": ["a, b", "c ] d", {"nested": [1, 2, {"x": "}"}]}],
+    "score": 0.75,
+    "flags": [],
+    "ok": True,
+    "missing": None,
+    "escaped": "back\\slash \\\" quote",
+}
+
+
+def feed_all(parser, text, size):
+    completed = []
+    for i in range(0, len(text), size):
+        completed.extend(parser.feed(text[i:i + size]))
+    return completed
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+def test_any_chunking_yields_every_field_once_in_order(size):
+    parser = PartialObjectParser()
+    completed = feed_all(parser, json.dumps(DOC), size)
+    assert completed == list(DOC.items())
+    assert parser.fields == DOC
+    assert parser.done
+
+
+def test_field_is_emitted_as_soon_as_its_value_completes():
+    parser = PartialObjectParser()
+    assert parser.feed('{"tldr": "short summ') == []
+    assert parser.feed('ary", "key_points": ["one"') == [("tldr", "short summary")]
+    # A number is only complete at the following comma or brace
+    assert parser.feed('], "score": 3') == [("key_points", ["one"])]
+    assert parser.feed("}") == [("score", 3)]
+    assert parser.done
+
+
+def test_text_around_the_object_is_ignored():
+    parser = PartialObjectParser()
+    completed = feed_all(parser, '```json\n{"a": 1, "b": "x"}\n```', 4)
+    assert completed == [("a", 1), ("b", "x")]
+    assert parser.done
+    assert parser.feed('{"c": 2}') == []
+
+
+def test_incomplete_object_keeps_completed_fields_and_is_not_done():
+    parser = PartialObjectParser()
+    parser.feed('{"a": [1, 2], "b": {"c": ')
+    assert parser.fields == {"a": [1, 2]}
+    assert not parser.done
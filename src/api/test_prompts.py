@@ -0,0 +1,39 @@
+import numpy as np
+
+from prompts import MinHash, fit_publications
+
+
+def test_minhash_estimates_jaccard():
+    mh = MinHash(permutations=256)
+
+    def agree(a, b):
+        return (mh.signature(a) == mh.signature(b)).mean()
+
+    base = "effects of spaceflight on bone density in mice aboard the international space station"
+    variant = base.replace("mice", "rats")
+    other = "arabidopsis root growth under simulated microgravity on a clinostat"
+    assert agree(base, base) == 1.0
+    assert 0.5 < agree(base, variant) < 0.95
+    assert agree(base, other) < 0.1
+    assert np.array_equal(MinHash().signature(base), MinHash().signature(base))
+
+
+def pub(title, year=2020):
+    return {"title": title, "organism": "Mus musculus", "year": year, "outcome": "Bone loss"}
+
+
+def test_near_duplicate_titles_are_skipped():
+    pubs = [pub("Bone loss in mice during spaceflight mission one"),
+            pub("Bone loss in mice during spaceflight mission two"),
+            pub("Plant growth in microgravity")]
+    kept = fit_publications(pubs, budget=10_000, threshold=0.5)
+    assert [p["title"] for p in kept] == [pubs[0]["title"], pubs[2]["title"]]
+    assert fit_publications(pubs, budget=10_000, threshold=1.01) == pubs
+
+
+def test_budget_and_max_lines_bound_the_prompt():
+    pubs = [pub(f"Distinct study number {i} about {w}") for i, w in enumerate("abcdefghij")]
+    assert len(fit_publications(pubs, budget=10_000, max_lines=4)) == 4
+    small = fit_publications(pubs, budget=60)
+    assert 0 < len(small) < len(pubs)
+    assert small == pubs[:len(small)]
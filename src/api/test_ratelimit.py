@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+from ratelimit import TokenBucket
+
+
+def test_burst_then_steady_rate():
+    async def run():
+        bucket = TokenBucket(rate=50, capacity=5)
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        burst = time.monotonic() - start
+        for _ in range(10):
+            await bucket.acquire()
+        return burst, time.monotonic() - start
+
+    burst, total = asyncio.run(run())
+    assert burst < 0.05
+    assert 0.18 <= total < 0.5  # ten more tokens at 50/s
+
+
+def test_concurrent_waiters_share_the_rate():
+    async def run():
+        bucket = TokenBucket(rate=100, capacity=1)
+        start = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(21)))
+        return time.monotonic() - start
+
+    assert 0.18 <= asyncio.run(run()) < 0.5
@@ -0,0 +1,114 @@
+import math
+import random
+import re
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from search import B, FIELD_WEIGHTS, FIELDS, K1, MATCH_THRESHOLD, SearchIndex, match_norm, tokenize
+from snapshot import RecordColumns
+
+WORDS = "bone muscle radiation microgravity mice plant arabidopsis gene expression immune cell stem".split()
+ORGANISMS = ["Mus musculus", "Homo sapiens", "Arabidopsis thaliana", ""]
+MISSIONS = ["ISS", "Shuttle", "Bion-M1", ""]
+
+
+def corpus(n=120, seed=3):
+    rng = random.Random(seed)
+    return [{"id": f"r{i}",
+             "title": " ".join(rng.choices(WORDS, k=rng.randint(2, 6))).capitalize(),
+             "abstract": " ".join(rng.choices(WORDS, k=rng.randint(0, 30))),
+             "organism": rng.choice(ORGANISMS),
+             "mission": rng.choice(MISSIONS),
+             "source": rng.choice(["pmc", "osdr"]),
+             "outcome": rng.choice(["Bone loss", "Gene expression", ""]),
+             "year": rng.choice([0, 1995, 2004, 2012, 2019, 2023])}
+            for i in range(n)]
+
+
+@pytest.fixture(scope="module")
+def records():
+    return corpus()
+
+
+@pytest.fixture(scope="module")
+def index(records):
+    return SearchIndex(RecordColumns(records))
+
+
+def naive_bm25(records, query):
+    docs = [{f: tokenize(r.get(f)) for f in FIELDS} for r in records]
+    n = len(docs)
+    avg = {f: (sum(len(d[f]) for d in docs) / n) or 1.0 for f in FIELDS}
+    scores = np.zeros(n)
+    for term in set(tokenize(query)):
+        df = sum(any(term in d[f] for f in FIELDS) for d in docs)
+        if not df:
+            continue
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        for i, d in enumerate(docs):
+            for f in FIELDS:
+                tf = d[f].count(term)
+                if tf:
+                    norm = K1 * (1 - B + B * len(d[f]) / avg[f])
+                    scores[i] += idf * FIELD_WEIGHTS[f] * tf * (K1 + 1) / (tf + norm)
+    return scores
+
+
+@pytest.mark.parametrize("query", ["bone", "microgravity mice", "gene gene expression", "Mus", "nothing here"])
+def test_bm25_scores_match_the_textbook_formula(records, index, query):
+    assert np.allclose(index.score(query), naive_bm25(records, query), rtol=1e-5, atol=1e-6)
+
+
+def test_search_ranks_filters_and_pages(records, index):
+    full = index.search("bone radiation", page_size=1000, organism="mus musculus", year_from=2004)
+    expected = [r for r in records if r["organism"] == "Mus musculus" and r["year"] >= 2004
+                and set(tokenize(" ".join(r[f] for f in FIELDS))) & {"bone", "radiation"}]
+    assert full["total"] == len(expected)
+    assert {h["id"] for h in full["results"]} == {r["id"] for r in expected}
+    scores = [h["score"] for h in full["results"]]
+    assert scores == sorted(scores, reverse=True)
+    pages = [index.search("bone radiation", page=p, page_size=7, organism="mus musculus", year_from=2004)["results"]
+             for p in range(1, full["total"] // 7 + 2)]
+    assert [h["id"] for page in pages for h in page] == [h["id"] for h in full["results"]]
+    assert full["facets"]["organism"] == {"Mus musculus": full["total"]}
+
+
+def test_browse_without_query_is_newest_first(index):
+    out = index.search("", page_size=20, source="osdr")
+    years = [h["year"] for h in out["results"]]
+    assert years == sorted(years, reverse=True)
+    assert all(h["source"] == "osdr" and h["score"] is None for h in out["results"])
+    assert "abstract" not in out["results"][0]
+
+
+def dice(a, b):
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    if len(a) < 2 or len(b) < 2:
+        return 0.0
+    ga = Counter(a[i:i + 2] for i in range(len(a) - 1))
+    gb = Counter(b[i:i + 2] for i in range(len(b) - 1))
+    return 2 * sum((ga & gb).values()) / (len(a) - 1 + len(b) - 1)
+
+
+def use_search_keeps(record, query):
+    """useSearch's rule (src/hooks/useSearch.js), evaluated for one row."""
+    q = match_norm(query)
+    tokens = [t for t in re.split("[^a-z0-9\u4e00-\u9fa5]+", q) if t]
+    if not tokens:
+        return False
+    title = match_norm(record["title"])
+    text = " ".join([title, match_norm(record["outcome"]), match_norm(record["organism"]),
+                     str(record["year"]) if record["year"] else ""])
+    hit = sum(t in text for t in tokens) / len(tokens)
+    return 0.7 * hit + 0.3 * dice(q, title) > MATCH_THRESHOLD
+
+
+@pytest.mark.parametrize("query", ["bone", "Bone muscle", "mice 2012", "arabid", "zzz", "", "gene expression immune"])
+def test_match_is_the_dashboard_rule(records, index, query):
+    expected = [use_search_keeps(r, query) for r in records]
+    assert index.match(query).tolist() == expected
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)), flight.do("other", work))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(run())
+    assert results == ["result"] * 6
+    assert len(calls) == 2
+    assert flight.stats == {"leaders": 2, "shared": 4, "remote": 0}
+    assert len(flight) == 0
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def run():
+        flight = SingleFlight()
+        attempts = []
+
+        async def fail():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        with pytest.raises(RuntimeError):
+            await flight.do("k", fail)
+        return results, attempts
+
+    results, attempts = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(attempts) == 2
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def run():
+        flight = SingleFlight()
+        done = asyncio.Event()
+
+        async def work():
+            await done.wait()
+            return 42
+
+        first = asyncio.create_task(flight.do("k", work))
+        second = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        done.set()
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == (42, True)
+
+
+class Leases:
+    poll = 0.001
+
+    def __init__(self):
+        self.held = set()
+
+    async def acquire(self, key):
+        if key in self.held:
+            return False
+        self.held.add(key)
+        return True
+
+    async def release(self, key):
+        self.held.discard(key)
+
+
+def test_lease_holder_elsewhere_is_followed_through_recheck():
+    async def run():
+        leases = Leases()
+        leases.held.add("k")  # another worker is computing it
+        flight = SingleFlight(leases)
+        store = {}
+        calls = []
+
+        async def work():
+            calls.append(1)
+            return "local"
+
+        async def recheck():
+            return store.get("k")
+
+        task = asyncio.create_task(flight.do("k", work, recheck))
+        await asyncio.sleep(0.01)
+        store["k"] = "remote"
+        return await task, calls, flight.stats["remote"]
+
+    assert asyncio.run(run()) == ("remote", [], 1)
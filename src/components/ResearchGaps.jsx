@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react"
+import { useState, useEffect, useMemo } from "react"
 import { Microscope, Sparkles, TrendingUp, Target, AlertCircle, RefreshCw } from "lucide-react"
 
 // Remove markdown formatting from text
@@ -81,30 +81,57 @@ function detectGaps(publications, { lowCountThreshold = 10, recentYears = 10 } =
   return gaps
 }
 
-export default function ResearchGaps({ publications }) {
+export default function ResearchGaps({ publications, query = "" }) {
   const [aiAnalysis, setAiAnalysis] = useState(null)
+  const [serverGaps, setServerGaps] = useState(null)
+  const [gapsOffline, setGapsOffline] = useState(false)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
   const [showAI, setShowAI] = useState(false)
   
-  const dynamicGaps = detectGaps(publications)
-
-  // Create a stable key for publications to detect content changes
-  const pubKey = `${publications.length}-${publications.map(p => p.title).join(',').slice(0, 100)}`
+  // Gaps come from POST /api/gaps (the server's count tensor, same selection as the
+  // result list); the browser only runs the rules itself when the API is unreachable
+  const localGaps = useMemo(() => (gapsOffline ? detectGaps(publications) : []), [gapsOffline, publications])
+  const dynamicGaps = serverGaps ?? localGaps
+  const gapsLoading = serverGaps === null && !gapsOffline
 
   useEffect(() => {
-    // Reset AI analysis when publications change
+    // Reset everything for the new query and drop any response to the previous one
+    const controller = new AbortController()
     setAiAnalysis(null)
+    setServerGaps(null)
+    setGapsOffline(false)
     setShowAI(false)
+    setLoading(false)
     setError(null)
-    
-    // Auto-trigger AI analysis when publications change and there are gaps
-    if (publications.length > 0 && dynamicGaps.length > 0) {
-      analyzeWithAI()
-    }
-  }, [pubKey, dynamicGaps.length])
 
-  const analyzeWithAI = async () => {
+    const isProd = typeof window !== 'undefined' && window.location.hostname !== 'localhost'
+    const apiBase = import.meta.env.VITE_API_BASE_URL || (isProd ? '' : 'http://localhost:8000')
+    fetch(`${apiBase}/api/gaps`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ q: query, source: 'pmc' }),
+      signal: controller.signal
+    })
+      .then((res) => {
+        if (!res.ok) throw new Error(`API error: ${res.status}`)
+        return res.json()
+      })
+      .then((data) => {
+        if (controller.signal.aborted) return
+        setServerGaps(data.rule_based_gaps)
+        // Auto-trigger AI analysis when the selection has publications and gaps
+        if (data.total > 0 && data.rule_based_gaps.length > 0) analyzeWithAI(controller.signal)
+      })
+      .catch((e) => {
+        if (e.name === 'AbortError') return
+        console.warn('Gap API unavailable, detecting gaps locally:', e)
+        setGapsOffline(true)
+      })
+    return () => controller.abort()
+  }, [query])
+
+  const analyzeWithAI = async (signal) => {
     if (publications.length === 0) return
     
     setLoading(true)
@@ -116,15 +143,17 @@ export default function ResearchGaps({ publications }) {
       const response = await fetch(`${apiBase}/api/analyze-gaps`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
+        // Compact filter spec: the server resolves it against its own corpus index
         body: JSON.stringify({
-          publications: publications,
-          rule_based_gaps: dynamicGaps
-        })
+          filters: { q: query, source: 'pmc' }
+        }),
+        signal
       })
       
       if (!response.ok) throw new Error(`API error: ${response.status}`)
       
       const data = await response.json()
+      if (Array.isArray(data.rule_based_gaps)) setServerGaps(data.rule_based_gaps)
       // Clean markdown formatting from all text fields
       const cleanedData = {
         semantic_analysis: cleanMarkdown(data.semantic_analysis),
@@ -135,10 +164,11 @@ export default function ResearchGaps({ publications }) {
       setAiAnalysis(cleanedData)
       setShowAI(true)
     } catch (e) {
+      if (e.name === 'AbortError') return  // the query changed; its own analysis is on the way
       console.warn('AI analysis unavailable:', e)
       setError('AI analysis unavailable. Showing rule-based detection only.')
     } finally {
-      setLoading(false)
+      if (!signal?.aborted) setLoading(false)
     }
   }
 
@@ -183,7 +213,9 @@ export default function ResearchGaps({ publications }) {
               <AlertCircle className="w-4 h-4 text-yellow-400" />
               <h3 className="text-sm font-semibold text-slate-300">Rule-Based Detection</h3>
             </div>
-            {dynamicGaps.length === 0 ? (
+            {gapsLoading ? (
+              <p className="text-slate-400 text-sm">Detecting gaps...</p>
+            ) : dynamicGaps.length === 0 ? (
               <p className="text-slate-400 text-sm">No obvious gaps detected by baseline rules.</p>
             ) : (
               <ul className="space-y-2">
@@ -198,7 +230,7 @@ export default function ResearchGaps({ publications }) {
             
             {!aiAnalysis && !loading && !error && (
               <button
-                onClick={analyzeWithAI}
+                onClick={() => analyzeWithAI()}
                 className="mt-4 w-full px-4 py-2 bg-gradient-to-r from-purple-500 to-blue-500 hover:from-purple-600 hover:to-blue-600 text-white rounded-lg transition flex items-center justify-center gap-2 text-sm font-medium"
               >
                 <Sparkles className="w-4 h-4" />
@@ -65,27 +65,19 @@ export default function UploadSummarize({ corpus, onAddToBoard }) {
     const f = files[0]
     setFileName(f.name)
     localStorage.setItem('upload_filename', f.name)
-    setStatus('Parsing...')
+    setStatus('Uploading and summarizing with AI...')
     let text = ''
-    if (f.type === 'application/pdf' || f.name.toLowerCase().endsWith('.pdf')) {
-      try { 
-        text = await readPdfText(f) 
-        if (!text || text.trim().length < 20) {
-          setStatus('Parsed PDF but no selectable text (scanned image?). Please try a text PDF or TXT.')
-          return
-        }
-      } catch { setStatus('Failed to parse PDF'); return }
-    } else {
-      text = await f.text()
-    }
-    setStatus('Summarizing with AI...')
     let summaryData = null
     let usedAI = false
     try {
-      const res = await fetch('http://localhost:8000/api/summarize', {
+      // The server extracts the text itself (PDF pages in a worker pool), so the
+      // tab never parses the PDF or sends it as one huge JSON string
+      const form = new FormData()
+      form.append('file', f)
+      form.append('max_bullets', '3')
+      const res = await fetch('http://localhost:8000/api/summarize/upload', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text, max_bullets: 3 })
+        body: form
       })
       if (!res.ok) {
         const errText = await res.text()
@@ -99,6 +91,17 @@ export default function UploadSummarize({ corpus, onAddToBoard }) {
     } catch (e) {
       console.warn('AI summarization failed, using fallback:', e)
       setStatus('AI summarization unavailable, using fallback...')
+      if (f.type === 'application/pdf' || f.name.toLowerCase().endsWith('.pdf')) {
+        try { 
+          text = await readPdfText(f) 
+          if (!text || text.trim().length < 20) {
+            setStatus('Parsed PDF but no selectable text (scanned image?). Please try a text PDF or TXT.')
+            return
+          }
+        } catch { setStatus('Failed to parse PDF'); return }
+      } else {
+        text = await f.text()
+      }
       const fallback = conciseSummary(text, 3)
       summaryData = {
         tldr: fallback.tldr,
@@ -113,11 +116,25 @@ export default function UploadSummarize({ corpus, onAddToBoard }) {
     localStorage.setItem('upload_summary', JSON.stringify(summaryData))
     
     setStatus('Finding similar studies...')
-    const queryText = summaryData?.tldr || text.slice(0, 500)
-    const scored = (corpus || []).map(p => ({ p, s: scoreSimilarity(queryText, `${p.title} ${p.outcome} ${p.organism}`) }))
-      .sort((a,b)=>b.s-a.s)
-      .slice(0, 5)
-      .map(x => x.p)
+    const queryText = [summaryData?.tldr, ...(summaryData?.objectives || []), ...(summaryData?.keywords || [])]
+      .filter(Boolean).join('\n') || text.slice(0, 500) || f.name
+    let scored
+    try {
+      // TF-IDF cosine over every corpus abstract and OSDR description, on the server
+      const res = await fetch('http://localhost:8000/api/similar', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ text: queryText, k: 5 })
+      })
+      if (!res.ok) throw new Error(`API call failed: ${res.status}`)
+      scored = (await res.json()).results
+    } catch (e) {
+      console.warn('Similar studies API unavailable, ranking locally:', e)
+      scored = (corpus || []).map(p => ({ p, s: scoreSimilarity(queryText, `${p.title} ${p.outcome} ${p.organism}`) }))
+        .sort((a,b)=>b.s-a.s)
+        .slice(0, 5)
+        .map(x => x.p)
+    }
     setRecommendations(scored)
     localStorage.setItem('upload_recommendations', JSON.stringify(scored))
     setStatus('')
@@ -41,6 +41,8 @@ export function useSearch(publications, itemsPerPage = 10) {
     setCurrentPage(1)
   }, [query])
 
+  // SearchIndex.match() in src/api/search.py applies this same rule for /api/aggregate
+  // and the gap endpoints; keep the two in sync
   const filteredPublications = useMemo(() => {
     if (!query.trim()) return publications
 
@@ -1,25 +1,46 @@
-import re,time,random,csv,requests,pandas as pd
+import re,sys,time,csv,threading,traceback,os,pandas as pd
+from http_cache import CachedSession,ResponseCache,CACHE_PATH
 
 SRC="src/data/SB_publication_PMC.csv"
 OUT="src/data/SB_publication_PMC_enriched.csv"
 EMAIL=""
 TOOL="pmc_meta_enricher"
 API_TIMEOUT=30
-SLEEP=0.34
 MAX_RETRY=3
+API_KEY=os.getenv("NCBI_API_KEY","")
+RATE=10.0 if API_KEY else 3.0  # NCBI E-utilities limit (req/s)
+ELINK_BATCH=100
+ESUMMARY_BATCH=200
+EFETCH_BATCH=200
+EUTILS="https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
 
 print(f"[DEBUG] reading CSV: {SRC}")
 try:
-    df=pd.read_csv(SRC)
+    df=pd.read_csv(SRC,dtype=str)
     print(f"[DEBUG] df.shape={df.shape}")
     print(f"[DEBUG] df.columns={list(df.columns)}")
 except Exception as e:
     print("[ERROR] read_csv failed:", e); sys.exit(1)
 
-S=requests.Session()
+class RateLimiter:
+    """Shared limiter: at most `rate` E-utilities requests per second across all calls."""
+    def __init__(self,rate):
+        self.interval=1.0/rate; self.next=0.0; self.lock=threading.Lock()
+    def acquire(self):
+        with self.lock:
+            now=time.monotonic()
+            t=max(now,self.next)
+            self.next=t+self.interval
+        if t>now: time.sleep(t-now)
+
+LIMIT=RateLimiter(RATE)
+
+# Cached session shared with fetch_osdr.py; the limiter only applies to real network calls
+S=CachedSession(None if os.getenv("NO_HTTP_CACHE") else ResponseCache(CACHE_PATH),retries=MAX_RETRY,limiter=LIMIT)
 S.headers.update({"User-Agent":"Mozilla/5.0 (MetaFetcher/1.0)","Accept":"*/*","Accept-Language":"en-US,en;q=0.9"})
 
-def sleep(): time.sleep(SLEEP+random.random()*0.05)
+def chunks(xs,n):
+    for i in range(0,len(xs),n): yield xs[i:i+n]
 
 def pmcid_from(url,v):
     if isinstance(v,str) and v.strip():
@@ -28,39 +49,23 @@ def pmcid_from(url,v):
     if m: return "PMC"+m.group(1)
     return ""
 
-def req(url,params,tag):
-    for i in range(1,MAX_RETRY+1):
-        try:
-            r=S.get(url,params=params,timeout=API_TIMEOUT)
-            print(f"[DEBUG] {tag} GET {r.url} status={r.status_code}")
-            r.raise_for_status()
-            return r
-        except Exception as ex:
-            print(f"[WARN] {tag} attempt {i} failed: {ex}")
-            if hasattr(ex,"response") and getattr(ex.response,"status_code",None) in (429,500,502,503,504):
-                time.sleep(1.2*i)
-            else:
-                time.sleep(0.6*i)
-    raise RuntimeError(f"{tag} failed after {MAX_RETRY} attempts")
-
-def elink_pmc_to_pmid(pmcid):
-    if not pmcid:
-        return ""
-    url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/elink.fcgi"
-    p = {
-        "dbfrom": "pmc",
-        "db": "pubmed",
-        "id": pmcid.replace("PMC", ""),
-        "retmode": "json",
-        "email": EMAIL,
-        "tool": TOOL,
-    }
-    r = req(url, p, "ELink")
-    j = r.json()
-    linksets = j.get("linksets", [])
-    if not linksets:
-        return ""
-    ldbs = linksets[0].get("linksetdbs", [])
+def req(url,params,tag,post=False):
+    if API_KEY: params={**params,"api_key":API_KEY}
+    # retries, jittered backoff and 429 Retry-After are handled by the cached session
+    try:
+        # POST keeps long id lists out of the URL
+        r=S.post(url,data=params,timeout=API_TIMEOUT) if post else S.get(url,params=params,timeout=API_TIMEOUT)
+    except Exception as ex:
+        raise RuntimeError(f"{tag} failed after {MAX_RETRY} attempts: {ex}") from ex
+    print(f"[DEBUG] {tag} {'POST' if post else 'GET'} {r.url} status={r.status_code} cached={r.from_cache}")
+    r.raise_for_status()
+    return r
+
+def chunk_failed(tag,part,e):
+    """A failed chunk only loses its own ids; the rest of the batch keeps what it resolved."""
+    print(f"[ERROR] {tag} failed for {len(part)} ids, left unenriched: {','.join(part)}:", e)
+
+def _pick_pmid(ldbs):
     def pick_id(entry):
         links = entry.get("links", [])
         if not links:
@@ -81,86 +86,126 @@ def elink_pmc_to_pmid(pmcid):
                 return pmid
     return ""
 
+def elink_batch(pmcids):
+    """PMCID -> PMID for many ids. One `id` param per PMCID keeps ELink's
+    linksets one-to-one, so each result maps back to its source id."""
+    out={}
+    nums=sorted({p.replace("PMC","") for p in pmcids if p})
+    for part in chunks(nums,ELINK_BATCH):
+        p={"dbfrom":"pmc","db":"pubmed","id":part,"retmode":"json","email":EMAIL,"tool":TOOL}
+        try:
+            j=req(EUTILS+"elink.fcgi",p,f"ELink[{len(part)}]",post=True).json()
+        except Exception as e:
+            chunk_failed("ELink",["PMC"+x for x in part],e); continue
+        for ls in j.get("linksets",[]):
+            ids=ls.get("ids") or []
+            if not ids: continue
+            pmid=_pick_pmid(ls.get("linksetdbs",[]))
+            if pmid: out["PMC"+str(ids[0])]=pmid
+    return out
+
+def esummary_batch(pmids):
+    """PMID -> (pub_date, first_author) for many ids per request."""
+    out={}
+    ids=sorted({str(x) for x in pmids if x})
+    for part in chunks(ids,ESUMMARY_BATCH):
+        p={"db":"pubmed","id":",".join(part),"retmode":"json","email":EMAIL,"tool":TOOL}
+        try:
+            r=req(EUTILS+"esummary.fcgi",p,f"ESummary[{len(part)}]",post=True)
+        except Exception as e:
+            chunk_failed("ESummary",part,e); continue
+        try:
+            res=r.json().get("result",{})
+        except Exception as e:
+            print("[WARN] ESummary parse error:", e, r.text[:300]); continue
+        for pmid in part:
+            it=res.get(pmid) or {}
+            d=it.get("pubdate") or it.get("epubdate") or ""
+            fa=""
+            a=it.get("authors") or []
+            if isinstance(a,list) and a:
+                a0=a[0]
+                if isinstance(a0,dict): fa=a0.get("name") or ""
+                elif isinstance(a0,str): fa=a0
+            out[pmid]=(d,fa)
+    return out
+
+_rec_split=re.compile(r"\n{3,}(?=\d+\. )")
+_pmid_line=re.compile(r"^PMID:\s*(\d+)",re.M)
+
+def efetch_batch(pmids):
+    """PMID -> plain-text abstract record. Batched text output concatenates
+    numbered records; each is split out, matched by its PMID line and
+    renumbered "1." so it reads exactly like a single-id EFetch."""
+    out={}
+    ids=sorted({str(x) for x in pmids if x})
+    for part in chunks(ids,EFETCH_BATCH):
+        p={"db":"pubmed","id":",".join(part),"retmode":"text","rettype":"abstract","email":EMAIL,"tool":TOOL}
+        try:
+            r=req(EUTILS+"efetch.fcgi",p,f"EFetch[{len(part)}]",post=True)
+        except Exception as e:
+            chunk_failed("EFetch",part,e); continue
+        for rec in _rec_split.split(r.text.strip()):
+            m=_pmid_line.search(rec)
+            if m: out[m.group(1)]=re.sub(r"^\d+\. ","1. ",rec.strip(),count=1)
+    return out
+
+def elink_pmc_to_pmid(pmcid):
+    return elink_batch([pmcid]).get(pmcid,"") if pmcid else ""
+
 def esummary_pub_fields(pmid):
-    if not pmid: return "",""
-    url="https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
-    p={"db":"pubmed","id":pmid,"retmode":"json","email":EMAIL,"tool":TOOL}
-    r=req(url,p,"ESummary")
-    d=""; fa=""
-    try:
-        j=r.json()
-        it=j.get("result",{}).get(str(pmid),{})
-        d=it.get("pubdate") or it.get("epubdate") or ""
-        a=it.get("authors") or []
-        if isinstance(a,list) and a:
-            a0=a[0]
-            if isinstance(a0,dict): fa=a0.get("name") or ""
-            elif isinstance(a0,str): fa=a0
-        print(f"[DEBUG] ESummary PMID={pmid} pub_date='{d}' first_author='{fa}'")
-    except Exception as e:
-        print("[WARN] ESummary parse error:", e, r.text[:300])
-    return d,fa
+    return esummary_batch([pmid]).get(str(pmid),("","")) if pmid else ("","")
 
 def efetch_abstract(pmid):
-    if not pmid: return ""
-    url="https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
-    p={"db":"pubmed","id":pmid,"retmode":"text","rettype":"abstract","email":EMAIL,"tool":TOOL}
-    r=req(url,p,"EFetch")
-    t=r.text.strip()
-    print(f"[DEBUG] EFetch PMID={pmid} abstract_len={len(t)}")
-    return t
+    return efetch_batch([pmid]).get(str(pmid),"") if pmid else ""
 
 def process(df,out,limit=607):
     if limit: df=df.head(limit).copy()
-    rows=[]
-    for idx,row in df.iterrows():
+    col=lambda c: df[c].fillna("").astype(str).str.strip() if c in df.columns else pd.Series("",index=df.index)
+    t=df.get("Title",pd.Series("",index=df.index)).fillna("")
+    link=df.get("Link",pd.Series("",index=df.index))
+    org=df.get("Inferred Organism",pd.Series("",index=df.index))
+    pmcid=pd.Series([pmcid_from(u,v) for u,v in zip(link,col("PMCID"))],index=df.index)
+    pmid=col("PMID"); pub_date=col("pub_date"); first_author=col("first_author"); abstract=col("abstract")
+    print(f"[DEBUG] rows={len(df)} missing PMID={int((pmid=='').sum())} pub_date/author={int(((pub_date=='')|(first_author=='')).sum())} abstract={int((abstract=='').sum())}")
+
+    # 1) PMCID -> PMID, batched
+    need=(pmid=="")&(pmcid!="")
+    if need.any():
+        try:
+            m=elink_batch(pmcid[need].tolist())
+            pmid[need]=pmcid[need].map(lambda x: m.get(x,""))
+        except Exception as e:
+            print("[ERROR] ELink failed:", e, traceback.format_exc())
+
+    # 2) pub_date / first_author, batched
+    need=((pub_date=="")|(first_author==""))&(pmid!="")
+    if need.any():
+        try:
+            m=esummary_batch(pmid[need].tolist())
+            got=pmid[need].map(lambda x: m.get(x,("","")))
+            pub_date[need]=pub_date[need].where(pub_date[need]!="",got.str[0])
+            first_author[need]=first_author[need].where(first_author[need]!="",got.str[1])
+        except Exception as e:
+            print("[ERROR] ESummary failed:", e, traceback.format_exc())
+
+    # 3) abstracts, batched
+    need=(abstract=="")&(pmid!="")
+    if need.any():
         try:
-            title=row.get("Title","")
-            link=row.get("Link","")
-            org=row.get("Inferred Organism","")
-            pmcid=pmcid_from(link,row.get("PMCID",""))
-            pmid=str(row.get("PMID","") or "")
-            pub_date=str(row.get("pub_date","") or "")
-            first_author=str(row.get("first_author","") or "")
-            abstract=str(row.get("abstract","") or "")
-
-            print(f"\n[DEBUG] row={idx} title='{str(title)[:80]}' link='{link}'")
-            print(f"[DEBUG] initial PMCID='{pmcid}' PMID='{pmid}' pub_date='{pub_date}' first_author='{first_author}' abstract_len={len(abstract)}")
-
-            if not pmid and pmcid:
-                try:
-                    pmid=elink_pmc_to_pmid(pmcid)
-                except Exception as e:
-                    print("[ERROR] ELink failed:", e, traceback.format_exc())
-                sleep()
-
-            if (not pub_date or not first_author) and pmid:
-                try:
-                    d,fa=esummary_pub_fields(pmid)
-                    if not pub_date: pub_date=d
-                    if not first_author: first_author=fa
-                except Exception as e:
-                    print("[ERROR] ESummary failed:", e, traceback.format_exc())
-                sleep()
-
-            if not abstract and pmid:
-                try:
-                    abstract=efetch_abstract(pmid)
-                except Exception as e:
-                    print("[ERROR] EFetch failed:", e, traceback.format_exc())
-                sleep()
-
-            print(f"[DEBUG] final PMCID='{pmcid}' PMID='{pmid}' pub_date='{pub_date}' first_author='{first_author}' abstract_len={len(abstract)}")
-
-            rows.append({
-                "Title":title,"Link":link,"Inferred Organism":org,
-                "PMCID":pmcid,"PMID":pmid,"pub_date":pub_date,"first_author":first_author,"abstract":abstract
-            })
+            m=efetch_batch(pmid[need].tolist())
+            abstract[need]=pmid[need].map(lambda x: m.get(x,""))
         except Exception as e:
-            print("[ERROR] row failed:", e, traceback.format_exc())
+            print("[ERROR] EFetch failed:", e, traceback.format_exc())
+
+    print(f"[DEBUG] after enrichment missing PMID={int((pmid=='').sum())} pub_date/author={int(((pub_date=='')|(first_author=='')).sum())} abstract={int((abstract=='').sum())}")
+    rows=pd.DataFrame({
+        "Title":t,"Link":link,"Inferred Organism":org,
+        "PMCID":pmcid,"PMID":pmid,"pub_date":pub_date,"first_author":first_author,"abstract":abstract
+    })
 
     try:
-        pd.DataFrame(rows,columns=["Title","Link","Inferred Organism","PMCID","PMID","pub_date","first_author","abstract"]).to_csv(out,index=False,quoting=csv.QUOTE_MINIMAL)
+        rows.to_csv(out,index=False,quoting=csv.QUOTE_MINIMAL)
         print(f"\n[SAVED] -> {out} rows={len(rows)}")
     except Exception as e:
         print("[ERROR] save failed:", e)
@@ -1,23 +1,127 @@
-import argparse, json, re, sys, time, requests, math, os
+import argparse, json, re, sys, time, math, os, threading, hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from http_cache import CachedSession, ResponseCache, CACHE_PATH, CACHE_TTL, CACHE_NEGATIVE_TTL, RETRY_STATUSES, cache_key
+from osdr_store import JsonArrayWriter, Journal, ShardWriter, iter_records
+
+try:
+    import orjson  # optional; several times faster than json on large META payloads
+    _fast_loads = orjson.loads
+except ImportError:
+    _fast_loads = json.loads
 
 META = "https://osdr.nasa.gov/osdr/data/osd/meta/{id}"
 FILES = "https://osdr.nasa.gov/osdr/data/osd/files/{id}"
 UA = {"User-Agent": "Mozilla/5.0"}
 
-def get_json(url, retries=3, backoff=0.6, timeout=30):
-    for i in range(retries):
-        try:
-            r = requests.get(url, headers=UA, timeout=timeout)
-            if r.status_code == 200:
-                return r.json()
-            if 400 <= r.status_code < 500:
-                return None
-        except Exception:
-            pass
-        time.sleep(backoff * (2**i))
-    return None
+class TokenBucket:
+    """Thread-safe global rate limit: `rate` requests/s with bursts up to `burst`."""
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def make_session(pool_size, cache_path=None, cache_ttl=CACHE_TTL, negative_ttl=CACHE_NEGATIVE_TTL):
+    cache = ResponseCache(cache_path, ttl=cache_ttl, negative_ttl=negative_ttl) if cache_path else None
+    s = CachedSession(cache, pool_size=pool_size)
+    s.headers.update(UA)
+    return s
+
+HTTP = make_session(1)
+
+class FetchError(Exception):
+    pass
+
+def fetch(url, headers=None, timeout=30, session=None, limiter=None, refresh=False):
+    """GET through the shared cached session (retries/backoff live there).
+    Returns the response for 200/304, None for other 4xx; raises FetchError
+    when every attempt failed (network error, 5xx, or still rate limited with
+    a 429), so the id is recorded as an error and retried, never as a miss."""
+    try:
+        r = (session or HTTP).get(url, headers=headers, timeout=timeout, limiter=limiter, refresh=refresh)
+    except Exception as e:
+        raise FetchError(url) from e
+    if r.status_code in (200, 304):
+        return r
+    if 400 <= r.status_code < 500 and r.status_code not in RETRY_STATUSES:
+        return None
+    raise FetchError(url)
+
+def get_json(url, timeout=30, session=None, limiter=None, refresh=False):
+    try:
+        r = fetch(url, None, timeout, session, limiter, refresh)
+        return r.json() if r is not None and r.status_code == 200 else None
+    except Exception:
+        return None
+
+class Checkpoint:
+    """Per-id crawl state kept next to --out: status, validators (ETag /
+    Last-Modified) and content hashes of the META and FILES payloads. Extracted records
+    live in an append-only journal (<state>.records.jsonl) and entries keep
+    only their byte offset, so the state stays small and memory stays flat.
+    Saved atomically every few ids so a crash loses almost nothing."""
+    def __init__(self, path):
+        self.path = path
+        self.ids = {}
+        self.journal = Journal(os.path.splitext(path)[0] + ".records.jsonl")
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.ids = json.load(f).get("ids", {})
+            for entry in self.ids.values():
+                # version 1 state kept records inline
+                if "record" in entry:
+                    rec = entry.pop("record")
+                    if rec: entry["offset"] = self.journal.append(rec)
+
+    def get(self, i):
+        return self.ids.get(str(i))
+
+    def record(self, entry):
+        if not entry or entry.get("offset") is None:
+            return None
+        return self.journal.read(entry["offset"])
+
+    def put(self, i, entry, rec=None):
+        if entry.get("status") not in ("found", "miss"):
+            return
+        entry = {k: v for k, v in entry.items() if k != "record"}
+        if rec is not None and entry.get("offset") is None:
+            entry["offset"] = self.journal.append(rec)
+        self.ids[str(i)] = entry
+
+    def save(self):
+        if not self.path:
+            return
+        self.journal.flush()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 2, "ids": self.ids}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def close(self):
+        self.save()
+        self.journal.close()
 
 _osd_key_pat = re.compile(r"^OSD-\d+$")
+_year_pat = re.compile(r"(\d{4})")
+_link_prefix_pat = re.compile(r".*?>\s*")
+_digits_pat = re.compile(r"\d+")
 
 def _first_osd_key(d):
     for k in (d or {}):
@@ -59,7 +163,7 @@ def _get_study_obj(j):
     return None, None
 
 def _parse_year(s):
-    m = re.search(r"(\d{4})", str(s or ""))
+    m = _year_pat.search(str(s or ""))
     return int(m.group(1)) if m else None
 
 def _parse_publications(container):
@@ -123,7 +227,7 @@ def extract_meta(j):
                 ln = ob.get("links") or {}
                 for _, v in ln.items():
                     txt = str(v)
-                    txt = re.sub(r".*?>\s*", "", txt).strip(' "')
+                    txt = _link_prefix_pat.sub("", txt).strip(' "')
                     if txt:
                         orgs.append(txt)
         if orgs:
@@ -132,7 +236,7 @@ def extract_meta(j):
 
     publications = _parse_publications(sub) or _parse_publications(s)
 
-    num = re.search(r"\d+", dataset_id or "")
+    num = _digits_pat.search(dataset_id or "")
     access = META.format(id=num.group(0)) if num else ""
 
     return {
@@ -176,74 +280,314 @@ def est_eta(left, rate):
     h, m = divmod(m, 60)
     return f"{h:02d}:{m:02d}:{s:02d}"
 
+def fetch_files(i, args, session=None, limiter=None):
+    """FILES payload of one study and the hash of its body, (None, None) when it has none.
+    Raises FetchError like fetch(), so a failed FILES request is retried, not read as "no files"."""
+    r = fetch(FILES.format(id=i), session=session, limiter=limiter, refresh=args.update)
+    if r is None or r.status_code != 200:
+        return None, None
+    return parse_json(r.content), hashlib.sha256(r.content).hexdigest()
+
+def build_record(i, meta, args, session=None, limiter=None):
+    """Extract and filter one study's META payload (fetches FILES). Returns (record or None, FILES hash)."""
+    rec = extract_meta(meta)
+    if not rec:
+        return None, None
+    files, files_hash = fetch_files(i, args, session, limiter)
+    return filter_record(rec, files, args), files_hash
+
+def filter_record(rec, files, args):
+    """Apply --require-files / --min-year to an extracted record given its FILES payload (or None)."""
+    nofiles = (not files) or (not has_files(files))
+    if args.require_files and nofiles:
+        return None
+    if args.min_year and rec.get("start_year") and rec["start_year"] < args.min_year:
+        return None
+    if nofiles: rec["no_files"] = True
+    return rec
+
+def fetch_one(i, args, session=None, limiter=None, state=None):
+    """Fetch one study id. Returns (record or None, state entry).
+
+    --resume reuses completed ids from the checkpoint without any request;
+    --update sends If-None-Match/If-Modified-Since for META and refetches
+    FILES; the previous record is kept when META is unchanged (304 or same
+    hash) and so is the FILES hash. If only FILES changed, the previous
+    record is filtered again against it."""
+    prev = state.get(i) if state else None
+    if prev and args.resume and not args.update:
+        return state.record(prev), prev
+    headers = {}
+    if args.update and prev and prev.get("status") == "found":
+        if prev.get("etag"): headers["If-None-Match"] = prev["etag"]
+        if prev.get("last_modified"): headers["If-Modified-Since"] = prev["last_modified"]
+    try:
+        r = fetch(META.format(id=i), headers, session=session, limiter=limiter, refresh=args.update)
+        now = time.time()
+        if r is None:
+            return None, {"status": "miss", "fetched_at": now}
+        if r.status_code == 304:
+            entry = {"checked_at": now}
+        else:
+            entry = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+                     "hash": hashlib.sha256(r.content).hexdigest(), "fetched_at": now}
+        if r.status_code == 304 or (args.update and prev and prev.get("status") == "found"
+                                    and prev.get("hash") == entry["hash"]):
+            files, files_hash = fetch_files(i, args, session, limiter)
+            if files_hash == prev.get("files_hash"):
+                return state.record(prev), {**prev, **entry, "changed": False}
+            rec = state.record(prev)
+            if rec:
+                rec = filter_record({k: v for k, v in rec.items() if k != "no_files"}, files, args)
+            return rec, {**prev, **entry, "files_hash": files_hash, "status": "found" if rec else "miss",
+                         "offset": None, "changed": True}
+        try:
+            meta = r.json()
+        except ValueError:
+            meta = None
+        rec, files_hash = build_record(i, meta, args, session, limiter) if meta else (None, None)
+    except FetchError:
+        return None, {"status": "error"}
+    entry.update(status="found" if rec else "miss", files_hash=files_hash, offset=None, changed=True)
+    return rec, entry
+
+def iter_results(args, state, session):
+    """Yield (id, record or None, state entry) in id order, at most --rate network
+    requests/s; cache hits and --resume skips are not paced. With --concurrency > 1,
+    ids are fetched by a thread pool over one pooled session, a bounded window ahead
+    of the consumer; results are still consumed in id order so output and
+    --stop-misses behave exactly like the serial crawl."""
+    ids = range(args.start_id, args.max_id + 1)
+    rate = args.rate or (2.0 / args.sleep if args.sleep > 0 else 1e9)
+    if args.concurrency <= 1:
+        limiter = TokenBucket(rate)
+        for i in ids:
+            rec, entry = fetch_one(i, args, session, limiter, state)
+            yield i, rec, entry
+        return
+    limiter = TokenBucket(rate, burst=args.concurrency)
+    window = deque()
+    it = iter(ids)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        try:
+            for i in it:
+                window.append((i, ex.submit(fetch_one, i, args, session, limiter, state)))
+                if len(window) >= args.concurrency * 4:
+                    break
+            while window:
+                i, fut = window.popleft()
+                yield (i, *fut.result())
+                nxt = next(it, None)
+                if nxt is not None:
+                    window.append((nxt, ex.submit(fetch_one, nxt, args, session, limiter, state)))
+        finally:
+            # consumer stopped early (--stop-misses): drop work not yet started
+            for _, fut in window:
+                fut.cancel()
+
+def crawled_records(state, start_id, last_id):
+    """Records found in [start_id, last_id], read back lazily from the journal."""
+    for i in range(start_id, last_id + 1):
+        entry = state.get(i)
+        if entry and entry.get("status") == "found":
+            rec = state.record(entry)
+            if rec: yield rec
+
+def crawled_index(state, start_id, last_id):
+    """dataset_id -> crawl id for records found in [start_id, last_id]; the records stay in the journal."""
+    index = {}
+    for i in range(start_id, last_id + 1):
+        entry = state.get(i)
+        if entry and entry.get("status") == "found":
+            rec = state.record(entry)
+            if rec: index[rec.get("dataset_id")] = i
+    return index
+
+def merge_records(existing, fresh, load):
+    """Stream existing records in their own order, swapping in fresh ones by dataset_id, then append
+    fresh ids the file did not have. existing need not be sorted and may repeat an id (only the
+    first copy is kept); fresh maps dataset_id -> key and load(key) reads that record back."""
+    seen = set()
+    for rec in existing:
+        key = rec.get("dataset_id")
+        if key is not None:
+            if key in seen: continue
+            seen.add(key)
+        yield (load(fresh[key]) or rec) if key in fresh else rec
+    for key, i in fresh.items():
+        if key not in seen:
+            rec = load(i)
+            if rec: yield rec
+
+def parse_json(body):
+    """Decode a raw response body like r.json() would; None when it is not JSON."""
+    try:
+        return _fast_loads(body)
+    except ValueError:
+        # orjson rejects a few things json accepts (NaN, >64-bit ints); defer to json for those
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+def iter_raw(cache, start_id, max_id):
+    """Yield (id, META body, FILES body or None) for every id with a cached 200 META response."""
+    for i in range(start_id, max_id + 1):
+        meta = cache.raw(cache_key("GET", META.format(id=i)))
+        if not meta or meta[0] != 200:
+            continue
+        files = cache.raw(cache_key("GET", FILES.format(id=i)))
+        yield i, meta[1], files[1] if files and files[0] == 200 else None
+
+def extract_chunk(chunk, args):
+    """Parse and extract a list of raw (id, META, FILES) bodies; runs in a worker process."""
+    out = []
+    for i, meta_body, files_body in chunk:
+        meta = parse_json(meta_body)
+        rec = extract_meta(meta) if meta else None
+        if rec:
+            rec = filter_record(rec, parse_json(files_body) if files_body else None, args)
+        out.append((i, rec))
+    return out
+
+def iter_reextracted(args, cache):
+    """Yield (id, record or None) in id order. With --workers > 1, chunks of
+    --chunk-size raw responses go to a process pool a bounded window ahead of
+    the consumer, so output is identical to the in-process path."""
+    raw = iter_raw(cache, args.start_id, args.max_id)
+    chunks = iter(lambda: list(islice(raw, args.chunk_size)), [])
+    work = partial(extract_chunk, args=args)
+    if args.workers <= 1:
+        for chunk in chunks:
+            yield from work(chunk)
+        return
+    window = deque()
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        for chunk in islice(chunks, args.workers * 2):
+            window.append(ex.submit(work, chunk))
+        while window:
+            yield from window.popleft().result()
+            nxt = next(chunks, None)
+            if nxt is not None:
+                window.append(ex.submit(work, nxt))
+
+def reextract(args):
+    """Rebuild --out from META/FILES responses already in the HTTP cache, without any request."""
+    if not os.path.exists(args.cache):
+        sys.exit(f"[ERROR] no response cache at {args.cache}")
+    cache = ResponseCache(args.cache, ttl=args.cache_ttl)
+    print(f"[START] reextract cache={args.cache} range={args.start_id}-{args.max_id} workers={args.workers} chunk={args.chunk_size}")
+    t0 = time.time()
+    seen = 0
+    jsonl_fp = open(args.jsonl, "w", encoding="utf-8") if args.jsonl else None
+    shards = ShardWriter(args.shard_dir, args.shard_size) if args.shard_dir else None
+    with JsonArrayWriter(args.out) as w:
+        for i, rec in iter_reextracted(args, cache):
+            seen += 1
+            if rec:
+                w.write(rec)
+                if jsonl_fp: jsonl_fp.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                if shards: shards.write(rec)
+            if seen % (args.print_every * 10) == 0:
+                print(f"[PROGRESS] id={i} parsed={seen} records={w.count} rate={fmt_rate(seen, t0):.1f}/s")
+    if shards: shards.close()
+    if jsonl_fp: jsonl_fp.close()
+    print(f"[DONE] saved={args.out} parsed={seen} records={w.count} rate={fmt_rate(seen, t0):.1f}/s "
+          f"elapsed={time.time()-t0:.2f}s parser={'orjson' if _fast_loads is not json.loads else 'json'}")
+
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--start-id", type=int, default=1)
     p.add_argument("--max-id", type=int, default=3000)
     p.add_argument("--stop-misses", type=int, default=200)
     p.add_argument("--sleep", type=float, default=0.15)
+    p.add_argument("--concurrency", type=int, default=1, help="parallel fetch workers (1 = serial crawl)")
+    p.add_argument("--rate", type=float, default=None, help="global network request rate limit (req/s); default 2/--sleep")
     p.add_argument("--out", default="src/data/OSDR_category.json")
     p.add_argument("--jsonl", default=None)
     p.add_argument("--print-every", type=int, default=25)
     p.add_argument("--min-year", type=int, default=None)
     p.add_argument("--require-files", action="store_true")
+    p.add_argument("--state", default=None, help="checkpoint file (default: <out>.state.json)")
+    p.add_argument("--checkpoint-every", type=int, default=25)
+    p.add_argument("--resume", action="store_true", help="skip ids already completed in the checkpoint")
+    p.add_argument("--update", action="store_true", help="refetch conditionally and merge changed studies into --out")
+    p.add_argument("--cache", default=CACHE_PATH, help="SQLite HTTP response cache shared with the other ingest scripts")
+    p.add_argument("--cache-ttl", type=float, default=CACHE_TTL)
+    p.add_argument("--cache-negative-ttl", type=float, default=CACHE_NEGATIVE_TTL, help="seconds a cached 404/410 is trusted")
+    p.add_argument("--no-cache", action="store_true")
+    p.add_argument("--shard-dir", default=None, help="also write JSONL shards + index.json (dataset_id -> offset)")
+    p.add_argument("--shard-size", type=int, default=1000)
+    p.add_argument("--reextract", action="store_true", help="rebuild --out offline from responses in --cache (no requests)")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="extraction processes for --reextract (1 = in-process)")
+    p.add_argument("--chunk-size", type=int, default=64, help="raw responses per worker task for --reextract")
     args = p.parse_args()
+    if args.reextract:
+        return reextract(args)
+    session = make_session(max(1, args.concurrency), None if args.no_cache else args.cache, args.cache_ttl,
+                           args.cache_negative_ttl)
+    state = Checkpoint(args.state or args.out + ".state.json")
+    changed = 0
 
-    out = []
     misses = 0
+    last_id = args.start_id - 1
     t0 = time.time()
     found = 0
     total = args.max_id - args.start_id + 1
     jsonl_fp = open(args.jsonl, "w", encoding="utf-8") if args.jsonl else None
 
-    print(f"[START] range={args.start_id}-{args.max_id} stop_misses={args.stop_misses} require_files={args.require_files}")
-    for i in range(args.start_id, args.max_id + 1):
-        meta = get_json(META.format(id=i))
-        if not meta:
-            misses += 1
-        else:
-            rec = extract_meta(meta)
-            if not rec:
+    print(f"[START] range={args.start_id}-{args.max_id} stop_misses={args.stop_misses} require_files={args.require_files} concurrency={args.concurrency}")
+    results = iter_results(args, state, session)
+    try:
+        for i, rec, entry in results:
+            if entry.pop("changed", False): changed += 1
+            state.put(i, entry, rec)
+            last_id = i
+            if entry.get("status") == "error":
+                pass  # not checkpointed, so retried next run; not evidence the ids have run out
+            elif not rec:
                 misses += 1
             else:
-                files = get_json(FILES.format(id=i))
-                nofiles = (not files) or (not has_files(files))
-                if args.require_files and nofiles:
-                    misses += 1
-                else:
-                    passes_year = True
-                    if args.min_year and rec.get("start_year") and rec["start_year"] < args.min_year:
-                        passes_year = False
-                    if passes_year:
-                        if nofiles: rec["no_files"] = True
-                        out.append(rec)
-                        if jsonl_fp:
-                            jsonl_fp.write(json.dumps(rec, ensure_ascii=False) + "\n")
-                            jsonl_fp.flush()
-                        found += 1
-                        misses = 0
-                    else:
-                        misses += 1
-
-        done = i - args.start_id + 1
-        if (done % args.print_every) == 0 or i == args.max_id:
-            rate = fmt_rate(done, t0)
-            left = total - done
-            eta = est_eta(left, rate)
-            print(f"[PROGRESS] id={i} done={done}/{total} found={found} misses={misses} rate={rate:.2f}/s eta={eta}")
-
-        if misses >= args.stop_misses:
-            print(f"[STOP] consecutive_misses={misses} at id={i}")
-            break
+                if jsonl_fp:
+                    jsonl_fp.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    jsonl_fp.flush()
+                found += 1
+                misses = 0
 
-        time.sleep(args.sleep)
+            done = i - args.start_id + 1
+            if (done % args.print_every) == 0 or i == args.max_id:
+                rate = fmt_rate(done, t0)
+                left = total - done
+                eta = est_eta(left, rate)
+                print(f"[PROGRESS] id={i} done={done}/{total} found={found} misses={misses} rate={rate:.2f}/s eta={eta}")
+
+            if misses >= args.stop_misses:
+                print(f"[STOP] consecutive_misses={misses} at id={i}")
+                break
+
+            if done % args.checkpoint_every == 0:
+                state.save()
+    finally:
+        results.close()
+        state.save()
 
     if jsonl_fp:
         jsonl_fp.close()
 
-    with open(args.out, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
-    print(f"[DONE] saved={args.out} records={len(out)} elapsed={time.time()-t0:.1f}s")
+    if args.update and os.path.exists(args.out):
+        fresh = crawled_index(state, args.start_id, last_id)
+        records = merge_records(iter_records(args.out), fresh, lambda i: state.record(state.get(i)))
+    else:
+        records = crawled_records(state, args.start_id, last_id)
+
+    shards = ShardWriter(args.shard_dir, args.shard_size) if args.shard_dir else None
+    with JsonArrayWriter(args.out) as w:
+        for rec in records:
+            w.write(rec)
+            if shards: shards.write(rec)
+    if shards: shards.close()
+    state.close()
+    print(f"[DONE] saved={args.out} records={w.count} changed={changed} elapsed={time.time()-t0:.1f}s")
 
 if __name__ == "__main__":
     main()
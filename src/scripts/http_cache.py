@@ -0,0 +1,171 @@
+import hashlib, json, os, random, sqlite3, threading, time
+import requests
+
+# Shared HTTP layer for the ingest scripts: one requests.Session, a SQLite
+# response cache keyed by method + URL + params/body (TTL, size-bounded LRU
+# eviction; 404/410 expire after a much shorter TTL so an id that is not
+# published yet is asked for again soon), and a single retry policy with jittered exponential backoff
+# that honours Retry-After on 429/503. Re-running a script after a partial
+# failure replays every cached response without touching the network.
+
+CACHE_PATH = os.getenv("HTTP_CACHE", ".cache/http_cache.sqlite")
+CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", str(7 * 86400)))
+CACHE_NEGATIVE_TTL = float(os.getenv("HTTP_CACHE_NEGATIVE_TTL", str(3600)))
+CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CACHE_STATUSES = (200, 404, 410)
+NEGATIVE_STATUSES = (404, 410)
+
+
+class CachedResponse:
+    """The parts of requests.Response the scripts use, rebuildable from the cache."""
+    def __init__(self, url, status_code, headers, content, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            err = requests.HTTPError(f"{self.status_code} for url: {self.url}")
+            err.response = self
+            raise err
+
+
+def cache_key(method, url, params=None, data=None):
+    blob = json.dumps([method.upper(), url, params or {}, data or {}], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, negative_ttl=CACHE_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, url TEXT, status INTEGER,"
+                        " headers TEXT, body BLOB, size INTEGER, expires_at REAL, accessed_at REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT url, status, headers, body, expires_at FROM responses WHERE key = ?",
+                                  (key,)).fetchone()
+            if row is None or row[4] < now:
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return CachedResponse(row[0], row[1], json.loads(row[2]), row[3], from_cache=True)
+
+    def raw(self, key):
+        """(status, body) as stored, ignoring expiry and LRU order; for offline re-processing."""
+        with self.lock:
+            return self.db.execute("SELECT status, body FROM responses WHERE key = ?", (key,)).fetchone()
+
+    def put(self, key, resp, ttl=None):
+        now = time.time()
+        body = resp.content or b""
+        ttl = self.ttl if ttl is None else ttl
+        if resp.status_code in NEGATIVE_STATUSES:
+            ttl = min(ttl, self.negative_ttl)
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (key, resp.url, resp.status_code, json.dumps(dict(resp.headers)), body,
+                             len(body), now + ttl, now))
+            self._evict(now)
+
+    def _evict(self, now):
+        self.db.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess, stale = total - self.max_bytes, []
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            stale.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.db.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+
+def _retry_after(resp):
+    try:
+        return float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CachedSession:
+    """requests-like GET/POST with caching, rate limiting and retries in one place.
+
+    `limiter` (anything with .acquire()) is only consulted for real network
+    requests, so cache hits are free. Conditional requests (If-None-Match /
+    If-Modified-Since) and refresh=True bypass the cache read."""
+    def __init__(self, cache=None, session=None, retries=3, backoff=0.6, max_backoff=30.0,
+                 limiter=None, pool_size=10):
+        self.cache = cache
+        self.session = session or requests.Session()
+        if session is None:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+        self.headers = self.session.headers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter = limiter
+
+    def get(self, url, params=None, **kw):
+        return self.request("GET", url, params=params, **kw)
+
+    def post(self, url, data=None, **kw):
+        return self.request("POST", url, data=data, **kw)
+
+    def request(self, method, url, params=None, data=None, headers=None, timeout=30,
+                refresh=False, limiter=None, ttl=None):
+        conditional = any(h in (headers or {}) for h in ("If-None-Match", "If-Modified-Since"))
+        key = cache_key(method, url, params, data) if self.cache else None
+        if key and not refresh and not conditional:
+            hit = self.cache.get(key)
+            if hit is not None:
+                return hit
+        limiter = limiter or self.limiter
+        last_exc = None
+        resp = None
+        for attempt in range(self.retries):
+            if limiter: limiter.acquire()
+            try:
+                r = self.session.request(method, url, params=params, data=data, headers=headers, timeout=timeout)
+                resp = CachedResponse(r.url, r.status_code, r.headers, r.content)
+            except requests.RequestException as e:
+                last_exc, resp = e, None
+            if resp is not None and resp.status_code not in RETRY_STATUSES:
+                if key and resp.status_code in CACHE_STATUSES:
+                    self.cache.put(key, resp, ttl)
+                return resp
+            if attempt + 1 < self.retries:
+                delay = _retry_after(resp) if resp is not None else None
+                if delay is None:
+                    # "full jitter": spread retries from many workers apart
+                    delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt + 1)))
+                time.sleep(min(delay, self.max_backoff))
+        if resp is not None:
+            return resp
+        raise last_exc
@@ -0,0 +1,161 @@
+import json, os, re
+
+# Streaming storage for OSDR records so memory stays flat however many
+# studies are crawled:
+#   JsonArrayWriter  writes a JSON array record by record (same bytes as json.dump(indent=2))
+#   iter_records     lazily reads a .json array, a .jsonl file or a shard directory
+#   ShardWriter      splits records into JSONL shards plus an offset index by dataset_id
+#   ShardReader      random access to one record via the index (one seek + one read)
+#   Journal          append-only JSONL used by the crawl checkpoint
+
+def osd_num(rec):
+    m = re.search(r"\d+", (rec or {}).get("dataset_id") or "")
+    return int(m.group(0)) if m else float("inf")
+
+class JsonArrayWriter:
+    def __init__(self, path):
+        self.path = path
+        self.tmp = path + ".tmp"
+        self.fp = open(self.tmp, "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, rec):
+        body = json.dumps(rec, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        self.fp.write(("[\n  " if self.count == 0 else ",\n  ") + body)
+        self.count += 1
+
+    def close(self):
+        self.fp.write("\n]" if self.count else "[]")
+        self.fp.close()
+        os.replace(self.tmp, self.path)  # readers never see a half-written file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array without loading the file."""
+    dec = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buf = f.read(chunk_size)
+        pos = buf.index("[") + 1
+        while True:
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buf):
+                    break
+                more = f.read(chunk_size)
+                if not more:
+                    return
+                buf, pos = buf[pos:] + more, 0
+            if buf[pos] == "]":
+                return
+            while True:
+                try:
+                    rec, end = dec.raw_decode(buf, pos)
+                    break
+                except json.JSONDecodeError:
+                    more = f.read(chunk_size)
+                    if not more:
+                        raise
+                    buf, pos = buf[pos:] + more, 0
+            yield rec
+            buf, pos = buf[end:], 0
+
+def iter_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def iter_records(path):
+    if os.path.isdir(path):
+        return iter(ShardReader(path))
+    if path.endswith(".jsonl"):
+        return iter_jsonl(path)
+    return iter_json_array(path)
+
+class ShardWriter:
+    def __init__(self, directory, shard_size=1000):
+        os.makedirs(directory, exist_ok=True)
+        self.dir = directory
+        self.shard_size = shard_size
+        self.shards = []
+        self.index = {}
+        self.fp = None
+        self.n = 0
+
+    def write(self, rec):
+        if self.fp is None or self.n % self.shard_size == 0:
+            if self.fp: self.fp.close()
+            name = f"shard-{len(self.shards):05d}.jsonl"
+            self.shards.append(name)
+            self.fp = open(os.path.join(self.dir, name), "wb")
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        self.index[rec.get("dataset_id")] = [len(self.shards) - 1, self.fp.tell(), len(line)]
+        self.fp.write(line)
+        self.n += 1
+
+    def close(self):
+        if self.fp: self.fp.close()
+        with open(os.path.join(self.dir, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"shards": self.shards, "count": self.n, "ids": self.index}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ShardReader:
+    def __init__(self, directory):
+        self.dir = directory
+        with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+            idx = json.load(f)
+        self.shards = idx["shards"]
+        self.index = idx["ids"]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, dataset_id):
+        return dataset_id in self.index
+
+    def get(self, dataset_id):
+        loc = self.index.get(dataset_id)
+        if loc is None:
+            return None
+        shard, offset, length = loc
+        with open(os.path.join(self.dir, self.shards[shard]), "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def __iter__(self):
+        for name in self.shards:
+            yield from iter_jsonl(os.path.join(self.dir, name))
+
+class Journal:
+    """Append-only JSONL; append() returns the byte offset used to read the record back."""
+    def __init__(self, path):
+        self.path = path
+        self.fp = open(path, "ab")
+
+    def append(self, rec):
+        self.fp.seek(0, os.SEEK_END)
+        offset = self.fp.tell()
+        self.fp.write((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+        return offset
+
+    def flush(self):
+        self.fp.flush()
+
+    def read(self, offset):
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def close(self):
+        self.fp.close()
@@ -0,0 +1,144 @@
+import json
+import time
+import types
+
+import pytest
+
+import fetch_osdr
+from fetch_osdr import Checkpoint, TokenBucket, extract_meta, fetch_one, iter_results, merge_records
+from http_cache import CachedResponse
+
+META = {"study": {"OSD-7": {
+    "identifier": "OSD-7", "title": "Rodent Research 1", "description": "Mice on the ISS",
+    "publicReleaseDate": "2015-03-01",
+    "comments": [{"name": "Mission Name", "value": "SpaceX-4"}],
+    "additionalInformation": {"organisms": {"ontologies": {"a": {"name": "Mus musculus"}}}},
+    "publications": [{"title": "Bone loss", "authorList": "A. B.", "doi": "10.1/x", "pubMedID": "123",
+                      "status": {"annotationValue": "published"}}]}}}
+
+
+def files(n):
+    return {"studies": {"OSD-7": {"study_files": list(range(n))}}}
+
+
+def test_extract_meta():
+    rec = extract_meta(META)
+    assert rec["dataset_id"] == "OSD-7"
+    assert (rec["mission"], rec["organisms"], rec["start_year"]) == ("SpaceX-4", ["Mus musculus"], 2015)
+    assert rec["access_url"] == fetch_osdr.META.format(id=7)
+    assert rec["publications"][0]["pubmed"] == "123"
+    assert extract_meta({}) is None
+
+
+class Server:
+    """Session stand-in for META/FILES: META answers 304 to a matching If-None-Match."""
+
+    def __init__(self):
+        self.meta, self.files, self.etag = META, files(2), "v1"
+        self.calls = []
+
+    def get(self, url, headers=None, timeout=30, limiter=None, refresh=False):
+        if limiter:
+            limiter.acquire()
+        self.calls.append(url)
+        if "/meta/" in url:
+            if headers and headers.get("If-None-Match") == self.etag:
+                return CachedResponse(url, 304, {}, b"")
+            return CachedResponse(url, 200, {"ETag": self.etag}, json.dumps(self.meta).encode())
+        if self.files is None:
+            return CachedResponse(url, 503, {}, b"")
+        return CachedResponse(url, 200, {}, json.dumps(self.files).encode())
+
+
+def args(**kw):
+    return types.SimpleNamespace(**{"update": False, "resume": False, "require_files": False, "min_year": None,
+                                    "start_id": 7, "max_id": 7, "concurrency": 1, "rate": None, "sleep": 0.0,
+                                    **kw})
+
+
+def crawl(state, server, a, i=7):
+    rec, entry = fetch_one(i, a, server, None, state)
+    changed = entry.pop("changed", None)
+    state.put(i, entry, rec)
+    state.save()
+    return rec, entry, changed
+
+
+@pytest.fixture
+def state(tmp_path):
+    st = Checkpoint(str(tmp_path / "out.json.state.json"))
+    yield st
+    st.close()
+
+
+def test_update_keeps_unchanged_studies(state):
+    server = Server()
+    rec, entry, changed = crawl(state, server, args())
+    assert changed and entry["status"] == "found" and "no_files" not in rec
+    rec, entry, changed = crawl(state, server, args(update=True))
+    assert not changed and rec["title"] == "Rodent Research 1"
+    server.etag = "v2"  # new validator, same META bytes: the hash still matches
+    assert crawl(state, server, args(update=True))[2] is False
+
+
+def test_update_notices_a_files_only_change(state):
+    server = Server()
+    crawl(state, server, args())
+    server.files = files(0)
+    rec, entry, changed = crawl(state, server, args(update=True))
+    assert changed and rec["no_files"] is True and entry["status"] == "found"
+    assert state.record(state.get(7))["no_files"] is True
+    server.files = files(3)
+    rec, _, changed = crawl(state, server, args(update=True))
+    assert changed and "no_files" not in rec
+    server.files = files(0)
+    rec, entry, changed = crawl(state, server, args(update=True, require_files=True))
+    assert changed and rec is None and entry["status"] == "miss"
+
+
+def test_files_failure_is_an_error_not_a_miss(state):
+    server = Server()
+    server.files = None
+    rec, entry = fetch_one(7, args(), server, None, state)
+    assert rec is None and entry == {"status": "error"}
+
+
+def test_merge_swaps_fresh_records_in_and_appends_new_ones():
+    existing = [{"dataset_id": "OSD-2", "v": 1}, {"dataset_id": "OSD-1", "v": 1}, {"dataset_id": "OSD-2", "v": 9}]
+    fresh = {"OSD-1": 1, "OSD-3": 3}
+    load = {1: {"dataset_id": "OSD-1", "v": 2}, 3: {"dataset_id": "OSD-3", "v": 2}}.get
+    assert list(merge_records(existing, fresh, load)) == [
+        {"dataset_id": "OSD-2", "v": 1}, {"dataset_id": "OSD-1", "v": 2}, {"dataset_id": "OSD-3", "v": 2}]
+
+
+def test_token_bucket_paces_after_the_burst():
+    bucket = TokenBucket(rate=100, burst=3)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.02
+    for _ in range(10):
+        bucket.acquire()
+    assert 0.08 <= time.monotonic() - start < 0.4
+
+
+def test_serial_crawl_does_not_pace_cache_hits(state):
+    class CacheHits:
+        def get(self, url, headers=None, timeout=30, limiter=None, refresh=False):
+            return CachedResponse(url, 404, {}, b"", from_cache=True)
+
+    start = time.monotonic()
+    results = list(iter_results(args(start_id=1, max_id=50, sleep=1.0), state, CacheHits()))
+    assert len(results) == 50 and all(entry["status"] == "miss" for _, _, entry in results)
+    assert time.monotonic() - start < 0.5
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_results_come_back_in_id_order(state, concurrency):
+    class Misses:
+        def get(self, url, headers=None, timeout=30, limiter=None, refresh=False):
+            return CachedResponse(url, 404, {}, b"")
+
+    ids = [i for i, _, _ in iter_results(args(start_id=1, max_id=40, concurrency=concurrency, rate=1e6),
+                                         state, Misses())]
+    assert ids == list(range(1, 41))
@@ -0,0 +1,115 @@
+import pytest
+import requests
+
+import http_cache
+from http_cache import CachedResponse, CachedSession, ResponseCache, cache_key
+
+
+class Clock:
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        monkeypatch.setattr(http_cache.time, "time", lambda: self.now)
+        monkeypatch.setattr(http_cache.time, "sleep", lambda s: None)
+
+
+class FakeSession:
+    """requests.Session stand-in answering from a list of (status, body, headers) or exceptions."""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.headers = {}
+        self.calls = 0
+
+    def request(self, method, url, **kw):
+        self.calls += 1
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        r = requests.Response()
+        r.status_code, r._content, r.url = answer[0], answer[1], url
+        r.headers.update(answer[2] if len(answer) > 2 else {})
+        return r
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "c.sqlite"), ttl=100, negative_ttl=10)
+
+
+def test_cache_key_ignores_param_order():
+    assert cache_key("get", "u", {"a": 1, "b": 2}) == cache_key("GET", "u", {"b": 2, "a": 1})
+    assert cache_key("GET", "u") != cache_key("POST", "u")
+
+
+def test_positive_and_negative_ttls(cache, monkeypatch):
+    clock = Clock(monkeypatch)
+    cache.put("ok", CachedResponse("u", 200, {}, b"x"))
+    cache.put("gone", CachedResponse("u", 404, {}, b""))
+    cache.put("short", CachedResponse("u", 410, {}, b""), ttl=5)
+    cache.put("long", CachedResponse("u", 410, {}, b""), ttl=1000)  # capped at negative_ttl
+    clock.now += 6
+    assert cache.get("short") is None and cache.get("gone").status_code == 404
+    clock.now += 5
+    assert cache.get("gone") is None and cache.get("long") is None
+    hit = cache.get("ok")
+    assert (hit.status_code, hit.content, hit.from_cache) == (200, b"x", True)
+    assert cache.raw(cache_key("GET", "nothing")) is None
+
+
+def test_size_bound_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = Clock(monkeypatch)
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_bytes=10)
+    for key in ("a", "b"):
+        cache.put(key, CachedResponse("u", 200, {}, b"12345"))
+        clock.now += 1
+    cache.get("a")
+    cache.put("c", CachedResponse("u", 200, {}, b"12345"))
+    assert cache.get("b") is None and cache.get("a") and cache.get("c")
+
+
+def test_retries_then_caches_and_replays(cache, monkeypatch):
+    Clock(monkeypatch)
+    fake = FakeSession([requests.ConnectionError("reset"), (503, b"", {"Retry-After": "1"}), (200, b"{\"a\": 1}")])
+    s = CachedSession(cache, session=fake, retries=3)
+    assert s.get("https://x/1").json() == {"a": 1}
+    assert fake.calls == 3
+    again = s.get("https://x/1")
+    assert again.from_cache and fake.calls == 3
+    fake.answers.append((200, b"{}"))
+    assert s.get("https://x/1", refresh=True).json() == {}
+    assert fake.calls == 4
+
+
+def test_gives_up_with_the_last_response_or_error(cache, monkeypatch):
+    Clock(monkeypatch)
+    s = CachedSession(cache, session=FakeSession([(429, b""), (429, b"")]), retries=2)
+    assert s.get("https://x/2").status_code == 429
+    assert cache.get(cache_key("GET", "https://x/2")) is None
+    s = CachedSession(cache, session=FakeSession([requests.Timeout("t"), requests.Timeout("t")]), retries=2)
+    with pytest.raises(requests.Timeout):
+        s.get("https://x/3")
+
+
+def test_conditional_requests_bypass_the_cache(cache, monkeypatch):
+    Clock(monkeypatch)
+    fake = FakeSession([(200, b"v1"), (304, b"")])
+    s = CachedSession(cache, session=fake)
+    s.get("https://x/4")
+    r = s.get("https://x/4", headers={"If-None-Match": "e"})
+    assert r.status_code == 304 and fake.calls == 2
+
+
+def test_limiter_is_only_used_for_network_requests(cache, monkeypatch):
+    Clock(monkeypatch)
+
+    class Limiter:
+        calls = 0
+
+        def acquire(self):
+            self.calls += 1
+
+    limiter = Limiter()
+    s = CachedSession(cache, session=FakeSession([(200, b"x")]), limiter=limiter)
+    s.get("https://x/5")
+    s.get("https://x/5")
+    assert limiter.calls == 1
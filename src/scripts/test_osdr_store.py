@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from osdr_store import JsonArrayWriter, Journal, ShardReader, ShardWriter, iter_json_array, iter_records
+
+RECORDS = [
+    {"dataset_id": "OSD-1", "title": "Bone loss in été mice", "organisms": ["Mus musculus"],
+     "start_year": 2014, "publications": [{"title": "a, ] b", "doi": ""}]},
+    {"dataset_id": "OSD-2", "title": "", "organisms": [], "start_year": None, "publications": [],
+     "no_files": True},
+    {"dataset_id": "OSD-10", "title": "Nested {\"json\"} text\nwith newline", "description": "x" * 5000},
+]
+
+
+@pytest.mark.parametrize("records", [RECORDS, RECORDS[:1], []])
+def test_writer_matches_json_dump_indent_2(tmp_path, records):
+    path = tmp_path / "out.json"
+    with JsonArrayWriter(str(path)) as w:
+        for rec in records:
+            w.write(rec)
+    assert w.count == len(records)
+    assert path.read_text(encoding="utf-8") == json.dumps(records, ensure_ascii=False, indent=2)
+    assert not (tmp_path / "out.json.tmp").exists()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64, 1 << 16])
+def test_array_round_trip_for_any_read_chunk(tmp_path, chunk_size):
+    path = tmp_path / "out.json"
+    with JsonArrayWriter(str(path)) as w:
+        for rec in RECORDS:
+            w.write(rec)
+    assert list(iter_json_array(str(path), chunk_size)) == RECORDS
+
+
+def test_reader_accepts_compact_and_empty_arrays(tmp_path):
+    compact = tmp_path / "compact.json"
+    compact.write_text(json.dumps(RECORDS, separators=(",", ":")), encoding="utf-8")
+    assert list(iter_json_array(str(compact), 7)) == RECORDS
+    empty = tmp_path / "empty.json"
+    empty.write_text(" [ \n ] ", encoding="utf-8")
+    assert list(iter_json_array(str(empty))) == []
+
+
+def test_shards_round_trip_with_random_access(tmp_path):
+    with ShardWriter(str(tmp_path / "shards"), shard_size=2) as w:
+        for rec in RECORDS:
+            w.write(rec)
+    reader = ShardReader(str(tmp_path / "shards"))
+    assert len(reader.shards) == 2
+    assert list(iter_records(str(tmp_path / "shards"))) == RECORDS
+    assert reader.get("OSD-10") == RECORDS[2]
+    assert reader.get("OSD-404") is None
+    assert "OSD-2" in reader and len(reader) == 3
+
+
+def test_journal_reads_back_by_offset(tmp_path):
+    journal = Journal(str(tmp_path / "j.jsonl"))
+    offsets = [journal.append(rec) for rec in RECORDS]
+    journal.flush()
+    assert [journal.read(o) for o in reversed(offsets)] == RECORDS[::-1]
+    journal.close()
+    assert list(iter_records(str(tmp_path / "j.jsonl"))) == RECORDS